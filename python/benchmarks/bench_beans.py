@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Benchmark of the Herald beans: memory used and creation time of Message and
+Peer beans, compared to their former implementation (instance dictionaries,
+UUID4 message UIDs and a lock per peer).
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard library
+from __future__ import print_function
+import argparse
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+# Herald
+import herald
+import herald.beans as beans
+
+# ------------------------------------------------------------------------------
+
+
+class LegacyMessage(object):
+    """
+    Former implementation of the Message bean
+    """
+    def __init__(self, subject, content=None):
+        self._subject = subject
+        self._content = content
+        self._headers = {}
+        self._headers[herald.MESSAGE_HERALD_VERSION] = \
+            herald.HERALD_SPECIFICATION_VERSION
+        self._headers[herald.MESSAGE_HEADER_TIMESTAMP] = \
+            int(time.time() * 1000)
+        self._headers[herald.MESSAGE_HEADER_UID] = \
+            str(uuid.uuid4()).replace('-', '').upper()
+        self._metadata = {}
+
+
+class LegacyPeer(object):
+    """
+    Former implementation of the Peer bean
+    """
+    def __init__(self, uid, node_uid, app_id, groups, directory):
+        self.__uid = uid
+        self.__name = uid
+        self.__node = node_uid or uid
+        self.__node_name = self.__node
+        self.__app_id = app_id
+        self.__groups = set(groups or [])
+        self.__accesses = {}
+        self.__directory = directory
+        self.__lock = threading.RLock()
+
+
+def measure(factory, count):
+    """
+    Creates and keeps the given number of beans
+
+    :return: A (bytes per bean, microseconds per bean) tuple
+    """
+    tracemalloc.start()
+    start_mem = tracemalloc.get_traced_memory()[0]
+    start = time.time()
+    kept = [factory(idx) for idx in range(count)]
+    duration = time.time() - start
+    used = tracemalloc.get_traced_memory()[0] - start_mem
+    tracemalloc.stop()
+    del kept
+    return used / float(count), duration * 1e6 / count
+
+
+def main(argv=None):
+    """
+    Entry point
+
+    :param argv: Program arguments
+    """
+    parser = argparse.ArgumentParser(description="Herald beans benchmark")
+    parser.add_argument("-m", "--messages", type=int, default=20000,
+                        help="Number of messages")
+    parser.add_argument("-p", "--peers", type=int, default=10000,
+                        help="Number of peers")
+    args = parser.parse_args(argv)
+
+    # Peers UIDs and groups are shared by both implementations
+    uids = [str(uuid.uuid4()) for _ in range(args.peers)]
+    groups = ["all", "some-node"]
+
+    print("{0:>18} | {1:>10} | {2:>12}"
+          .format("bean", "bytes", "creation (us)"))
+    for name, factory, count in (
+            ("Message (legacy)",
+             lambda _: LegacyMessage("some/subject", "content"),
+             args.messages),
+            ("Message", lambda _: beans.Message("some/subject", "content"),
+             args.messages),
+            ("Peer (legacy)",
+             lambda idx: LegacyPeer(uids[idx], "node", "app", groups, None),
+             args.peers),
+            ("Peer",
+             lambda idx: beans.Peer(uids[idx], "node", "app", groups, None),
+             args.peers)):
+        used, creation = measure(factory, count)
+        print("{0:>18} | {1:>10.1f} | {2:>12.2f}"
+              .format(name, used, creation))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Benchmark of the message codecs: compares the size and the encoding/decoding
+times of the JSON+Jabsorb and binary codecs, with and without the cache of the
+encoded message body.
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard library
+from __future__ import print_function
+import argparse
+import sys
+import time
+
+# Herald
+import herald
+import herald.beans as beans
+import herald.codecs as codecs
+
+# ------------------------------------------------------------------------------
+
+CONTENTS = {
+    "empty": None,
+    "text": "Hello, World! " * 4,
+    "peer": {"uid": "A" * 32, "name": "some-peer", "node_uid": "B" * 32,
+             "node_name": "some-node", "app_id": "<herald-legacy>",
+             "groups": ["all", "B" * 32],
+             "accesses": {"http": ["127.0.0.1", 8080, "/herald"]}},
+    "numbers": list(range(500)),
+}
+""" Message contents, by name """
+
+
+def make_message(content):
+    """
+    Prepares a message the way the HTTP transport does
+    """
+    message = beans.Message("herald/benchmark", content)
+    message.add_header(herald.MESSAGE_HEADER_SENDER_UID, "A" * 32)
+    message.add_header(herald.MESSAGE_HEADER_TARGET_PEER, "B" * 32)
+    message.add_header("herald-http-tansport-port", 8080)
+    message.add_header("herald-http-tansport-path", "/herald")
+    return message
+
+
+def measure(codec, message, loops):
+    """
+    Encodes and decodes a message
+
+    :return: A (size, encode time, cached encode time, decode time) tuple
+             (times in seconds)
+    """
+    start = time.time()
+    for _ in range(loops):
+        # Clear the cache of the encoded body
+        message.set_content(message.content)
+        data = codec.encode(message)
+    encode_time = (time.time() - start) / loops
+
+    start = time.time()
+    for _ in range(loops):
+        codec.encode(message)
+    cached_time = (time.time() - start) / loops
+
+    start = time.time()
+    for _ in range(loops):
+        codec.decode(data).content
+    decode_time = (time.time() - start) / loops
+    return len(data), encode_time, cached_time, decode_time
+
+
+def main(argv=None):
+    """
+    Entry point
+
+    :param argv: Program arguments
+    """
+    parser = argparse.ArgumentParser(description="Herald codecs benchmark")
+    parser.add_argument("-l", "--loops", type=int, default=10000,
+                        help="Number of encodings per message")
+    args = parser.parse_args(argv)
+
+    print("{0:>8} | {1:>6} | {2:>6} | {3:>11} | {4:>11} | {5:>11}"
+          .format("content", "codec", "bytes", "encode (us)", "cached (us)",
+                  "decode (us)"))
+    for name, content in sorted(CONTENTS.items()):
+        message = make_message(content)
+        for codec_name in (codecs.CODEC_JSON, codecs.CODEC_BINARY):
+            size, encode_time, cached_time, decode_time = measure(
+                codecs.get_codec(codec_name), message, args.loops)
+            print("{0:>8} | {1:>6} | {2:>6} | {3:>11.2f} | {4:>11.2f} | "
+                  "{5:>11.2f}".format(name, codec_name, size,
+                                      encode_time * 1e6, cached_time * 1e6,
+                                      decode_time * 1e6))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
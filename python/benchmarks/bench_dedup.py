@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Benchmark of the duplicate messages filter: compares the time-bucketed
+herald.dedup.DuplicateFilter with the former UID -> TTL dictionary and its
+periodic garbage collection pass.
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard library
+from __future__ import print_function
+import argparse
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+# Herald
+from herald.dedup import DuplicateFilter
+
+# ------------------------------------------------------------------------------
+
+
+class LegacyFilter(object):
+    """
+    Former implementation, as found in the Herald core
+    """
+    def __init__(self):
+        self.treated = {}
+        self.lock = threading.Lock()
+
+    def check(self, uid):
+        with self.lock:
+            if uid in self.treated:
+                return False
+            self.treated[uid] = 0
+            return True
+
+    def garbage_collect(self, gc_delta=30):
+        with self.lock:
+            to_delete = []
+            for uid, ttl in self.treated.items():
+                new_ttl = ttl + gc_delta
+                self.treated[uid] = new_ttl
+                if new_ttl > 300:
+                    to_delete.append(uid)
+
+            for uid in to_delete:
+                del self.treated[uid]
+
+
+def measure(factory, uids):
+    """
+    Fills a filter with the given UIDs
+
+    :return: A (filter, bytes used, seconds per check) tuple
+    """
+    tracemalloc.start()
+    start_mem = tracemalloc.get_traced_memory()[0]
+    dedup = factory()
+    start = time.time()
+    for uid in uids:
+        dedup.check(uid)
+    # Second pass: only duplicates
+    for uid in uids:
+        dedup.check(uid)
+    duration = time.time() - start
+    used = tracemalloc.get_traced_memory()[0] - start_mem
+    tracemalloc.stop()
+    return dedup, used, duration / (2 * len(uids))
+
+
+def main(argv=None):
+    """
+    Entry point
+
+    :param argv: Program arguments
+    """
+    parser = argparse.ArgumentParser(description="Herald dedup benchmark")
+    parser.add_argument("-r", "--rate", type=int, default=5000,
+                        help="Received messages per second")
+    parser.add_argument("-w", "--window", type=int, default=300,
+                        help="Time window, in seconds")
+    parser.add_argument("-s", "--size", type=int, default=500000,
+                        help="Maximum number of UIDs in the bucketed filter")
+    args = parser.parse_args(argv)
+
+    nb_uids = args.rate * args.window
+    print("Generating", nb_uids, "UIDs...")
+    # UIDs are generated before measures, as they are kept by the caller
+    uids = [str(uuid.uuid4()).replace('-', '').upper()
+            for _ in range(nb_uids)]
+
+    legacy, legacy_mem, legacy_check = measure(LegacyFilter, uids)
+    start = time.time()
+    legacy.garbage_collect()
+    legacy_gc = time.time() - start
+    del legacy
+
+    _, bucket_mem, bucket_check = measure(
+        lambda: DuplicateFilter(args.window, max_entries=args.size), uids)
+    _, unbounded_mem, unbounded_check = measure(
+        lambda: DuplicateFilter(args.window), uids)
+
+    print("{0:>22} | {1:>10} | {2:>10} | {3:>10}"
+          .format("filter", "memory MB", "check (us)", "GC (ms)"))
+    for name, mem, check, gc_time in (
+            ("dict + GC (legacy)", legacy_mem, legacy_check, legacy_gc),
+            ("buckets (unbounded)", unbounded_mem, unbounded_check, 0),
+            ("buckets (bounded)", bucket_mem, bucket_check, 0)):
+        print("{0:>22} | {1:>10.1f} | {2:>10.2f} | {3:>10.1f}"
+              .format(name, mem / 1048576., check * 1e6, gc_time * 1000))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Micro-benchmark of the subject to listeners dispatch: compares the indexed
+look up of herald.dispatch.SubjectIndex with a scan of all the filters
+regular expressions (the former behavior of the Herald core).
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard library
+from __future__ import print_function
+import argparse
+import fnmatch
+import random
+import re
+import sys
+import timeit
+
+# Herald
+from herald.dispatch import SubjectIndex
+
+# ------------------------------------------------------------------------------
+
+
+def make_filters(count, rand):
+    """
+    Prepares a set of listener filters: 60% of literal subjects, 30% of
+    prefix filters and 10% of complex patterns
+
+    :param count: Number of filters
+    :param rand: Random generator
+    :return: A list of filters
+    """
+    filters = []
+    for idx in range(count):
+        kind = rand.random()
+        base = "app/service{0}/method{1}".format(idx % 50, idx)
+        if kind < .6:
+            filters.append(base)
+        elif kind < .9:
+            filters.append(base.rsplit('/', 1)[0] + "/*")
+        else:
+            filters.append("app/*/method{0}?".format(idx))
+    return filters
+
+
+def make_subjects(filters, count, rand):
+    """
+    Prepares the subjects of the messages to dispatch
+
+    :param filters: Listener filters
+    :param count: Number of subjects
+    :param rand: Random generator
+    :return: A list of subjects
+    """
+    subjects = []
+    for _ in range(count):
+        pattern = rand.choice(filters)
+        subjects.append(pattern.replace('*', 'x').replace('?', '1'))
+    # Some messages without listener
+    subjects.extend("unknown/subject/{0}".format(idx)
+                    for idx in range(count // 10))
+    return subjects
+
+
+def bench(nb_filters, nb_subjects, repeat, memo_size):
+    """
+    Runs the benchmark for the given number of filters
+
+    :return: A (scan time, index time) tuple, in seconds per look up
+    """
+    rand = random.Random(nb_filters)
+    filters = make_filters(nb_filters, rand)
+    subjects = make_subjects(filters, nb_subjects, rand)
+
+    # Former implementation: compiled regex -> listeners
+    regexes = {}
+    index = SubjectIndex(memo_size)
+    for idx, fn_filter in enumerate(filters):
+        listener = "listener-{0}".format(idx % 20)
+        regexes.setdefault(re.compile(fnmatch.translate(fn_filter),
+                                      re.IGNORECASE), set()).add(listener)
+        index.add(fn_filter, listener)
+
+    def scan():
+        for subject in subjects:
+            result = set()
+            for re_filter, re_listeners in regexes.items():
+                if re_filter.match(subject) is not None:
+                    result.update(re_listeners)
+
+    def indexed():
+        for subject in subjects:
+            index.match(subject)
+
+    nb_lookups = len(subjects)
+    scan_time = min(timeit.repeat(scan, number=1, repeat=repeat))
+    index_time = min(timeit.repeat(indexed, number=1, repeat=repeat))
+    return scan_time / nb_lookups, index_time / nb_lookups
+
+
+def main(argv=None):
+    """
+    Entry point
+
+    :param argv: Program arguments
+    """
+    parser = argparse.ArgumentParser(description="Herald dispatch benchmark")
+    parser.add_argument("-n", "--subjects", type=int, default=5000,
+                        help="Number of subjects to look up per round")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="Number of rounds")
+    parser.add_argument("-m", "--memo", type=int, default=1024,
+                        help="Size of the look up memo (0 to disable)")
+    parser.add_argument("filters", type=int, nargs="*",
+                        default=[10, 100, 1000],
+                        help="Numbers of listener filters to test")
+    args = parser.parse_args(argv)
+
+    print("{0:>8} | {1:>12} | {2:>12} | {3:>8}"
+          .format("filters", "scan (us)", "index (us)", "speedup"))
+    for nb_filters in args.filters:
+        scan_time, index_time = bench(nb_filters, args.subjects, args.repeat,
+                                      args.memo)
+        print("{0:>8} | {1:>12.2f} | {2:>12.2f} | {3:>7.1f}x"
+              .format(nb_filters, scan_time * 1e6, index_time * 1e6,
+                      scan_time / index_time))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
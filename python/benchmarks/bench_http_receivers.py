@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Benchmark of the HTTP receivers: the servlet, hosted by the Pelix basic HTTP
+service (a thread per connection), and the asyncio-based receiver. Many
+concurrent clients post messages on persistent connections; the throughput
+and the number of threads of the process are measured.
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard library
+from __future__ import print_function
+import argparse
+import http.client
+import sys
+import threading
+import time
+
+# Herald
+import herald
+import herald.beans as beans
+import herald.utils as utils
+from herald.transports.http import CONTENT_TYPE_JSON, MESSAGE_HEADER_PORT, \
+    MESSAGE_HEADER_PATH
+from herald.transports.http.async_receiver import AsyncHttpReceiver
+from herald.transports.http.servlet import HeraldServlet
+
+# Pelix
+import pelix.framework
+import pelix.http
+from pelix.ipopo.constants import use_ipopo
+
+# ------------------------------------------------------------------------------
+
+
+class FakeDirectory(object):
+    """
+    Fake Herald directory
+    """
+    def __init__(self, uid):
+        self.local_uid = uid
+        self.local_peer = beans.Peer(uid, "node", "app", ["all"], None)
+
+    def get_local_peer(self):
+        return self.local_peer
+
+
+class FakeHttpDirectory(object):
+    """
+    Fake HTTP transport directory: all peers are unknown
+    """
+    def check_access(self, uid, host, port):
+        raise ValueError("Unknown peer: {0}".format(uid))
+
+
+class CountingCore(object):
+    """
+    Fake Herald core: counts the received messages
+    """
+    def __init__(self, count):
+        self.count = count
+        self.received = 0
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+
+    def handle_message(self, message):
+        with self.lock:
+            self.received += 1
+            if self.received == self.count:
+                self.event.set()
+
+
+class FakeProbe(object):
+    """
+    Fake debug probe
+    """
+    def store(self, channel, data):
+        pass
+
+
+def setup(receiver, count):
+    """
+    Injects the fake services in a receiver
+    """
+    receiver._core = CountingCore(count)
+    receiver._directory = FakeDirectory("bench")
+    receiver._http_directory = FakeHttpDirectory()
+    receiver._probe = FakeProbe()
+    return receiver
+
+
+def client(port, body, count, errors):
+    """
+    Posts the given message count times on a persistent connection
+    """
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    headers = {"content-type": CONTENT_TYPE_JSON}
+    try:
+        for _ in range(count):
+            conn.request("POST", "/herald", body, headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+    except Exception as ex:
+        errors.append(ex)
+    finally:
+        conn.close()
+
+
+def measure(receiver, port, clients, messages):
+    """
+    Runs the clients against a receiver
+
+    :return: A (messages per second, maximum number of threads of the
+             receiver, number of errors) tuple
+    """
+    envelope = {herald.MESSAGE_HEADER_SENDER_UID: "client",
+                MESSAGE_HEADER_PORT: 8080, MESSAGE_HEADER_PATH: "/herald"}
+    body = utils.to_json(beans.Message("bench/subject", {"value": 42}),
+                         envelope)
+
+    errors = []
+    threads = [threading.Thread(target=client,
+                                args=(port, body, messages, errors))
+               for _ in range(clients)]
+
+    # Client threads are started before the measure
+    max_threads = 0
+    start = time.time()
+    for thread in threads:
+        thread.start()
+
+    while not receiver._core.event.wait(.1):
+        # Don't count the client threads
+        alive = sum(1 for thread in threads if thread.is_alive())
+        max_threads = max(max_threads, threading.active_count() - alive)
+        if not alive:
+            break
+    duration = time.time() - start
+
+    for thread in threads:
+        thread.join()
+
+    return receiver._core.received / duration, max_threads, len(errors)
+
+
+def bench_servlet(clients, messages):
+    """
+    Benchmarks the servlet in the Pelix basic HTTP service
+    """
+    framework = pelix.framework.create_framework(
+        ("pelix.ipopo.core", "pelix.http.basic"))
+    framework.start()
+    try:
+        with use_ipopo(framework.get_bundle_context()) as ipopo:
+            ipopo.instantiate(pelix.http.FACTORY_HTTP_BASIC, "http-server",
+                              {pelix.http.HTTP_SERVICE_ADDRESS: "127.0.0.1",
+                               pelix.http.HTTP_SERVICE_PORT: 0})
+
+        context = framework.get_bundle_context()
+        svc_ref = context.get_service_reference(pelix.http.HTTP_SERVICE)
+        http_svc = context.get_service(svc_ref)
+
+        servlet = setup(HeraldServlet(), clients * messages)
+        servlet._servlet_path = "/herald"
+        servlet.validate(None)
+        http_svc.register_servlet("/herald", servlet)
+        return measure(servlet, http_svc.get_access()[1], clients, messages)
+    finally:
+        framework.stop()
+        pelix.framework.FrameworkFactory.delete_framework()
+
+
+def bench_async(clients, messages):
+    """
+    Benchmarks the asyncio-based receiver
+    """
+    receiver = setup(AsyncHttpReceiver(), clients * messages)
+    receiver._host = "127.0.0.1"
+    receiver._port = 0
+    receiver._validate(None)
+    try:
+        return measure(receiver, receiver.get_access_info()[1], clients,
+                       messages)
+    finally:
+        receiver._invalidate(None)
+
+
+def main(argv=None):
+    """
+    Entry point
+
+    :param argv: Program arguments
+    """
+    parser = argparse.ArgumentParser(description="HTTP receivers benchmark")
+    parser.add_argument("-c", "--clients", type=int, default=500,
+                        help="Number of concurrent clients")
+    parser.add_argument("-m", "--messages", type=int, default=10,
+                        help="Number of messages per client")
+    args = parser.parse_args(argv)
+
+    print("{0:>8} | {1:>12} | {2:>8} | {3:>6}"
+          .format("receiver", "messages/s", "threads", "errors"))
+    for name, method in (("servlet", bench_servlet),
+                         ("asyncio", bench_async)):
+        rate, threads, errors = method(args.clients, args.messages)
+        print("{0:>8} | {1:>12.0f} | {2:>8} | {3:>6}"
+              .format(name, rate, threads, errors))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Benchmark of the stream transports: throughput of the messages sent from a
+peer to another one in the same process, over the TCP loopback and Unix
+domain sockets. Sent messages are decoded by the receiving transport and
+given to a fake core.
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Standard library
+from __future__ import print_function
+import argparse
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+# Herald
+import herald.beans as beans
+from herald.transports.tcp.transport import TCPTransport
+from herald.transports.uds import ACCESS_ID as UDS_ACCESS_ID
+from herald.transports.uds.transport import UDSTransport
+
+# ------------------------------------------------------------------------------
+
+
+class FakeDirectory(object):
+    """
+    Fake Herald directory
+    """
+    def __init__(self, uid):
+        self.local_uid = uid
+        self.local_peer = beans.Peer(uid, "node", "app", ["all"], None)
+
+    def get_local_peer(self):
+        return self.local_peer
+
+
+class FakeUDSDirectory(object):
+    """
+    Fake UDS transport directory
+    """
+    def __init__(self):
+        self.paths = {}
+
+    def get_path(self, uid):
+        return self.paths.get(uid)
+
+
+class CountingCore(object):
+    """
+    Fake Herald core: counts the received messages
+    """
+    def __init__(self, count):
+        self.count = count
+        self.received = 0
+        self.event = threading.Event()
+
+    def handle_message(self, message):
+        self.received += 1
+        if self.received == self.count:
+            self.event.set()
+
+
+class FakeProbe(object):
+    """
+    Fake debug probe
+    """
+    def store(self, channel, data):
+        pass
+
+
+def make_transport(factory, uid, count, **props):
+    """
+    Prepares and validates a transport
+    """
+    transport = factory()
+    transport._core = CountingCore(count)
+    transport._directory = FakeDirectory(uid)
+    transport._probe = FakeProbe()
+    for key, value in props.items():
+        setattr(transport, key, value)
+    transport._validate(None)
+    return transport
+
+
+def measure(sender, receiver, count, size):
+    """
+    Sends the given number of messages and waits for their reception
+
+    :return: The number of messages per second
+    """
+    peer = receiver._directory.local_peer
+    content = "x" * size
+    start = time.time()
+    for _ in range(count):
+        sender.fire(peer, beans.Message("bench/subject", content))
+    receiver._core.event.wait(60)
+    return count / (time.time() - start)
+
+
+def main(argv=None):
+    """
+    Entry point
+
+    :param argv: Program arguments
+    """
+    parser = argparse.ArgumentParser(description="Herald transports benchmark")
+    parser.add_argument("-m", "--messages", type=int, default=20000,
+                        help="Number of messages")
+    parser.add_argument("-s", "--size", type=int, default=64,
+                        help="Size of the content of the messages")
+    args = parser.parse_args(argv)
+
+    print("{0:>10} | {1:>12}".format("transport", "messages/s"))
+
+    sender = make_transport(TCPTransport, "A", args.messages,
+                            _host="127.0.0.1")
+    receiver = make_transport(TCPTransport, "B", args.messages,
+                              _host="127.0.0.1")
+    try:
+        print("{0:>10} | {1:>12.0f}".format(
+            "tcp", measure(sender, receiver, args.messages, args.size)))
+    finally:
+        sender._invalidate(None)
+        receiver._invalidate(None)
+
+    if hasattr(socket, 'AF_UNIX'):
+        folder = tempfile.mkdtemp()
+        sender = make_transport(UDSTransport, "A", args.messages,
+                                _folder=folder,
+                                _uds_directory=FakeUDSDirectory())
+        receiver = make_transport(UDSTransport, "B", args.messages,
+                                  _folder=folder,
+                                  _uds_directory=FakeUDSDirectory())
+        sender._uds_directory.paths["B"] = \
+            receiver._directory.local_peer.get_access(UDS_ACCESS_ID).path
+        try:
+            print("{0:>10} | {1:>12.0f}".format(
+                "uds", measure(sender, receiver, args.messages, args.size)))
+        finally:
+            sender._invalidate(None)
+            receiver._invalidate(None)
+            shutil.rmtree(folder)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -176,6 +176,78 @@ PROP_FILTERS = "herald.filters"
 A set of filename patterns to filter messages
 """
 
+# ------------------------------------------------------------------------------
+# Herald core component properties
+
+PROP_DEDUP_WINDOW = "herald.dedup.window"
+"""
+Time (in seconds) during which the UID of a received message is remembered,
+to ignore the copies of this message received by other transports.
+"""
+
+PROP_DEDUP_SIZE = "herald.dedup.size"
+"""
+Maximum number of received message UIDs remembered (0 for no limit).
+Bounds the memory used by the duplicate messages filter.
+"""
+
+PROP_DISPATCH_WORKERS = "herald.dispatch.workers"
+"""
+Number of threads notifying message listeners
+"""
+
+PROP_QUEUE_SIZE = "herald.queue.size"
+"""
+Maximum number of messages waiting to be notified to a listener (0 for no
+limit). Set on the Herald core component, it gives the default value for all
+listeners; set on a message listener service, it overrides it.
+"""
+
+PROP_QUEUE_POLICY = "herald.queue.policy"
+"""
+Policy applied when the queue of a listener is full: "block" (the transport
+waits for a free slot), "drop-oldest", "drop-newest" or "reject" (an
+"herald/error/overloaded" message is sent back to the sender). Set on the
+Herald core component or on a message listener service, like
+PROP_QUEUE_SIZE.
+"""
+
+PROP_PRIORITIES = "herald.priorities"
+"""
+Dictionary associating subject filters to a priority, used by the Herald core
+to notify listeners and by the transports to send messages. A priority is an
+integer, or one of "high", "normal" and "low". Subjects matching no filter
+have the normal priority. By default, directory and error messages have the
+high priority.
+"""
+
+PROP_ORDER_KEY = "herald.order.key"
+"""
+Ordering key of the messages notified to a listener (message listener service
+property). Messages with the same key are notified one at a time, in their
+order of reception, while messages with different keys are notified
+concurrently. Supported values are:
+
+* "sender": the UID of the sender peer,
+* "subject": the subject of the message,
+* "header:<name>": the value of the given message header,
+* "content:<field>": the value of the given field of a dictionary content.
+
+If not set, messages are notified in no particular order.
+"""
+
+PROP_HEALTH_FAILURES = "herald.health.failures"
+"""
+Number of consecutive send failures after which the access of a peer is
+avoided (its circuit breaker is opened).
+"""
+
+PROP_HEALTH_DELAY = "herald.health.delay"
+"""
+Time (in seconds) before trying again an access of a peer which circuit
+breaker has been opened.
+"""
+
 # ------------------------------------------------------------------------------
 # Framework properties
 
@@ -36,7 +36,6 @@ __version__=herald.version.__version__
 import functools
 import threading
 import time
-import uuid
 import json
 
 # import herald module to use constantes
@@ -45,12 +44,27 @@ import herald.utils as utils
 
 # ------------------------------------------------------------------------------
 
+_CONTENT_LOCK = threading.Lock()
+""" Protects the lazy decoding of the content of received messages """
+
+_PEER_LOCKS = tuple(threading.RLock() for _ in range(64))
+"""
+Locks shared by Peer beans, according to the hash of their UID: avoids to
+create a lock per peer
+"""
+
+# ------------------------------------------------------------------------------
+
 
 @functools.total_ordering
 class Peer(object):
     """
     Represents a peer in Herald
     """
+    __slots__ = ('__uid', '__name', '__node', '__node_name', '__app_id',
+                 '__groups', '__codecs', '__accesses', '__directory',
+                 '__lock')
+
     def __init__(self, uid, node_uid, app_id, groups, directory):
         """
         Sets up the peer
@@ -71,9 +85,10 @@ class Peer(object):
         self.__node_name = self.__node
         self.__app_id = app_id
         self.__groups = set(groups or [])
+        self.__codecs = ("json",)
         self.__accesses = {}
         self.__directory = directory
-        self.__lock = threading.RLock()
+        self.__lock = _PEER_LOCKS[hash(uid) % len(_PEER_LOCKS)]
 
     def __repr__(self):
         """
@@ -172,6 +187,24 @@ class Peer(object):
         """
         return self.__groups.copy()
 
+    @property
+    def codecs(self):
+        """
+        Retrieves the names of the message codecs supported by the peer, by
+        order of preference
+        """
+        return self.__codecs
+
+    @codecs.setter
+    def codecs(self, value):
+        """
+        Sets the message codecs supported by the peer. Peers which don't
+        advertise their codecs only support JSON.
+
+        :param value: A list of codec names
+        """
+        self.__codecs = tuple(value or ("json",))
+
     def __callback(self, method_name, *args):
         """
         Calls back the associated directory
@@ -198,6 +231,7 @@ class Peer(object):
         dump = {name: getattr(self, name)
                 for name in ('uid', 'name', 'node_uid', 'node_name',
                              'app_id', 'groups')}
+        dump['codecs'] = list(self.__codecs)
 
         # Accesses
         dump['accesses'] = {access: data.dump()
@@ -395,6 +429,73 @@ class DelayedNotification(object):
             return True
         return False
 
+
+class GroupResult(object):
+    """
+    Result of a request sent to a group of peers, see Herald.send_group()
+    """
+    def __init__(self, group, replies, errors, missing, unreached):
+        """
+        Sets up the bean
+
+        :param group: The targeted group
+        :param replies: Peer UID -> reply (MessageReceived bean)
+        :param errors: Peer UID -> exception
+        :param missing: UIDs of the reached peers which didn't reply in time
+        :param unreached: UIDs of the peers which couldn't be contacted
+        """
+        self.__group = group
+        self.__replies = replies
+        self.__errors = errors
+        self.__missing = missing
+        self.__unreached = unreached
+
+    def __str__(self):
+        """
+        String representation
+        """
+        return "GroupResult({0}, {1} replies, {2} errors, {3} missing, " \
+               "{4} unreached)".format(self.__group, len(self.__replies),
+                                       len(self.__errors), len(self.__missing),
+                                       len(self.__unreached))
+
+    __repr__ = __str__
+
+    @property
+    def group(self):
+        """
+        The targeted group
+        """
+        return self.__group
+
+    @property
+    def replies(self):
+        """
+        Dictionary: Peer UID -> reply message
+        """
+        return self.__replies
+
+    @property
+    def errors(self):
+        """
+        Dictionary: Peer UID -> exception (no listener, peer lost, ...)
+        """
+        return self.__errors
+
+    @property
+    def missing(self):
+        """
+        Set of the UIDs of the reached peers which didn't reply in time
+        """
+        return self.__missing
+
+    @property
+    def unreached(self):
+        """
+        Set of the UIDs of the peers which couldn't be contacted
+        """
+        return self.__unreached
+
 # ------------------------------------------------------------------------------
 
 
@@ -402,6 +503,8 @@ class Message(object):
     """
     Represents a message to be sent
     """
+    __slots__ = ('_subject', '_content', '_headers', '_metadata', '_encoded')
+
     def __init__(self, subject, content=None):
         """
         Sets up members
@@ -411,13 +514,17 @@ class Message(object):
         """
         self._subject = subject
         self._content = content
-        
-        self._headers = {}
-        self._headers[herald.MESSAGE_HERALD_VERSION] = herald.HERALD_SPECIFICATION_VERSION
-        self._headers[herald.MESSAGE_HEADER_TIMESTAMP] = int(time.time() * 1000) 
-        self._headers[herald.MESSAGE_HEADER_UID] = str(uuid.uuid4()).replace('-', '').upper()
-        
-        self._metadata = {}  
+
+        self._headers = {
+            herald.MESSAGE_HERALD_VERSION: herald.HERALD_SPECIFICATION_VERSION,
+            herald.MESSAGE_HEADER_TIMESTAMP: int(time.time() * 1000),
+            herald.MESSAGE_HEADER_UID: utils.generate_uid()}
+
+        # Created on first use
+        self._metadata = None
+
+        # Codec name -> cached encoded subject, content and metadata
+        self._encoded = None
 
     def __str__(self):
         """
@@ -465,6 +572,8 @@ class Message(object):
         """
         Message metadata
         """
+        if self._metadata is None:
+            self._metadata = {}
         return self._metadata
 
     def add_header(self, key, value):
@@ -493,18 +602,20 @@ class Message(object):
         Set content
         """
         self._content = content
-        
+        self._encoded = None
+
     def add_metadata(self, key, value):
         """
         Adds a metadata
         """
-        self._metadata[key] = value
+        self.metadata[key] = value
+        self._encoded = None
         
     def get_metadata(self, key):
         """
         Gets a metadata
         """
-        if key in self._metadata:
+        if self._metadata and key in self._metadata:
             return self._metadata[key]
         return None
         
@@ -512,14 +623,45 @@ class Message(object):
         """
         Removes a metadata 
         """
-        if key in self._metadata:
+        if self._metadata and key in self._metadata:
             del self._metadata[key]
-            
+            self._encoded = None
+
+    def get_encoded(self, codec_name):
+        """
+        Returns the cached representation of the subject, content and
+        metadata of this message, as encoded by the given codec.
+
+        The cache is cleared by set_content() and add_metadata(): the content
+        must not be modified in place once the message has been sent.
+
+        :param codec_name: Name of a codec
+        :return: The cached data, or None
+        """
+        if self._encoded is not None:
+            return self._encoded.get(codec_name)
+        return None
+
+    def set_encoded(self, codec_name, data):
+        """
+        Caches the encoded representation of the subject, content and
+        metadata of this message
+
+        :param codec_name: Name of a codec
+        :param data: The encoded data
+        """
+        if self._encoded is None:
+            self._encoded = {}
+        self._encoded[codec_name] = data
+
             
 class MessageReceived(Message):
     """
     Represents a message received by a transport
     """
+    __slots__ = ('_access', '_extra', '_content_loader', '_payload',
+                 '_payload_codec')
+
     def __init__(self, uid, subject, content, sender_uid, reply_to, access,
                  timestamp=None, extra=None):
         """
@@ -534,13 +676,26 @@ class MessageReceived(Message):
         :param timestamp: Message sending time stamp
         :param extra: Extra configuration for the transport in case of reply
         """
-        Message.__init__(self, subject, content)
-        self._headers[herald.MESSAGE_HEADER_UID] = uid
-        self._headers[herald.MESSAGE_HEADER_SENDER_UID] = sender_uid
-        self._headers[herald.MESSAGE_HEADER_REPLIES_TO] = reply_to
+        # Don't call the parent constructor: it would generate a UID
+        self._subject = subject
+        self._content = content
+        self._headers = {
+            herald.MESSAGE_HERALD_VERSION: herald.HERALD_SPECIFICATION_VERSION,
+            herald.MESSAGE_HEADER_UID: uid,
+            herald.MESSAGE_HEADER_SENDER_UID: sender_uid,
+            herald.MESSAGE_HEADER_REPLIES_TO: reply_to,
+            herald.MESSAGE_HEADER_TIMESTAMP: timestamp}
+        self._metadata = None
+        self._encoded = None
         self._access = access
         self._extra = extra
-        self._headers[herald.MESSAGE_HEADER_TIMESTAMP] = timestamp
+
+        # Lazy decoding of the content
+        self._content_loader = None
+
+        # Message as received, and name of the codec used to encode it
+        self._payload = None
+        self._payload_codec = None
 
     def __str__(self):
         """
@@ -549,6 +704,21 @@ class MessageReceived(Message):
         return "{0} ({1}) from {2}".format(self._subject, self.uid,
                                            self.sender)
 
+    @property
+    def content(self):
+        """
+        The content of the message, decoded on first access
+        """
+        loader = self._content_loader
+        if loader is not None:
+            content = loader()
+            with _CONTENT_LOCK:
+                # Another thread might have decoded the content meanwhile
+                if self._content_loader is loader:
+                    self._content = content
+                    self._content_loader = None
+        return self._content
+
     @property
     def access(self):
         """
@@ -577,6 +747,53 @@ class MessageReceived(Message):
         """
         return self._extra
 
+    @property
+    def payload(self):
+        """
+        The message as received by the transport (None if unknown), i.e.
+        before any header update. Allows to forward it without encoding it
+        again.
+        """
+        return self._payload
+
+    @property
+    def payload_codec(self):
+        """
+        Name of the codec used to encode the payload
+        """
+        return self._payload_codec
+
+    def set_content(self, content):
+        """
+        Set content
+        """
+        with _CONTENT_LOCK:
+            self._content_loader = None
+            self._content = content
+            self._encoded = None
+
+    def set_content_loader(self, loader):
+        """
+        Sets the method which will decode the content the first time it is
+        read. The message routing only relies on its headers: this avoids
+        to decode the content of duplicates or of unhandled messages.
+
+        :param loader: A method without argument, returning the content
+        """
+        with _CONTENT_LOCK:
+            self._content_loader = loader
+            self._content = None
+
+    def set_payload(self, codec_name, payload):
+        """
+        Stores the message as received
+
+        :param codec_name: Name of the codec used to encode the payload
+        :param payload: The encoded message
+        """
+        self._payload_codec = codec_name
+        self._payload = payload
+
     def set_access(self, access):
         """
         Sets the access
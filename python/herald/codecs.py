@@ -0,0 +1,702 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald message codecs: converts messages to and from their wire format.
+
+Two codecs are provided: the historical JSON+Jabsorb format, understood by
+all peers (including Java ones), and a compact binary format for Python
+peers. Peers advertise the codecs they support in their description.
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald
+import herald
+import herald.beans as beans
+import herald.utils as utils
+
+# Standard library
+import functools
+import logging
+import struct
+import sys
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+
+CODEC_JSON = "json"
+""" Name of the JSON+Jabsorb codec """
+
+CODEC_BINARY = "binary"
+""" Name of the binary codec """
+
+CONTENT_TYPE_JSON = "application/json"
+""" MIME type of the JSON+Jabsorb codec """
+
+CONTENT_TYPE_BINARY = "application/x-herald-binary"
+""" MIME type of the binary codec """
+
+LEGACY_CODECS = (CODEC_JSON,)
+""" Codecs supported by peers which don't advertise them """
+
+# ------------------------------------------------------------------------------
+
+
+class JsonCodec(object):
+    """
+    The JSON+Jabsorb codec, supported by all peers
+    """
+    name = CODEC_JSON
+    content_type = CONTENT_TYPE_JSON
+
+    @staticmethod
+    def encode(message, envelope=None):
+        """
+        Converts a message to a JSON string
+
+        :param message: A Message bean
+        :param envelope: Headers added to those of the message (optional)
+        :return: A JSON string
+        """
+        return utils.to_json(message, envelope)
+
+    @staticmethod
+    def decode(data):
+        """
+        Converts a JSON string to a message
+
+        :param data: A JSON string
+        :return: A MessageReceived bean, or None if the data is invalid
+        """
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return utils.from_json(data)
+
+# ------------------------------------------------------------------------------
+
+if sys.version_info[0] < 3:
+    # Python 2: native strings are handled as bytes
+    # pylint: disable=C0103,E0602
+    _TEXT_TYPE = unicode
+    _INT_TYPES = (int, long)
+else:
+    _TEXT_TYPE = str
+    _INT_TYPES = (int,)
+
+_MAGIC = b"HB\x01"
+""" Binary format magic header: 'HB' and format version """
+
+_INTERNED = (herald.MESSAGE_HERALD_VERSION, herald.MESSAGE_HEADER_UID,
+             herald.MESSAGE_HEADER_TIMESTAMP, herald.MESSAGE_HEADER_SENDER_UID,
+             herald.MESSAGE_HEADER_TARGET_PEER,
+             herald.MESSAGE_HEADER_TARGET_GROUP,
+             herald.MESSAGE_HEADER_REPLIES_TO,
+             "herald-http-tansport-port", "herald-http-tansport-path",
+             "uid", "name", "node_uid", "node_name", "app_id", "groups",
+             "accesses", "codecs", "javaClass", "value", "all")
+"""
+Strings encoded as an index (header keys, common content keys). This table
+is part of the binary format: it can only be extended along with the format
+version.
+"""
+
+_INTERNED_INDEX = dict((value, idx) for idx, value in enumerate(_INTERNED))
+
+# Value type tags
+_TAG_NONE = b"N"
+_TAG_TRUE = b"T"
+_TAG_FALSE = b"F"
+_TAG_INT = b"i"
+_TAG_INT32 = b"j"
+_TAG_BIG_INT = b"n"
+_TAG_FLOAT = b"d"
+_TAG_TEXT = b"s"
+_TAG_INTERNED = b"k"
+_TAG_BYTES = b"b"
+_TAG_LIST = b"l"
+_TAG_TUPLE = b"t"
+_TAG_SET = b"e"
+_TAG_DICT = b"m"
+
+_LENGTH = struct.Struct(">I")
+_INT = struct.Struct(">q")
+_INT32 = struct.Struct(">i")
+_FLOAT = struct.Struct(">d")
+_INTERNED_IDX = struct.Struct(">B")
+
+_INT_MIN = -2 ** 63
+_INT_MAX = 2 ** 63 - 1
+_INT32_MIN = -2 ** 31
+_INT32_MAX = 2 ** 31 - 1
+
+
+class BinaryCodec(object):
+    """
+    A compact binary codec, built on the struct module.
+
+    A message is encoded as the magic header followed by four values: the
+    subject, the headers, the metadata and the content. The content comes
+    last, so that it can be decoded only when it is read. Each value starts
+    with a type tag byte; strings, bytes and containers are prefixed by their
+    length; well-known strings (header keys, ...) are replaced by their index
+    in a table.
+
+    Only None, booleans, numbers, strings, bytes, lists, tuples, sets and
+    dictionaries can be encoded: other contents raise a TypeError and must be
+    sent with the JSON codec.
+    """
+    name = CODEC_BINARY
+    content_type = CONTENT_TYPE_BINARY
+
+    def __init__(self):
+        """
+        Sets up members
+        """
+        self.__encoders = {
+            type(None): self.__encode_none,
+            bool: self.__encode_bool,
+            float: self.__encode_float,
+            _TEXT_TYPE: self.__encode_text,
+            bytes: self.__encode_bytes,
+            list: self.__encode_list,
+            tuple: self.__encode_tuple,
+            set: self.__encode_set,
+            frozenset: self.__encode_set,
+            dict: self.__encode_dict,
+        }
+        for int_type in _INT_TYPES:
+            self.__encoders[int_type] = self.__encode_int
+
+        # Decoders are indexed by the type tag as read from the data
+        # (an integer in Python 3, a character in Python 2)
+        self.__decoders = dict((tag[0], decoder) for tag, decoder in (
+            (_TAG_NONE, self.__decode_none),
+            (_TAG_TRUE, self.__decode_true),
+            (_TAG_FALSE, self.__decode_false),
+            (_TAG_INT, self.__decode_int),
+            (_TAG_INT32, self.__decode_int32),
+            (_TAG_BIG_INT, self.__decode_big_int),
+            (_TAG_FLOAT, self.__decode_float),
+            (_TAG_TEXT, self.__decode_text),
+            (_TAG_INTERNED, self.__decode_interned),
+            (_TAG_BYTES, self.__decode_bytes),
+            (_TAG_LIST, self.__decode_list),
+            (_TAG_TUPLE, self.__decode_tuple),
+            (_TAG_SET, self.__decode_set),
+            (_TAG_DICT, self.__decode_dict)))
+
+    def encode(self, message, envelope=None):
+        """
+        Converts a message to its binary representation. The encoded metadata
+        and content are cached in the message.
+
+        :param message: A Message bean
+        :param envelope: Headers added to those of the message (optional)
+        :return: The encoded message (bytes)
+        :raise TypeError: The message contains a value which can't be encoded
+        """
+        body = message.get_encoded(self.name)
+        if body is None:
+            parts = []
+            self.__encode(message.metadata or {}, parts)
+            self.__encode(message.content, parts)
+            body = b"".join(parts)
+            message.set_encoded(self.name, body)
+
+        headers = message.headers or {}
+        if envelope:
+            headers = headers.copy()
+            headers.update(envelope)
+
+        parts = [_MAGIC]
+        self.__encode(message.subject, parts)
+        self.__encode(headers, parts)
+        parts.append(body)
+        return b"".join(parts)
+
+    def decode(self, data):
+        """
+        Converts a binary representation to a message
+
+        :param data: The encoded message (bytes)
+        :return: A MessageReceived bean, or None if the data is invalid
+        """
+        if not isinstance(data, bytes):
+            data = bytes(data)
+
+        if not data.startswith(_MAGIC):
+            _logger.error("Invalid binary message header")
+            return None
+
+        try:
+            offset = len(_MAGIC)
+            subject, offset = self.__decode(data, offset)
+            headers, offset = self.__decode(data, offset)
+            metadata, offset = self.__decode(data, offset)
+        except (KeyError, IndexError, ValueError, TypeError,
+                struct.error) as ex:
+            _logger.error("Invalid binary message: %s", ex)
+            return None
+
+        if headers.get(herald.MESSAGE_HERALD_VERSION) \
+                != herald.HERALD_SPECIFICATION_VERSION:
+            _logger.error("Herald specification of the received message is "
+                          "not supported!")
+            return None
+
+        msg = beans.MessageReceived(
+            uid=headers.get(herald.MESSAGE_HEADER_UID) or None,
+            subject=subject, content=None,
+            sender_uid=headers.get(herald.MESSAGE_HEADER_SENDER_UID) or None,
+            reply_to=headers.get(herald.MESSAGE_HEADER_REPLIES_TO) or None,
+            access=None,
+            timestamp=headers.get(herald.MESSAGE_HEADER_TIMESTAMP) or None)
+
+        # Other headers and metadata
+        msg_headers = msg.headers
+        for key, value in headers.items():
+            if key not in msg_headers:
+                msg_headers[key] = value
+        if metadata:
+            msg.metadata.update(metadata)
+
+        # The content is decoded on first access
+        msg.set_content_loader(
+            functools.partial(self.__decode_content, data, offset))
+        msg.set_payload(self.name, data)
+        return msg
+
+    def __decode_content(self, data, offset):
+        """
+        Decodes the content of a message, which is the last encoded value
+
+        :param data: Encoded message
+        :param offset: Offset of the content
+        :return: The decoded content
+        :raise ValueError: Invalid content
+        """
+        try:
+            content, offset = self.__decode(data, offset)
+        except (KeyError, IndexError, TypeError, struct.error) as ex:
+            raise ValueError("Invalid binary message content: {0}"
+                             .format(ex))
+
+        if offset != len(data):
+            raise ValueError("Invalid binary message content: trailing data")
+        return content
+
+    def __encode(self, value, parts):
+        """
+        Encodes a value
+
+        :param value: The value to encode
+        :param parts: The list of encoded parts
+        :raise TypeError: Unsupported value type
+        """
+        try:
+            encoder = self.__encoders[type(value)]
+        except KeyError:
+            raise TypeError("Can't encode a {0} in binary format"
+                            .format(type(value).__name__))
+        encoder(value, parts)
+
+    @staticmethod
+    def __encode_none(_, parts):
+        """
+        Encodes None
+        """
+        parts.append(_TAG_NONE)
+
+    @staticmethod
+    def __encode_bool(value, parts):
+        """
+        Encodes a boolean
+        """
+        parts.append(_TAG_TRUE if value else _TAG_FALSE)
+
+    @staticmethod
+    def __encode_int(value, parts):
+        """
+        Encodes an integer
+        """
+        if _INT32_MIN <= value <= _INT32_MAX:
+            parts.append(_TAG_INT32)
+            parts.append(_INT32.pack(value))
+        elif _INT_MIN <= value <= _INT_MAX:
+            parts.append(_TAG_INT)
+            parts.append(_INT.pack(value))
+        else:
+            data = str(value).encode('ascii')
+            parts.append(_TAG_BIG_INT)
+            parts.append(_LENGTH.pack(len(data)))
+            parts.append(data)
+
+    @staticmethod
+    def __encode_float(value, parts):
+        """
+        Encodes a float
+        """
+        parts.append(_TAG_FLOAT)
+        parts.append(_FLOAT.pack(value))
+
+    @staticmethod
+    def __encode_text(value, parts):
+        """
+        Encodes a string, or its index in the interned strings table
+        """
+        try:
+            idx = _INTERNED_INDEX[value]
+        except KeyError:
+            data = value.encode('utf-8')
+            parts.append(_TAG_TEXT)
+            parts.append(_LENGTH.pack(len(data)))
+            parts.append(data)
+        else:
+            parts.append(_TAG_INTERNED)
+            parts.append(_INTERNED_IDX.pack(idx))
+
+    @staticmethod
+    def __encode_bytes(value, parts):
+        """
+        Encodes an array of bytes
+        """
+        parts.append(_TAG_BYTES)
+        parts.append(_LENGTH.pack(len(value)))
+        parts.append(value)
+
+    def __encode_items(self, tag, values, parts):
+        """
+        Encodes the items of a sequence
+        """
+        parts.append(tag)
+        parts.append(_LENGTH.pack(len(values)))
+        for item in values:
+            self.__encode(item, parts)
+
+    def __encode_list(self, value, parts):
+        """
+        Encodes a list
+        """
+        self.__encode_items(_TAG_LIST, value, parts)
+
+    def __encode_tuple(self, value, parts):
+        """
+        Encodes a tuple
+        """
+        self.__encode_items(_TAG_TUPLE, value, parts)
+
+    def __encode_set(self, value, parts):
+        """
+        Encodes a set
+        """
+        self.__encode_items(_TAG_SET, value, parts)
+
+    def __encode_dict(self, value, parts):
+        """
+        Encodes a dictionary
+        """
+        parts.append(_TAG_DICT)
+        parts.append(_LENGTH.pack(len(value)))
+        for key, item in value.items():
+            self.__encode(key, parts)
+            self.__encode(item, parts)
+
+    def __decode(self, data, offset):
+        """
+        Decodes the value at the given offset
+
+        :param data: Encoded data
+        :param offset: Offset of the value type tag
+        :return: A (value, offset of the next value) tuple
+        :raise KeyError: Unknown type tag
+        """
+        return self.__decoders[data[offset]](data, offset + 1)
+
+    @staticmethod
+    def __decode_none(_, offset):
+        """
+        Decodes None
+        """
+        return None, offset
+
+    @staticmethod
+    def __decode_true(_, offset):
+        """
+        Decodes True
+        """
+        return True, offset
+
+    @staticmethod
+    def __decode_false(_, offset):
+        """
+        Decodes False
+        """
+        return False, offset
+
+    @staticmethod
+    def __decode_int(data, offset):
+        """
+        Decodes an integer
+        """
+        return _INT.unpack_from(data, offset)[0], offset + _INT.size
+
+    @staticmethod
+    def __decode_int32(data, offset):
+        """
+        Decodes a 32 bits integer
+        """
+        return _INT32.unpack_from(data, offset)[0], offset + _INT32.size
+
+    @staticmethod
+    def __read_data(data, offset):
+        """
+        Reads a length-prefixed array of bytes
+
+        :return: A (bytes, offset after the array) tuple
+        :raise ValueError: Truncated data
+        """
+        length = _LENGTH.unpack_from(data, offset)[0]
+        start = offset + _LENGTH.size
+        end = start + length
+        if end > len(data):
+            raise ValueError("Truncated data")
+        return data[start:end], end
+
+    def __decode_big_int(self, data, offset):
+        """
+        Decodes a big integer
+        """
+        value, offset = self.__read_data(data, offset)
+        return int(value.decode('ascii')), offset
+
+    @staticmethod
+    def __decode_float(data, offset):
+        """
+        Decodes a float
+        """
+        return _FLOAT.unpack_from(data, offset)[0], offset + _FLOAT.size
+
+    def __decode_text(self, data, offset):
+        """
+        Decodes a string
+        """
+        value, offset = self.__read_data(data, offset)
+        return value.decode('utf-8'), offset
+
+    @staticmethod
+    def __decode_interned(data, offset):
+        """
+        Decodes an interned string
+        """
+        idx = _INTERNED_IDX.unpack_from(data, offset)[0]
+        return _INTERNED[idx], offset + _INTERNED_IDX.size
+
+    def __decode_bytes(self, data, offset):
+        """
+        Decodes an array of bytes
+        """
+        return self.__read_data(data, offset)
+
+    def __decode_items(self, data, offset):
+        """
+        Decodes the items of a sequence
+
+        :return: A (list, offset after the sequence) tuple
+        """
+        count = _LENGTH.unpack_from(data, offset)[0]
+        offset += _LENGTH.size
+        items = []
+        for _ in range(count):
+            item, offset = self.__decode(data, offset)
+            items.append(item)
+        return items, offset
+
+    def __decode_list(self, data, offset):
+        """
+        Decodes a list
+        """
+        return self.__decode_items(data, offset)
+
+    def __decode_tuple(self, data, offset):
+        """
+        Decodes a tuple
+        """
+        items, offset = self.__decode_items(data, offset)
+        return tuple(items), offset
+
+    def __decode_set(self, data, offset):
+        """
+        Decodes a set
+        """
+        items, offset = self.__decode_items(data, offset)
+        return set(items), offset
+
+    def __decode_dict(self, data, offset):
+        """
+        Decodes a dictionary
+        """
+        count = _LENGTH.unpack_from(data, offset)[0]
+        offset += _LENGTH.size
+        result = {}
+        for _ in range(count):
+            key, offset = self.__decode(data, offset)
+            result[key], offset = self.__decode(data, offset)
+        return result, offset
+
+# ------------------------------------------------------------------------------
+
+# Registered codecs, by order of preference
+_CODECS = []
+
+
+def register_codec(codec, preferred=False):
+    """
+    Registers a codec. A codec has a name and a content_type attributes, and
+    encode(message) and decode(data) methods.
+
+    :param codec: A codec object
+    :param preferred: If True, the codec is preferred to the registered ones
+    :raise ValueError: A codec with the same name is already registered
+    """
+    if get_codec(codec.name) is not None:
+        raise ValueError("Already registered codec: {0}".format(codec.name))
+
+    if preferred:
+        _CODECS.insert(0, codec)
+    else:
+        _CODECS.append(codec)
+
+
+def unregister_codec(name):
+    """
+    Unregisters a codec
+
+    :param name: Name of the codec
+    :return: True if the codec was registered
+    """
+    codec = get_codec(name)
+    if codec is None or name == CODEC_JSON:
+        # The JSON codec is always available
+        return False
+
+    _CODECS.remove(codec)
+    return True
+
+
+def get_codec(name):
+    """
+    Returns the codec with the given name
+
+    :param name: Name of a codec
+    :return: The codec, or None
+    """
+    for codec in _CODECS:
+        if codec.name == name:
+            return codec
+    return None
+
+
+def get_codec_for(content_type):
+    """
+    Returns the codec associated to the given content type
+
+    :param content_type: A MIME type
+    :return: The codec, or None
+    """
+    if content_type:
+        # Ignore the parameters of the content type
+        content_type = content_type.split(';', 1)[0].strip().lower()
+        for codec in _CODECS:
+            if codec.content_type == content_type:
+                return codec
+    return None
+
+
+def get_codecs_names():
+    """
+    Returns the names of the registered codecs, by order of preference
+
+    :return: A tuple of codec names
+    """
+    return tuple(codec.name for codec in _CODECS)
+
+
+def negotiate(*peers):
+    """
+    Returns the preferred codec supported by all the given peers.
+    Falls back to the JSON codec.
+
+    :param peers: Peer beans
+    :return: A codec
+    """
+    supported = None
+    for peer in peers:
+        codecs = set(peer.codecs if peer is not None else LEGACY_CODECS)
+        if supported is None:
+            supported = codecs
+        else:
+            supported.intersection_update(codecs)
+
+    if supported:
+        for codec in _CODECS:
+            if codec.name in supported:
+                return codec
+
+    return _JSON_CODEC
+
+
+def encode(message, peers=None, envelope=None):
+    """
+    Encodes a message with the preferred codec supported by all the given
+    peers. If the message can't be encoded by this codec, the JSON codec is
+    used.
+
+    :param message: A Message bean
+    :param peers: Target peer beans
+    :param envelope: Headers added to those of the message, e.g. the target
+                     peer (optional)
+    :return: A (codec, encoded message) tuple
+    """
+    codec = negotiate(*(peers or ()))
+    if codec is not _JSON_CODEC:
+        try:
+            return codec, codec.encode(message, envelope)
+        except (TypeError, ValueError) as ex:
+            _logger.debug("Can't encode %s with codec %s: %s",
+                          message.uid, codec.name, ex)
+
+    return _JSON_CODEC, _JSON_CODEC.encode(message, envelope)
+
+
+_JSON_CODEC = JsonCodec()
+register_codec(BinaryCodec())
+register_codec(_JSON_CODEC)
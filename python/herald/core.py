@@ -34,8 +34,13 @@ __version__=herald.version.__version__
 
 # Herald
 from herald.exceptions import InvalidPeerAccess, NoTransport, HeraldTimeout, \
-    NoListener, ForgotMessage, PeerLost
-from herald.utils import LoopTimer
+    NoListener, ForgotMessage, PeerLost, Overloaded
+from herald.dedup import DuplicateFilter
+from herald.dispatch import Dispatcher, PriorityMap, SubjectIndex, \
+    normalize_pattern
+import herald.dispatch
+from herald.health import HealthTable
+from herald.pending import PendingRegistry
 import herald
 import herald.beans as beans
 import herald.probe
@@ -43,16 +48,14 @@ import herald.probe
 # Pelix
 from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
     Validate, Invalidate, Instantiate, RequiresMap, BindField, UpdateField, \
-    UnbindField
+    UnbindField, Property
 import pelix.constants
-import pelix.threadpool
 import pelix.utilities
 
 # Standard library
-import fnmatch
+import concurrent.futures
 import itertools
 import logging
-import re
 import threading
 import time
 
@@ -93,45 +96,95 @@ class _BundleActivator(object):
 # ------------------------------------------------------------------------------
 
 
-class _WaitingSend(pelix.utilities.EventData):
+class _WaitingFuture(object):
     """
-    A bean that describes a waiting send() call
+    A bean that describes a waiting send_async() call: its future is resolved
+    by the first reply
     """
-    def __init__(self, peer, msg_uid):
+    def __init__(self, peer, message):
         """
-        Sets up the bean
+        Sets up members
+
+        :param peer: Bean of the target peer
+        :param message: The sent message
         """
-        super(_WaitingSend, self).__init__()
         self.peer = peer
-        self.msg_uid = msg_uid
+        self.message = message
+        self.future = concurrent.futures.Future()
+        self.sent = time.time()
+
+    @property
+    def forget_on_first(self):
+        """
+        A future is resolved by the first reply
+        """
+        return True
+
+    def __resolve(self, method, value):
+        """
+        Sets the result or the exception of the future, if it is not already
+        done or cancelled
+
+        :param method: Future method to call
+        :param value: Result or exception
+        """
+        if not self.future.done():
+            try:
+                method(value)
+            except Exception as ex:
+                # Cancelled or resolved meanwhile
+                _logger.debug("Future of %s already done: %s",
+                              self.message.uid, ex)
+
+    def callback(self, _, message):
+        """
+        Sets the reply as the result of the future
+
+        :param _: Herald service instance
+        :param message: Received answer message
+        """
+        self.__resolve(self.future.set_result, message)
+
+    def errback(self, _, exception):
+        """
+        Sets the exception of the future
+
+        :param _: Herald service instance
+        :param exception: An exception describing/caused by the error
+        """
+        self.__resolve(self.future.set_exception, exception)
+
+    def timed_out(self, herald_svc):
+        """
+        The timeout has been reached before a reply was received
+
+        :param herald_svc: Herald service instance
+        """
+        self.errback(herald_svc, HeraldTimeout(
+            beans.Target(uid=self.peer.uid),
+            "Timeout reached before receiving a reply", self.message))
 
 
 class _WaitingPost(object):
     """
     A bean that describes parameters of a post() call
     """
-    def __init__(self, callback, errback, timeout, forget_on_first, peer=None):
+    def __init__(self, callback, errback, forget_on_first, peer=None):
         """
         Sets up members
 
         :param callback: Method to call back when an answer is received
         :param errback: Method to call back on error
-        :param timeout: Time to wait before forgetting this post, in seconds
-                        (<= 0 or None for never)
         :param forget_on_first: If True, forget this post after the first
                                 answer
         :param peer: Bean of the target peer, in single-target mode
         """
         self.peer = peer
+        self.sent = time.time()
         self.__callback = callback
         self.__errback = errback
         self.__forget_on_first = forget_on_first
 
-        if timeout is not None and timeout > 0:
-            self.__deadline = time.time() + timeout
-        else:
-            self.__deadline = None
-
     @property
     def forget_on_first(self):
         """
@@ -139,16 +192,13 @@ class _WaitingPost(object):
         """
         return self.__forget_on_first
 
-    def is_dead(self):
+    def timed_out(self, herald_svc):
         """
-        Checks if the deadline has been reached
+        The timeout of the post has been reached: the post is simply forgotten
 
-        :return: True if this message can be forgotten
+        :param herald_svc: Herald service instance
         """
-        if self.__deadline is not None:
-            return self.__deadline > time.time()
-        else:
-            return False
+        pass
 
     def callback(self, herald_svc, message):
         """
@@ -181,6 +231,152 @@ class _WaitingPost(object):
                 _logger.exception("Error calling errback: %s", ex)
 
 
+class _WaitingGroup(object):
+    """
+    A bean that describes a waiting send_group() call: its future is resolved
+    with a GroupResult bean when all the reached peers have replied, when the
+    quorum of replies is reached or when the timeout is reached.
+    """
+    def __init__(self, group, peers, message, quorum=None):
+        """
+        Sets up members
+
+        :param group: Name of the targeted group
+        :param peers: The Peer beans of the group
+        :param message: The sent message
+        :param quorum: Number of replies to wait for (None for all)
+        """
+        self.group = group
+        self.message = message
+        self.future = concurrent.futures.Future()
+        self.sent = time.time()
+        self.__quorum = quorum
+        self.__lock = threading.Lock()
+
+        # UIDs of all the peers of the group, and of those without answer
+        self.__peers = frozenset(peer.uid for peer in peers)
+        self.__pending = set(self.__peers)
+        self.__unreached = set()
+
+        # Peer UID -> Reply / Exception
+        self.__replies = {}
+        self.__errors = {}
+
+    @property
+    def forget_on_first(self):
+        """
+        A group request waits for many replies
+        """
+        return False
+
+    def __make_result(self):
+        """
+        Prepares the result of the request (lock must be held)
+
+        :return: A GroupResult bean
+        """
+        return beans.GroupResult(self.group, self.__replies.copy(),
+                                 self.__errors.copy(), set(self.__pending),
+                                 set(self.__unreached))
+
+    def __check_done(self):
+        """
+        Checks if the request is complete (lock must be held)
+
+        :return: The result of the request if it is complete, else None
+        """
+        if not self.__pending or (self.__quorum is not None and
+                                  len(self.__replies) >= self.__quorum):
+            return self.__make_result()
+        return None
+
+    def __resolve(self, method, value):
+        """
+        Sets the result or the exception of the future, if it is not already
+        done or cancelled
+
+        :param method: Future method to call
+        :param value: Result or exception
+        """
+        if value is not None and not self.future.done():
+            try:
+                method(value)
+            except Exception as ex:
+                # Cancelled or resolved meanwhile
+                _logger.debug("Future of %s already done: %s",
+                              self.message.uid, ex)
+
+    def set_unreached(self, peers):
+        """
+        Sets the peers which couldn't be contacted: they won't be waited for
+
+        :param peers: Peer beans
+        """
+        with self.__lock:
+            for peer in peers:
+                self.__pending.discard(peer.uid)
+                self.__unreached.add(peer.uid)
+            result = self.__check_done()
+
+        self.__resolve(self.future.set_result, result)
+
+    def callback(self, _, message):
+        """
+        Stores the reply of a peer
+
+        :param _: Herald service instance
+        :param message: Received answer message
+        """
+        with self.__lock:
+            try:
+                self.__pending.remove(message.sender)
+            except KeyError:
+                # Duplicate, late or unexpected reply
+                return
+
+            self.__replies[message.sender] = message
+            result = self.__check_done()
+
+        self.__resolve(self.future.set_result, result)
+
+    def errback(self, _, exception):
+        """
+        Stores the error associated to a peer, or sets the exception of the
+        future if the error concerns the whole request
+
+        :param _: Herald service instance
+        :param exception: An exception describing/caused by the error
+        """
+        uid = getattr(exception.target, 'uid', None)
+        if uid not in self.__peers:
+            # Global error (forgotten message, Herald stopped, ...)
+            self.__resolve(self.future.set_exception, exception)
+            return
+
+        with self.__lock:
+            try:
+                self.__pending.remove(uid)
+            except KeyError:
+                # Peer already handled or never reached
+                return
+
+            self.__errors[uid] = exception
+            result = self.__check_done()
+
+        self.__resolve(self.future.set_result, result)
+
+    def timed_out(self, _):
+        """
+        The timeout has been reached: the future gets a partial result
+
+        :param _: Herald service instance
+        """
+        with self.__lock:
+            result = self.__make_result()
+
+        self.__resolve(self.future.set_result, result)
+
+
 @ComponentFactory("herald-core-factory")
 @Provides((herald.SERVICE_HERALD_INTERNAL, herald.SERVICE_DIRECTORY_LISTENER))
 @Provides(herald.SERVICE_HERALD, '_controller')
@@ -188,6 +384,14 @@ class _WaitingPost(object):
 @Requires('_listeners', herald.SERVICE_LISTENER, True, True)
 @RequiresMap('_transports', herald.SERVICE_TRANSPORT, herald.PROP_ACCESS_ID,
              False, False, True)
+@Property('_dedup_window', herald.PROP_DEDUP_WINDOW, 300)
+@Property('_dedup_size', herald.PROP_DEDUP_SIZE, 500000)
+@Property('_dispatch_workers', herald.PROP_DISPATCH_WORKERS, 5)
+@Property('_queue_size', herald.PROP_QUEUE_SIZE, 10000)
+@Property('_queue_policy', herald.PROP_QUEUE_POLICY, herald.dispatch.BLOCK)
+@Property('_priorities', herald.PROP_PRIORITIES, None)
+@Property('_health_failures', herald.PROP_HEALTH_FAILURES, 3)
+@Property('_health_delay', herald.PROP_HEALTH_DELAY, 30)
 @Instantiate("herald-core")
 class Herald(object):
     """
@@ -207,86 +411,103 @@ class Herald(object):
         self._listeners = []
 
         # Filter -> Listener (computed)
-        self.__msg_listeners = {}
+        self.__msg_listeners = SubjectIndex()
+
+        # Listener -> Method computing the ordering key of a message
+        self.__order_keys = {}
 
         # Herald transports: access ID -> implementation
         self._transports = {}
 
-        # Notification threads
-        self.__pool = pelix.threadpool.ThreadPool(5, logname="HeraldNotify")
+        # Notification threads, with a queue per listener
+        self._dispatch_workers = 5
+        self._queue_size = 10000
+        self._queue_policy = herald.dispatch.BLOCK
+        self.__dispatcher = Dispatcher("HeraldNotify")
 
-        # Garbage collection timer
-        self.__gc_timer = None
+        # Subject filter -> Notification priority
+        self._priorities = None
+        self.__priorities = PriorityMap()
 
-        # Last time a GC was done
-        self._last_gc = None
+        # Duplicate messages filter configuration
+        self._dedup_window = 300
+        self._dedup_size = 500000
 
-        # List of received messages UIDs, kept 5 minutes: UID -> TTL
-        self.__treated = {}
+        # UIDs of received messages, kept 5 minutes (by default)
+        self.__treated = None
 
-        # Events used for blocking "send()": UID -> EventData
-        self.__waiting_events = {}
+        # Health of the accesses of peers
+        self._health_failures = 3
+        self._health_delay = 30
+        self.__health = None
 
-        # Events used for "post()" methods:
-        # UID -> _WaitingPost
-        self.__waiting_posts = {}
+        # Messages waiting for a reply, from "send()" and "post()" methods:
+        # UID -> _WaitingFuture or _WaitingPost
+        self.__waiting = PendingRegistry(self.__forget_timed_out)
 
         # Thread safety
         self.__listeners_lock = threading.Lock()
-        self.__gc_lock = threading.Lock()
 
     @Validate
     def _validate(self, context):
         """
         Component validated
         """
-        # Start the thread pool
-        self.__pool.start()
+        # Prepare the duplicate messages filter
+        self.__treated = DuplicateFilter(float(self._dedup_window),
+                                         max_entries=int(self._dedup_size))
 
-        # Start the garbage collector
-        self._last_gc = None
-        self.__gc_timer = LoopTimer(30, self.__garbage_collect,
-                                    name="Herald-GC")
-        self.__gc_timer.start()
+        # Prepare the transports health table
+        self.__health = HealthTable(int(self._health_failures),
+                                    float(self._health_delay))
+
+        # Prepare the notification priorities
+        try:
+            self.__priorities = PriorityMap(self._priorities)
+        except (AttributeError, TypeError, ValueError) as ex:
+            _logger.error("Invalid priorities configuration: %s", ex)
+            self.__priorities = PriorityMap()
+
+        # Start the notification threads
+        self.__dispatcher.start(int(self._dispatch_workers))
+
+        # Start the timer of pending messages
+        self.__waiting.start()
 
     @Invalidate
     def _invalidate(self, _):
         """
         Component invalidated
         """
-        # Stop the garbage collector
-        self.__gc_timer.cancel()
-        self.__gc_timer.join()
-        self.__gc_timer = None
-
-        # Stop the thread pool
-        self.__pool.stop()
+        # Stop the timer of pending messages
+        self.__waiting.stop()
 
-        # Clear waiting events (set them with no data)
-        for event in tuple(self.__waiting_events.values()):
-            event.set(None)
+        # Stop the notification threads
+        self.__dispatcher.stop()
 
+        # Release waiting send() calls and notify post() callers
         exception = HeraldTimeout(None, "Herald stops to listen to messages",
                                   None)
-        with self.__gc_lock:
-            for waiting_post in self.__waiting_posts.values():
-                waiting_post.errback(self, exception)
+        for waiting in self.__waiting.clear():
+            waiting.errback(self, exception)
 
         # Clear storage
-        self.__waiting_events.clear()
-        self.__waiting_posts.clear()
+        self.__treated.clear()
+        self.__health.clear()
 
-        # Clear the thread pool
-        self.__pool.clear()
+        # Drop the pending notifications
+        self.__dispatcher.clear()
 
-    def __compile_pattern(self, pattern):
+    @staticmethod
+    def __get_filters(svc_filters):
         """
-        Converts a file name pattern to a regular expression
+        Normalizes the message filters of a listener
 
-        :param pattern: A file name pattern
-        :return: A compiled regular expression
+        :param svc_filters: Value of the listener filters service property
+        :return: A set of normalized file name patterns
         """
-        return re.compile(fnmatch.translate(pattern), re.IGNORECASE)
+        return set(normalize_pattern(fn_filter) for fn_filter in
+                   pelix.utilities.to_iterable(svc_filters, False))
 
     @BindField('_transports')
     def _bind_transport(self, _, listener, svc_ref):
@@ -314,113 +535,148 @@ class Herald(object):
         """
         A message listener has been bound
         """
-        svc_filters = pelix.utilities.to_iterable(
-            svc_ref.get_property(herald.PROP_FILTERS), False)
-
-        re_filters = set(self.__compile_pattern(fn_filter)
-                         for fn_filter in svc_filters)
+        fn_filters = self.__get_filters(
+            svc_ref.get_property(herald.PROP_FILTERS))
 
         with self.__listeners_lock:
-            for re_filter in re_filters:
-                self.__msg_listeners.setdefault(re_filter, set()) \
-                    .add(listener)
+            self.__set_lane(listener, svc_ref)
+            for fn_filter in fn_filters:
+                self.__msg_listeners.add(fn_filter, listener)
 
     @UpdateField('_listeners')
     def _update_listener(self, _, listener, svc_ref, old_props):
         """
         The properties of a message listener have been updated
         """
-        svc_filters = pelix.utilities.to_iterable(
-            svc_ref.get_property(herald.PROP_FILTERS), False)
-
-        new_filters = set(self.__compile_pattern(fn_filter)
-                          for fn_filter in svc_filters)
+        new_filters = self.__get_filters(
+            svc_ref.get_property(herald.PROP_FILTERS))
 
         with self.__listeners_lock:
             # Get old and new filters as sets
-            old_svc_filters = pelix.utilities.to_iterable(
-                old_props.get(herald.PROP_FILTERS), False)
-
-            old_filters = set(self.__compile_pattern(fn_filter)
-                              for fn_filter in old_svc_filters)
-
-            # Compute differences
-            added_filters = new_filters.difference(old_filters)
-            removed_filters = old_filters.difference(new_filters)
+            old_filters = self.__get_filters(
+                old_props.get(herald.PROP_FILTERS))
 
             # Add new filters
-            for re_filter in added_filters:
-                self.__msg_listeners.setdefault(re_filter, set()) \
-                    .add(listener)
+            for fn_filter in new_filters.difference(old_filters):
+                self.__msg_listeners.add(fn_filter, listener)
 
             # Remove old ones
-            for re_filter in removed_filters:
-                try:
-                    listeners = self.__msg_listeners[re_filter]
-                    listeners.remove(listener)
-                except KeyError:
-                    # Filter or listener not found
-                    pass
-                else:
-                    # Clean up dictionary if necessary
-                    if not listeners:
-                        del self.__msg_listeners[re_filter]
+            for fn_filter in old_filters.difference(new_filters):
+                self.__msg_listeners.remove(fn_filter, listener)
+
+            # Update its queue
+            self.__set_lane(listener, svc_ref)
 
     @UnbindField('_listeners')
     def _unbind_listener(self, _, listener, svc_ref):
         """
         A message listener has gone away
         """
-        svc_filters = pelix.utilities.to_iterable(
-            svc_ref.get_property(herald.PROP_FILTERS), False)
+        fn_filters = self.__get_filters(
+            svc_ref.get_property(herald.PROP_FILTERS))
 
         with self.__listeners_lock:
-            re_filters = set(self.__compile_pattern(fn_filter)
-                             for fn_filter in svc_filters)
-            for re_filter in re_filters:
-                try:
-                    listeners = self.__msg_listeners[re_filter]
-                    listeners.remove(listener)
-                except KeyError:
-                    # Filter or listener not found
-                    pass
-                else:
-                    # Clean up dictionary if necessary
-                    if not listeners:
-                        del self.__msg_listeners[re_filter]
+            for fn_filter in fn_filters:
+                self.__msg_listeners.remove(fn_filter, listener)
+
+            # Drop its pending notifications
+            self.__dispatcher.remove_lane(listener)
+            self.__order_keys.pop(listener, None)
 
-    def __garbage_collect(self):
+    def __set_lane(self, listener, svc_ref):
         """
-        Garbage collects dead waiting post beans. Calls on a regular basis
-        by a LoopTimer
+        Configures the notification queue of a listener, according to its
+        service properties or to the default configuration
+
+        :param listener: A message listener
+        :param svc_ref: Reference to the listener service
         """
-        with self.__gc_lock:
-            # Compute last garbage collect time
-            if self._last_gc is None:
-                gc_delta = 0
-            else:
-                gc_delta = int(time.time()) - self._last_gc
+        max_size = svc_ref.get_property(herald.PROP_QUEUE_SIZE)
+        if max_size is None:
+            max_size = self._queue_size
+
+        policy = svc_ref.get_property(herald.PROP_QUEUE_POLICY) \
+            or self._queue_policy
+
+        name = "{0}[{1}]".format(
+            type(listener).__name__,
+            svc_ref.get_property(pelix.constants.SERVICE_ID))
+        try:
+            self.__dispatcher.set_lane(listener, name, max_size, policy)
+        except ValueError as ex:
+            _logger.error("Invalid queue configuration for %s: %s", name, ex)
+            self.__dispatcher.set_lane(listener, name, self._queue_size,
+                                       self._queue_policy)
+
+        try:
+            order_key = self.__get_order_key(
+                svc_ref.get_property(herald.PROP_ORDER_KEY))
+        except ValueError as ex:
+            _logger.error("Invalid ordering key for %s: %s", name, ex)
+            order_key = None
+
+        if order_key is not None:
+            self.__order_keys[listener] = order_key
+        else:
+            self.__order_keys.pop(listener, None)
 
-            # Delete timed out post message beans
-            to_delete = [uid
-                         for uid, waiting_post in self.__waiting_posts.items()
-                         if waiting_post.is_dead()]
-            for uid in to_delete:
-                del self.__waiting_posts[uid]
+    @staticmethod
+    def __get_order_key(spec):
+        """
+        Prepares the method computing the ordering key of messages, according
+        to the value of the herald.PROP_ORDER_KEY listener property
 
-            # Delete UID of treated message of more than 5 minutes
-            to_delete = []
-            for uid, ttl in self.__treated.items():
-                new_ttl = ttl + gc_delta
-                self.__treated[uid] = new_ttl
-                if new_ttl > 300:
-                    to_delete.append(uid)
+        :param spec: Description of the ordering key
+        :return: A method taking a message as parameter, or None
+        :raise ValueError: Invalid description
+        """
+        if not spec:
+            return None
+        elif spec == 'sender':
+            return lambda message: message.sender
+        elif spec == 'subject':
+            return lambda message: message.subject
 
-            for uid in to_delete:
-                del self.__treated[uid]
+        kind, _, name = spec.partition(':')
+        if not name:
+            pass
+        elif kind == 'header':
+            return lambda message: message.get_header(name)
+        elif kind == 'content':
+            def content_key(message):
+                """
+                Returns the value of a field of the message content
+                """
+                try:
+                    value = message.content[name]
+                    # Ensure the value can be used as a key
+                    hash(value)
+                    return value
+                except (KeyError, IndexError, TypeError):
+                    return None
 
-            # Update the "last garbage collect time"
-            self._last_gc = int(time.time())
+            return content_key
+
+        raise ValueError("Unknown ordering key: {0}".format(spec))
+
+    def get_queues_stats(self):
+        """
+        Returns the statistics of the notification queues of the listeners
+
+        :return: A dictionary: queue name -> dictionary of statistics
+        """
+        return self.__dispatcher.get_stats()
+
+    def __forget_timed_out(self, uid, waiting):
+        """
+        Called by the registry of pending messages when the timeout of a
+        send() or post() call is reached: the message is forgotten.
+
+        :param uid: UID of the message
+        :param waiting: The associated _WaitingFuture or _WaitingPost bean
+        """
+        _logger.debug("Forgot message %s: timeout reached", uid)
+        waiting.timed_out(self)
 
     def handle_message(self, message):
         """
@@ -430,14 +686,10 @@ class Herald(object):
 
         :param message: A MessageReceived bean forged by the transport
         """
-        with self.__gc_lock:
-            if message.uid in self.__treated:
-                # Message already handled, maybe it has been received by
-                # another transport
-                return
-            else:
-                # Store the message UID in the treated messages
-                self.__treated[message.uid] = 0
+        if not self.__treated.check(message.uid):
+            # Message already handled, maybe it has been received by
+            # another transport
+            return
 
         # User a tuple, because list can't be compared to tuples
         parts = tuple(part for part in message.subject.split('/') if part)
@@ -466,31 +718,40 @@ class Herald(object):
         :param message: MessageReceived bean, received from another peer
         :param kind: Kind of error
         """
+        try:
+            # Get the original message UID and Subject
+            uid = message.content['uid']
+            subject = message.content['subject']
+        except (KeyError, TypeError):
+            # Invalid error content...
+            return
+
         if kind == 'no-listener':
             # No listener found for a given message
-            # ... release send() calls
-            try:
-                # Get the original message UID and Subject
-                uid = message.content['uid']
-                exception = NoListener(beans.Target(message.sender), uid,
-                                       message.content['subject'])
-            except KeyError:
-                # Invalid error content...
-                return
+            exception = NoListener(beans.Target(message.sender), uid, subject)
+        elif kind == 'overloaded':
+            # The queues of the peer are full
+            exception = Overloaded(beans.Target(message.sender),
+                                   "Peer {0} is overloaded: {1} ({2})"
+                                   .format(message.sender, uid, subject),
+                                   uid, subject)
+        else:
+            # Unknown kind of error
+            return
 
-            try:
-                # Unlock the poster with an exception
-                self.__waiting_events.pop(uid).raise_exception(exception)
-            except KeyError:
-                # Nobody was waiting for the event
-                pass
+        # ... release send() calls
+        try:
+            waiting = self.__waiting.get(uid)
+        except KeyError:
+            # Nobody was waiting for the event
+            pass
+        else:
+            if isinstance(waiting, _WaitingFuture):
+                # Unlock the sender with an exception
+                self.__forget(uid)
 
-            # ... notify post() callers
-            try:
-                self.__waiting_posts[uid].errback(self, exception)
-            except KeyError:
-                # No error callback for this message
-                pass
+            # Notify the caller
+            waiting.errback(self, exception)
 
     def _handle_directory_message(self, message, kind):
         """
@@ -515,25 +776,12 @@ class Herald(object):
         # Prepare the exception to raise
         exception = PeerLost(peer, "Peer {0} has been lost".format(peer))
 
-        # ... unlock send() calls
-        uids = [uid for uid, event in self.__waiting_events.items()
-                if peer == event.peer]
-        for uid in uids:
-            self.__waiting_events.pop(uid).raise_exception(exception)
+        # ... unlock send() calls and notify post() callers
+        for _, waiting in self.__waiting.pop_peer(peer):
+            waiting.errback(self, exception)
 
-        with self.__gc_lock:
-            # ... list post() callers for this peer
-            entries = {uid: waiting_post
-                       for uid, waiting_post in self.__waiting_posts.items()
-                       if peer == waiting_post.peer}
-
-            # Clean up callers dictionary
-            for uid in entries:
-                del self.__waiting_posts[uid]
-
-        # ... notify post() callers
-        for waiting_post in entries.values():
-            waiting_post.errback(self, exception)
+        # Forget about the health of its accesses
+        self.__health.forget_peer(peer.uid)
 
     @staticmethod
     def peer_registered(peer):
@@ -557,45 +805,59 @@ class Herald(object):
         :param message: The received message
         """
         if message.reply_to:
-            # ... unlock send() calls
+            # This is an answer to a message: unlock send() calls and notify
+            # post() callers
             try:
-                # This is an answer to a message: unlock the sender
-                self.__waiting_events.pop(message.reply_to).set(message)
-            except KeyError:
-                # Nobody was waiting for the event
-                pass
-
-            # ... notify post() callers
-            try:
-                with self.__gc_lock:
-                    waiting_post = self.__waiting_posts[message.reply_to]
+                waiting = self.__waiting.get(message.reply_to)
             except KeyError:
                 # Nobody was waiting for an answer
                 pass
             else:
-                waiting_post.callback(self, message)
-                if waiting_post.forget_on_first:
+                # Update the round trip time of the access
+                self.__health.record_reply(message.sender, message.access,
+                                           time.time() - waiting.sent)
+
+                if waiting.forget_on_first:
                     # First answer received: forget about the message
-                    del self.__waiting_posts[message.reply_to]
+                    self.__forget(message.reply_to)
 
-        # Compute the list of listeners to notify
-        msg_listeners = set()
-        subject = message.subject
+                waiting.callback(self, message)
 
+        # Compute the list of listeners to notify
         with self.__listeners_lock:
-            for re_filter, re_listeners in self.__msg_listeners.items():
-                if re_filter.match(subject) is not None:
-                    msg_listeners.update(re_listeners)
+            msg_listeners = [(listener, self.__order_keys.get(listener))
+                             for listener
+                             in self.__msg_listeners.match(message.subject)]
 
         if msg_listeners:
-            # Call listeners in the thread pool
-            for listener in msg_listeners:
+            # Queue the notifications of the listeners
+            priority = self.__priorities.get(message.subject)
+            overloaded = False
+            for listener, order_key in msg_listeners:
+                if order_key is not None:
+                    order_key = order_key(message)
+
                 try:
-                    self.__pool.enqueue(listener.herald_message,
-                                        self, message)
-                except (AttributeError, ValueError):
-                    # Invalid listener
+                    self.__dispatcher.submit(listener, listener.herald_message,
+                                             (self, message), order_key,
+                                             priority)
+                except (AttributeError, KeyError):
+                    # Invalid or unbound listener
                     pass
+                except Overloaded as ex:
+                    _logger.debug("Message %s rejected: %s", message.uid, ex)
+                    overloaded = True
+
+            if overloaded:
+                try:
+                    # Tell the sender that the message has been rejected
+                    self.reply(message,
+                               {'uid': message.uid,
+                                'subject': message.subject},
+                               'herald/error/overloaded')
+                except Exception as ex:
+                    _logger.error("Can't send an error back to the sender: "
+                                  "%s", ex)
         else:
             try:
                 # No listener found: send an error message
@@ -662,15 +924,18 @@ class Herald(object):
             raise NoTransport(beans.Target(uid=peer.uid),
                               "No transport bound yet.")
 
-        # Get accesses
-        accesses = peer.get_accesses()
+        # Get accesses with a bound transport, best ones first
+        accesses = self.__health.order(
+            peer.uid, [access for access in peer.get_accesses()
+                       if access in self._transports])
         for access in accesses:
             try:
                 transport = self._transports[access]
             except KeyError:
-                # No transport for this kind of access
+                # Transport unbound meanwhile
                 pass
             else:
+                start = time.time()
                 try:
                     # Call it
                     transport.fire(peer, message)
@@ -678,11 +943,15 @@ class Herald(object):
                     # Transport can't read peer access data
                     _logger.debug("Error reading access for transport %s: %s",
                                   access, ex)
+                    self.__health.record_failure(peer.uid, access)
                 except Exception as ex:
                     # Exception during transport
                     _logger.info("Error using transport %s: %s", access, ex)
+                    self.__health.record_failure(peer.uid, access)
                 else:
                     # Success
+                    self.__health.record_success(peer.uid, access,
+                                                 time.time() - start)
                     break
         else:
             # No transport for those accesses
@@ -708,6 +977,23 @@ class Herald(object):
             _logger.info("No peer in group %s", group)
             return message.uid, set()
 
+        missing = self.__fire_group(group, all_peers, message)
+        if missing:
+            _logger.warning("Some peers haven't been notified: %s",
+                            ', '.join(str(peer) for peer in missing))
+        return message.uid, missing
+
+    def __fire_group(self, group, all_peers, message):
+        """
+        Fires the given message to the given peers of a group, using as few
+        transport calls as possible
+
+        :param group: The name of the group of peers
+        :param all_peers: The Peer beans of the group
+        :param message: A Message bean
+        :return: The set of peers which haven't been reached
+        :raise NoTransport: No transport bound
+        """
         # Check if some transports are bound
         if not self._transports:
             raise NoTransport(
@@ -721,7 +1007,6 @@ class Herald(object):
             for access in peer.get_accesses():
                 accesses.setdefault(access, set()).add(peer)
 
-        missing = []
         for access, access_peers in accesses.items():
             if not access_peers:
                 # Nothing to do
@@ -753,15 +1038,12 @@ class Herald(object):
 
                     if all_done:
                         break
-        else:
-            missing = set(itertools.chain(*accesses.values()))
-            if missing:
-                _logger.warning("Some peers haven't been notified: %s",
-                                ', '.join(str(peer) for peer in missing))
-            else:
-                _logger.debug("No peer to send the message to.")
 
-        return message.uid, missing
+        # Peers without access or which transport failed
+        missing = set(itertools.chain(*accesses.values()))
+        missing.update(peer for peer in all_peers
+                       if not peer.get_accesses())
+        return missing
 
     def send(self, target, message, timeout=None):
         """
@@ -777,40 +1059,95 @@ class Herald(object):
                            listen to it
         :raise HeraldTimeout: Timeout raised before getting an answer
         """
+        # The registry of pending messages raises the timeout
+        return self.send_async(target, message, timeout).result()
+
+    def send_async(self, target, message, timeout=None):
+        """
+        Sends a message, without waiting for its reply.
+
+        The returned future is resolved by the reply, or fails with the same
+        exceptions as send(). It can be awaited in an asyncio event loop using
+        ``asyncio.wrap_future()``. Cancelling the future makes Herald forget
+        about the message.
+
+        :param target: The UID of a Peer, or a Peer object
+        :param message: A Message bean
+        :param timeout: Maximum time to wait for an answer
+        :return: A concurrent.futures.Future object
+        :raise KeyError: Unknown peer UID
+        :raise NoTransport: No transport found to send the message
+        """
         # Get the Peer object
         if not isinstance(target, beans.Peer):
             peer = self._directory.get_peer(target)
         else:
             peer = target
 
-        # Prepare an event, which will be set when the answer will be received
-        event = _WaitingSend(peer, message.uid)
-        self.__waiting_events[message.uid] = event
+        # Prepare the future, which will be set when the answer is received
+        waiting = _WaitingFuture(peer, message)
+        self.__waiting.add(message.uid, waiting, peer, timeout)
 
         try:
             # Fire the message
+            # pylint: disable=W0702
             self.fire(peer, message)
+        except:
+            # Early clean up in case of exception
+            self.__forget(message.uid)
+            raise
 
-            # Message sent, wait for an answer
-            if event.wait(timeout):
-                if event.data is not None:
-                    return event.data
-                else:
-                    # Message cancelled due to invalidation
-                    raise HeraldTimeout(beans.Target(uid=peer.uid),
-                                        "Herald stops listening to messages",
-                                        message)
-            else:
-                raise HeraldTimeout(beans.Target(uid=peer.uid),
-                                    "Timeout reached before receiving a reply",
-                                    message)
-        finally:
-            try:
-                # Clean up
-                del self.__waiting_events[message.uid]
-            except KeyError:
-                # Ignore errors at this point
-                pass
+        def on_done(future):
+            """
+            Forgets about the message if the future has been cancelled
+            """
+            if future.cancelled():
+                self.__forget(message.uid)
+
+        waiting.future.add_done_callback(on_done)
+        return waiting.future
+
+    def send_group(self, group, message, timeout=None, quorum=None):
+        """
+        Sends a message to a group of peers, without waiting for their
+        replies.
+
+        The returned future is resolved with a GroupResult bean as soon as
+        all the reached peers have replied (or failed), as soon as the given
+        number of replies has been received, or when the timeout is reached.
+        Peers which couldn't be contacted are not waited for.
+        The future fails if the message is forgotten or if Herald stops.
+
+        :param group: The name of a group of peers
+        :param message: A Message bean
+        :param timeout: Maximum time to wait for replies (None for no limit)
+        :param quorum: Number of replies to wait for (None for all)
+        :return: A concurrent.futures.Future object
+        :raise KeyError: Unknown group
+        :raise NoTransport: No transport found to send the message
+        """
+        # Get all peers known in the group
+        all_peers = self._directory.get_peers_for_group(group)
+
+        # Prepare the future before sending the message, as replies can come
+        # back before the end of the transport calls
+        waiting = _WaitingGroup(group, all_peers, message, quorum)
+        self.__waiting.add(message.uid, waiting, all_peers, timeout)
+        waiting.future.add_done_callback(
+            lambda _: self.__forget(message.uid))
+
+        try:
+            # Fire the message
+            # pylint: disable=W0702
+            missing = self.__fire_group(group, all_peers, message)
+        except:
+            # Early clean up in case of exception
+            self.__forget(message.uid)
+            raise
+
+        # Don't wait for peers which were not reached (or for an empty group)
+        waiting.set_unreached(missing)
+        return waiting.future
 
     def post(self, target, message, callback, errback,
              timeout=180, forget_on_first=True):
@@ -838,10 +1175,10 @@ class Herald(object):
         else:
             peer = target
 
-        with self.__gc_lock:
-            # Prepare an entry in the waiting posts
-            self.__waiting_posts[message.uid] = \
-                _WaitingPost(callback, errback, timeout, forget_on_first, peer)
+        # Prepare an entry in the waiting posts
+        self.__waiting.add(message.uid,
+                           _WaitingPost(callback, errback, forget_on_first,
+                                        peer), peer, timeout)
 
         try:
             # Fire the message
@@ -849,11 +1186,7 @@ class Herald(object):
             return self.fire(peer, message)
         except:
             # Early clean up in case of exception
-            try:
-                with self.__gc_lock:
-                    del self.__waiting_posts[message.uid]
-            except KeyError:
-                pass
+            self.__forget(message.uid)
 
             # Propagate the error
             raise
@@ -878,52 +1211,17 @@ class Herald(object):
         # Get all peers known in the group
         all_peers = self._directory.get_peers_for_group(group)
 
-        # Check if some transports are bound
-        if not self._transports:
-            raise NoTransport(
-                beans.Target(group=group,
-                             uids=[peer.uid for peer in all_peers]),
-                "No transport bound yet.")
-
-        with self.__gc_lock:
-            # Prepare an entry in the waiting posts
-            self.__waiting_posts[message.uid] = \
-                _WaitingPost(callback, errback, timeout, False)
-
-        # Find the common accesses
-        accesses = {}
-        for peer in all_peers:
-            for access in peer.get_accesses():
-                accesses.setdefault(access, set()).add(peer)
+        # Prepare an entry in the waiting posts
+        self.__waiting.add(message.uid,
+                           _WaitingPost(callback, errback, False),
+                           timeout=timeout)
 
-        for access, access_peers in accesses.items():
-            if not access_peers:
-                # Nothing to do
-                continue
-
-            try:
-                transport = self._transports[access]
-            except KeyError:
-                # No transport for this kind of access
-                pass
-            else:
-                try:
-                    # Call it
-                    transport.fire_group(group, access_peers, message)
-                except InvalidPeerAccess:
-                    # Transport can't find group access data
-                    pass
-                else:
-                    # Success: clean up waiting peers
-                    all_done = True
-                    for remaining_peers in accesses.values():
-                        remaining_peers.difference_update(access_peers)
-                        if remaining_peers:
-                            # Still some peers to notify
-                            all_done = False
-
-                    if all_done:
-                        break
+        try:
+            self.__fire_group(group, all_peers, message)
+        except:
+            # Early clean up in case of exception
+            self.__forget(message.uid)
+            raise
 
         return message.uid
 
@@ -937,27 +1235,27 @@ class Herald(object):
         :param uid: The UID of a message
         :return: True if there was a reference about this message
         """
-        # Prepare the exception
-        result = False
-        exception = ForgotMessage(uid)
-
-        # ... release the send() call
         try:
-            self.__waiting_events.pop(uid).raise_exception(exception)
-            result = True
+            waiting = self.__waiting.pop(uid)
         except KeyError:
             # ... no pending call
-            pass
+            return False
+        else:
+            # ... release the send() call or notify the post() caller
+            waiting.errback(self, ForgotMessage(uid))
+            return True
 
-        with self.__gc_lock:
-            try:
-                self.__waiting_posts.pop(uid).errback(self, exception)
-                result = True
-            except KeyError:
-                # ... no pending call
-                pass
+    def __forget(self, uid):
+        """
+        Silently forgets about the given message UID
 
-        return result
+        :param uid: The UID of a message
+        """
+        try:
+            self.__waiting.pop(uid)
+        except KeyError:
+            # Already forgotten
+            pass
 
     def reply(self, message, content, subject=None):
         """
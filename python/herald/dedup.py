@@ -0,0 +1,152 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald duplicate messages filter
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Standard library
+import collections
+import threading
+import time
+
+# ------------------------------------------------------------------------------
+
+
+class DuplicateFilter(object):
+    """
+    Remembers the UIDs of the messages received during a time window.
+
+    UIDs are stored in a ring of time buckets: the current bucket receives
+    new UIDs and, every ``window / nb_buckets`` seconds, the oldest bucket is
+    dropped at once. If a maximum number of entries is given, a bucket is also
+    rotated as soon as it is full, which bounds the memory used by the filter
+    (the effective time window then shrinks under heavy load).
+
+    This class is thread-safe.
+    """
+    def __init__(self, window=300, nb_buckets=5, max_entries=0):
+        """
+        Sets up members
+
+        :param window: Time during which a UID is remembered, in seconds
+        :param nb_buckets: Number of time buckets (at least 2)
+        :param max_entries: Maximum number of UIDs stored (0 for no limit)
+        :raise ValueError: Invalid parameter
+        """
+        if window <= 0:
+            raise ValueError("Invalid time window: {0}".format(window))
+
+        nb_buckets = int(nb_buckets)
+        if nb_buckets < 2:
+            raise ValueError("At least 2 buckets are required")
+
+        self.__nb_buckets = nb_buckets
+        self.__period = float(window) / nb_buckets
+        if max_entries and max_entries > 0:
+            self.__bucket_size = max(1, int(max_entries) // nb_buckets)
+        else:
+            self.__bucket_size = 0
+
+        # Buckets of UIDs: the last one is the current one
+        self.__buckets = collections.deque((set(),), nb_buckets)
+        self.__current = self.__buckets[-1]
+        self.__next_rotation = time.time() + self.__period
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        """
+        Returns the number of stored UIDs
+        """
+        with self.__lock:
+            self.__expire(time.time())
+            return sum(len(bucket) for bucket in self.__buckets)
+
+    def __contains__(self, uid):
+        """
+        Checks if the given UID has been stored during the time window
+        """
+        with self.__lock:
+            self.__expire(time.time())
+            return self.__contains(uid)
+
+    def __contains(self, uid):
+        """
+        Checks if the given UID is in a bucket (lock must be held)
+        """
+        for bucket in self.__buckets:
+            if uid in bucket:
+                return True
+        return False
+
+    def __expire(self, now):
+        """
+        Drops the buckets older than the time window (lock must be held)
+
+        :param now: Current time
+        """
+        if now >= self.__next_rotation:
+            # Add a bucket per elapsed period
+            elapsed = int((now - self.__next_rotation) // self.__period) + 1
+            for _ in range(min(elapsed, self.__nb_buckets)):
+                self.__buckets.append(set())
+            self.__next_rotation += elapsed * self.__period
+            self.__current = self.__buckets[-1]
+
+    def check(self, uid):
+        """
+        Stores the given UID if it is not yet known
+
+        :param uid: A message UID
+        :return: True if the UID was unknown, False if it is a duplicate
+        """
+        with self.__lock:
+            self.__expire(time.time())
+            if self.__bucket_size and \
+                    len(self.__current) >= self.__bucket_size:
+                # Current bucket is full: early rotation
+                self.__buckets.append(set())
+                self.__current = self.__buckets[-1]
+
+            if self.__contains(uid):
+                return False
+
+            self.__current.add(uid)
+            return True
+
+    def clear(self):
+        """
+        Forgets all stored UIDs
+        """
+        with self.__lock:
+            self.__buckets.clear()
+            self.__buckets.append(set())
+            self.__current = self.__buckets[-1]
+            self.__next_rotation = time.time() + self.__period
@@ -37,6 +37,7 @@ __version__=herald.version.__version__
 # Herald
 import herald
 import herald.beans as beans
+import herald.codecs
 
 # Pelix
 import pelix.ipopo.decorators
@@ -139,6 +140,7 @@ class HeraldDirectory(object):
         # Setup node and name information
         peer.name = context.get_property(herald.FWPROP_PEER_NAME)
         peer.node_name = context.get_property(herald.FWPROP_NODE_NAME)
+        peer.codecs = herald.codecs.get_codecs_names()
         return peer
 
     @Validate
@@ -513,6 +515,9 @@ class HeraldDirectory(object):
                 for name in ('name', 'node_name'):
                     setattr(peer, name, description[name])
 
+                # Supported message codecs (JSON only for older peers)
+                peer.codecs = description.get('codecs')
+
             # In any case, parse and store (new/updated) accesses
             for access_id, data in description['accesses'].items():
                 try:
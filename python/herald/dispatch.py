@@ -0,0 +1,896 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald message dispatching utilities
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald
+from herald.exceptions import Overloaded
+
+# Standard library
+import collections
+import fnmatch
+import logging
+import re
+import threading
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+
+BLOCK = "block"
+""" Full queue policy: the caller waits until the queue has free space """
+
+DROP_OLDEST = "drop-oldest"
+""" Full queue policy: the oldest queued task is dropped """
+
+DROP_NEWEST = "drop-newest"
+""" Full queue policy: the new task is dropped """
+
+REJECT = "reject"
+""" Full queue policy: the new task is rejected with an Overloaded error """
+
+POLICIES = frozenset((BLOCK, DROP_OLDEST, DROP_NEWEST, REJECT))
+""" Supported full queue policies """
+
+PRIORITY_HIGH = 10
+""" Priority of the control messages """
+
+PRIORITY_NORMAL = 0
+""" Default priority """
+
+PRIORITY_LOW = -10
+""" Priority of bulk messages """
+
+PRIORITY_NAMES = {'high': PRIORITY_HIGH,
+                  'normal': PRIORITY_NORMAL,
+                  'low': PRIORITY_LOW}
+""" Priority name -> Priority value """
+
+DEFAULT_PRIORITIES = {'herald/directory/*': PRIORITY_HIGH,
+                      'herald/error/*': PRIORITY_HIGH}
+"""
+Default subject filter -> priority mapping: directory messages, including
+peer discovery, and errors are handled before other messages
+"""
+
+# ------------------------------------------------------------------------------
+
+WILDCARDS = frozenset('*?[')
+""" Characters with a special meaning in a file name pattern """
+
+
+def normalize_pattern(pattern):
+    """
+    Normalizes a subject filter. Filters are matched case-insensitively, so
+    two filters differing only by their case are considered equal.
+
+    :param pattern: A file name pattern
+    :return: The normalized pattern
+    """
+    return pattern.lower()
+
+
+class _TrieNode(object):
+    """
+    A node of the subject prefix tree: one level per subject segment
+    """
+    __slots__ = ('children', 'prefixes')
+
+    def __init__(self):
+        """
+        Sets up members
+        """
+        # Segment -> _TrieNode
+        self.children = {}
+
+        # Beginning of the next segment -> set of values
+        # (the empty string matches any remaining part of the subject)
+        self.prefixes = {}
+
+    def is_empty(self):
+        """
+        Checks if this node can be removed from its parent
+        """
+        return not self.children and not self.prefixes
+
+
+class SubjectIndex(object):
+    """
+    Associates values to subject filters (file name patterns) and finds the
+    values matching a subject without testing every filter.
+
+    * Literal filters (no wildcard) are stored in a dictionary;
+    * Filters ending with the only wildcard '*' are stored in a prefix tree,
+      based on the '/'-separated segments of the subject;
+    * Other filters are tested one by one, using a regular expression.
+
+    The result of a look up is kept in a bounded memo, cleared each time a
+    filter is added or removed.
+
+    This class is not thread-safe.
+    """
+    def __init__(self, memo_size=1024):
+        """
+        Sets up members
+
+        :param memo_size: Maximum number of subjects kept in the memo
+                          (0 to disable it)
+        """
+        # Literal subject -> set of values
+        self.__literals = {}
+
+        # Prefix tree root
+        self.__root = _TrieNode()
+
+        # Pattern -> (compiled regex, set of values)
+        self.__patterns = {}
+
+        # Subject -> frozenset of values
+        self.__memo = collections.OrderedDict()
+        self.__memo_size = memo_size
+
+        # Number of (pattern, value) associations
+        self.__size = 0
+
+    def __len__(self):
+        """
+        Returns the number of (filter, value) associations
+        """
+        return self.__size
+
+    def __bool__(self):
+        """
+        Checks if the index is not empty
+        """
+        return self.__size > 0
+
+    # Python 2 compatibility
+    __nonzero__ = __bool__
+
+    def __find_bucket(self, pattern, create):
+        """
+        Finds the set of values associated to the given (normalized) pattern
+
+        :param pattern: A normalized file name pattern
+        :param create: If True, create the missing bucket and tree nodes
+        :return: A (container, key, path) tuple, where container[key] is the
+                 set of values and path is the list of (parent node, segment)
+                 leading to the container (for prefix filters only), or None
+        """
+        special = WILDCARDS.intersection(pattern)
+        if not special:
+            # Literal subject
+            return self.__literals, pattern, None
+
+        elif special == set('*') and pattern.find('*') == len(pattern) - 1:
+            # Prefix filter: walk down the segments
+            segments = pattern[:-1].split('/')
+            node = self.__root
+            path = []
+            for segment in segments[:-1]:
+                try:
+                    child = node.children[segment]
+                except KeyError:
+                    if not create:
+                        return None
+                    child = node.children[segment] = _TrieNode()
+
+                path.append((node, segment))
+                node = child
+
+            return node.prefixes, segments[-1], path
+
+        else:
+            # Complex pattern
+            if create and pattern not in self.__patterns:
+                self.__patterns[pattern] = \
+                    (re.compile(fnmatch.translate(pattern), re.IGNORECASE),
+                     set())
+            return self.__patterns, pattern, None
+
+    def add(self, pattern, value):
+        """
+        Associates a value to a subject filter
+
+        :param pattern: A file name pattern
+        :param value: The associated value
+        """
+        container, key, _ = self.__find_bucket(normalize_pattern(pattern),
+                                               True)
+        if container is self.__patterns:
+            values = container[key][1]
+        else:
+            values = container.setdefault(key, set())
+
+        if value not in values:
+            values.add(value)
+            self.__size += 1
+            self.__memo.clear()
+
+    def remove(self, pattern, value):
+        """
+        Removes the association between a value and a subject filter.
+        Does nothing if the association is unknown.
+
+        :param pattern: A file name pattern
+        :param value: The associated value
+        """
+        found = self.__find_bucket(normalize_pattern(pattern), False)
+        if found is None:
+            # Unknown prefix
+            return
+
+        container, key, path = found
+        try:
+            if container is self.__patterns:
+                values = container[key][1]
+            else:
+                values = container[key]
+            values.remove(value)
+        except KeyError:
+            # Unknown pattern or value
+            return
+
+        self.__size -= 1
+        self.__memo.clear()
+
+        if not values:
+            # Clean up empty buckets
+            del container[key]
+
+            if path:
+                # ... and empty tree nodes
+                node = path[-1][0].children[path[-1][1]]
+                for parent, segment in reversed(path):
+                    if not node.is_empty():
+                        break
+                    del parent.children[segment]
+                    node = parent
+
+    def clear(self):
+        """
+        Removes all associations
+        """
+        self.__literals.clear()
+        self.__root = _TrieNode()
+        self.__patterns.clear()
+        self.__memo.clear()
+        self.__size = 0
+
+    def match(self, subject):
+        """
+        Retrieves the values associated to the filters matching the given
+        subject
+
+        :param subject: A message subject
+        :return: A frozen set of values (can be empty)
+        """
+        try:
+            # Look into the memo (moved as the last recently used entry)
+            result = self.__memo.pop(subject)
+            self.__memo[subject] = result
+            return result
+        except KeyError:
+            pass
+
+        result = set()
+        lower_subject = subject.lower()
+
+        # Literal subjects
+        try:
+            result.update(self.__literals[lower_subject])
+        except KeyError:
+            pass
+
+        # Prefix tree
+        node = self.__root
+        for segment in lower_subject.split('/'):
+            for prefix, values in node.prefixes.items():
+                if segment.startswith(prefix):
+                    result.update(values)
+
+            try:
+                node = node.children[segment]
+            except KeyError:
+                break
+
+        # Remaining patterns
+        for re_filter, values in self.__patterns.values():
+            if re_filter.match(subject) is not None:
+                result.update(values)
+
+        result = frozenset(result)
+        if self.__memo_size > 0:
+            if len(self.__memo) >= self.__memo_size:
+                # Forget the least recently used entry
+                self.__memo.popitem(last=False)
+            self.__memo[subject] = result
+
+        return result
+
+
+class PriorityMap(object):
+    """
+    Associates message subjects to a priority, using subject filters.
+
+    If many filters match a subject, the highest priority is kept.
+    This class is thread-safe.
+    """
+    def __init__(self, priorities=None, default=PRIORITY_NORMAL):
+        """
+        Sets up members
+
+        :param priorities: A subject filter -> priority dictionary
+                           (DEFAULT_PRIORITIES if None)
+        :param default: Priority of the subjects matching no filter
+        :raise ValueError: Invalid priority
+        """
+        self.__default = self.parse(default)
+        self.__index = SubjectIndex()
+        self.__lock = threading.Lock()
+
+        if priorities is None:
+            priorities = DEFAULT_PRIORITIES
+
+        for pattern, priority in priorities.items():
+            self.__index.add(pattern, self.parse(priority))
+
+    @staticmethod
+    def parse(priority):
+        """
+        Converts the given priority name or value to an integer
+
+        :param priority: A priority name ("high", "normal", "low") or value
+        :return: The priority value
+        :raise ValueError: Invalid priority
+        """
+        try:
+            return PRIORITY_NAMES[str(priority).lower()]
+        except KeyError:
+            return int(priority)
+
+    def get(self, subject):
+        """
+        Returns the priority of the given subject
+
+        :param subject: A message subject
+        :return: The priority of the subject
+        """
+        with self.__lock:
+            priorities = self.__index.match(subject)
+
+        if priorities:
+            return max(priorities)
+        return self.__default
+
+# ------------------------------------------------------------------------------
+
+
+class _Lane(object):
+    """
+    A bounded queue of tasks, executed by the workers of a Dispatcher.
+
+    Tasks with the highest priority are started first. Tasks sharing the
+    same ordering key are executed one at a time, in the order they were
+    queued (whatever their priority). Tasks without ordering key can run
+    concurrently.
+    """
+    def __init__(self, name, max_size=0, policy=BLOCK, concurrency=0):
+        """
+        Sets up members
+
+        :param name: Name of the lane, used in statistics
+        :param max_size: Maximum number of queued tasks (0 for no limit)
+        :param policy: Policy applied when the queue is full
+        :param concurrency: Maximum number of tasks executed at once
+                            (0 for no limit)
+        :raise ValueError: Invalid parameter
+        """
+        self.name = name
+        self.max_size = 0
+        self.policy = BLOCK
+        self.concurrency = 0
+        self.configure(max_size, policy, concurrency)
+
+        # Ordering key -> queued (task, priority) tuples
+        self.__queues = {}
+
+        # Priority -> ordering keys with tasks which can be started
+        self.__ready = {}
+
+        # Ordering keys with a running task
+        self.__busy = set()
+
+        # Number of queued tasks
+        self.__size = 0
+
+        # Number of running tasks
+        self.running = 0
+
+        # Priority of the lane in the ready queue of the dispatcher
+        # (None if not scheduled)
+        self.scheduled = None
+
+        # Lane removed from the dispatcher
+        self.closed = False
+
+        # Statistics
+        self.max_depth = 0
+        self.processed = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def __len__(self):
+        """
+        Returns the number of queued tasks
+        """
+        return self.__size
+
+    def configure(self, max_size, policy, concurrency):
+        """
+        Updates the configuration of the lane
+
+        :param max_size: Maximum number of queued tasks (0 for no limit)
+        :param policy: Policy applied when the queue is full
+        :param concurrency: Maximum number of tasks executed at once
+                            (0 for no limit)
+        :raise ValueError: Invalid parameter
+        """
+        if policy not in POLICIES:
+            raise ValueError("Unknown queue policy: {0}".format(policy))
+
+        self.max_size = max(0, int(max_size or 0))
+        self.policy = policy
+        self.concurrency = max(0, int(concurrency or 0))
+
+    def is_full(self):
+        """
+        Checks if the queue is full
+        """
+        return self.max_size and self.__size >= self.max_size
+
+    def can_run(self):
+        """
+        Checks if a task of this lane can be started
+        """
+        return self.__ready and (not self.concurrency
+                                 or self.running < self.concurrency)
+
+    def top_priority(self):
+        """
+        Returns the priority of the next task which can be started
+
+        :return: A priority, or None
+        """
+        if self.__ready:
+            return max(self.__ready)
+        return None
+
+    def __set_ready(self, order_key):
+        """
+        Registers the given ordering key as ready, according to the priority
+        of its next task
+
+        :param order_key: An ordering key with queued tasks
+        """
+        priority = self.__queues[order_key][0][1]
+        try:
+            self.__ready[priority].append(order_key)
+        except KeyError:
+            self.__ready[priority] = collections.deque((order_key,))
+
+    def __pop_ready(self, priority):
+        """
+        Removes the first ordering key ready with the given priority
+
+        :param priority: Priority of the key
+        :return: The ordering key
+        """
+        keys = self.__ready[priority]
+        order_key = keys.popleft()
+        if not keys:
+            del self.__ready[priority]
+        return order_key
+
+    def push(self, task, order_key=None, priority=PRIORITY_NORMAL):
+        """
+        Queues a task
+
+        :param task: A (method, args) tuple
+        :param order_key: Ordering key of the task (None for no ordering)
+        :param priority: Priority of the task
+        """
+        if order_key is None:
+            # Unordered task: a key of its own
+            order_key = object()
+
+        queue = self.__queues.get(order_key)
+        if queue is None:
+            queue = self.__queues[order_key] = collections.deque()
+            queue.append((task, priority))
+            if order_key not in self.__busy:
+                self.__set_ready(order_key)
+        else:
+            queue.append((task, priority))
+
+        self.__size += 1
+        self.max_depth = max(self.max_depth, self.__size)
+
+    def pop(self):
+        """
+        Removes the next task which can be started, i.e. the first one with
+        the highest priority. The ordering key of the task is marked as busy
+        until done() is called.
+
+        :return: A (task, ordering key) tuple
+        :raise ValueError: No task can be started
+        """
+        order_key = self.__pop_ready(max(self.__ready))
+        queue = self.__queues[order_key]
+        task = queue.popleft()[0]
+        if not queue:
+            del self.__queues[order_key]
+
+        self.__busy.add(order_key)
+        self.__size -= 1
+        self.running += 1
+        return task, order_key
+
+    def done(self, order_key):
+        """
+        Notifies the end of the execution of a task
+
+        :param order_key: The ordering key returned by pop()
+        """
+        self.__busy.discard(order_key)
+        self.running -= 1
+        self.processed += 1
+        if order_key in self.__queues:
+            # Next task with the same key
+            self.__set_ready(order_key)
+
+    def drop_next(self):
+        """
+        Drops the oldest task which can be started with the lowest priority,
+        or the oldest task with a busy key if none can be started
+        """
+        if self.__ready:
+            order_key = self.__pop_ready(min(self.__ready))
+            ready = True
+        else:
+            order_key = next(iter(self.__queues))
+            ready = False
+
+        queue = self.__queues[order_key]
+        queue.popleft()
+        if not queue:
+            del self.__queues[order_key]
+        elif ready:
+            # Priority of the next task of this key
+            self.__set_ready(order_key)
+
+        self.__size -= 1
+        self.dropped += 1
+
+    def clear(self):
+        """
+        Drops all queued tasks
+
+        :return: The number of dropped tasks
+        """
+        nb_tasks = self.__size
+        self.__queues.clear()
+        self.__ready.clear()
+        self.__size = 0
+        self.dropped += nb_tasks
+        return nb_tasks
+
+    def get_stats(self):
+        """
+        Returns the statistics of the lane
+
+        :return: A dictionary
+        """
+        return {'depth': self.__size,
+                'max_depth': self.max_depth,
+                'max_size': self.max_size,
+                'policy': self.policy,
+                'running': self.running,
+                'keys': len(self.__queues),
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'rejected': self.rejected}
+
+
+class Dispatcher(object):
+    """
+    Executes tasks in a pool of worker threads, using one bounded queue
+    (lane) per key.
+
+    Workers take one task at a time from the lanes with pending tasks, in a
+    round-robin fashion, so that a busy lane doesn't starve the others. Lanes
+    with a task of higher priority are always served first. Inside a lane,
+    tasks with the same ordering key are executed sequentially. When
+    a lane is full, its policy is applied: the caller is blocked until a slot
+    is freed, the oldest or the new task is dropped, or an Overloaded
+    exception is raised.
+    """
+    def __init__(self, name="Herald-Dispatcher"):
+        """
+        Sets up members
+
+        :param name: Prefix of the name of the worker threads
+        """
+        self.__name = name
+
+        # Key -> _Lane
+        self.__lanes = {}
+
+        # Priority -> Lanes with tasks ready to be executed
+        self.__ready = {}
+
+        # Worker threads
+        self.__threads = []
+        self.__stopped = True
+
+        # Workers wait for ready lanes, callers for free slots
+        self.__lock = threading.Lock()
+        self.__work = threading.Condition(self.__lock)
+        self.__space = threading.Condition(self.__lock)
+
+    def start(self, nb_workers=5):
+        """
+        Starts the worker threads
+
+        :param nb_workers: Number of worker threads
+        """
+        with self.__lock:
+            if not self.__stopped:
+                return
+
+            self.__stopped = False
+            for idx in range(max(1, int(nb_workers))):
+                thread = threading.Thread(
+                    target=self.__run,
+                    name="{0}-{1}".format(self.__name, idx + 1))
+                thread.daemon = True
+                self.__threads.append(thread)
+                thread.start()
+
+    def stop(self):
+        """
+        Stops the worker threads. Queued tasks are kept.
+        """
+        with self.__lock:
+            self.__stopped = True
+            self.__work.notify_all()
+            self.__space.notify_all()
+            threads = self.__threads[:]
+            del self.__threads[:]
+
+        current = threading.current_thread()
+        for thread in threads:
+            if thread is not current:
+                thread.join()
+
+    def clear(self):
+        """
+        Drops all queued tasks
+        """
+        with self.__lock:
+            for lane in self.__lanes.values():
+                lane.clear()
+                lane.scheduled = None
+            self.__ready.clear()
+            self.__space.notify_all()
+
+    def set_lane(self, key, name=None, max_size=0, policy=BLOCK,
+                 concurrency=0):
+        """
+        Adds a lane or updates its configuration
+
+        :param key: Key of the lane
+        :param name: Name of the lane, used in statistics (str(key) if None)
+        :param max_size: Maximum number of queued tasks (0 for no limit)
+        :param policy: Policy applied when the queue is full
+        :param concurrency: Maximum number of tasks executed at once
+                            (0 for no limit)
+        :raise ValueError: Invalid parameter
+        """
+        with self.__lock:
+            lane = self.__lanes.get(key)
+            if lane is None:
+                self.__lanes[key] = _Lane(name or str(key), max_size, policy,
+                                          concurrency)
+            else:
+                lane.configure(max_size, policy, concurrency)
+                if name:
+                    lane.name = name
+
+                # Some tasks might be able to run or to be queued
+                self.__schedule(lane)
+                self.__space.notify_all()
+
+    def remove_lane(self, key):
+        """
+        Removes a lane. Its queued tasks are dropped.
+
+        :param key: Key of the lane
+        :return: The number of dropped tasks
+        """
+        with self.__lock:
+            lane = self.__lanes.pop(key, None)
+            if lane is None:
+                return 0
+
+            lane.closed = True
+            nb_tasks = lane.clear()
+            self.__space.notify_all()
+            return nb_tasks
+
+    def submit(self, key, method, args=(), order_key=None,
+               priority=PRIORITY_NORMAL):
+        """
+        Queues a task in the given lane.
+
+        Tasks of a lane with the same ordering key are executed one at a
+        time, in the order they were queued, while tasks with different keys
+        are spread across the workers.
+
+        :param key: Key of the lane
+        :param method: Method to call
+        :param args: Arguments of the method
+        :param order_key: Ordering key of the task (None for no ordering)
+        :param priority: Priority of the task
+        :return: True if the task has been queued, False if it was dropped
+        :raise KeyError: Unknown lane
+        :raise Overloaded: The lane is full and rejects new tasks
+        """
+        with self.__lock:
+            lane = self.__lanes[key]
+            if lane.is_full():
+                if lane.policy == DROP_OLDEST:
+                    lane.drop_next()
+                elif lane.policy == DROP_NEWEST:
+                    lane.dropped += 1
+                    return False
+                elif lane.policy == REJECT:
+                    lane.rejected += 1
+                    raise Overloaded(None, "Queue {0} is full"
+                                     .format(lane.name))
+                else:
+                    # Block until a slot is freed
+                    while lane.is_full() and not lane.closed \
+                            and not self.__stopped:
+                        self.__space.wait()
+
+                    if lane.closed or lane.is_full():
+                        # Lane removed or dispatcher stopped
+                        lane.dropped += 1
+                        return False
+
+            lane.push((method, args), order_key, priority)
+            self.__schedule(lane)
+            return True
+
+    def __schedule(self, lane):
+        """
+        Puts the given lane in the ready queue, if one of its tasks can be
+        started (lock must be held)
+
+        :param lane: A _Lane object
+        """
+        if lane.closed or not lane.can_run():
+            return
+
+        priority = lane.top_priority()
+        if lane.scheduled is not None and lane.scheduled >= priority:
+            # Already scheduled with at least this priority
+            return
+
+        # If the lane was scheduled with a lower priority, that entry will
+        # be ignored
+        lane.scheduled = priority
+        try:
+            self.__ready[priority].append(lane)
+        except KeyError:
+            self.__ready[priority] = collections.deque((lane,))
+        self.__work.notify()
+
+    def __next_task(self):
+        """
+        Waits for a task to execute
+
+        :return: A (lane, task, ordering key) tuple, or None if the dispatcher
+                 is stopped
+        """
+        with self.__lock:
+            while True:
+                while not self.__ready and not self.__stopped:
+                    self.__work.wait()
+
+                if self.__stopped:
+                    return None
+
+                priority = max(self.__ready)
+                lanes = self.__ready[priority]
+                lane = lanes.popleft()
+                if not lanes:
+                    del self.__ready[priority]
+
+                if lane.scheduled != priority:
+                    # Lane rescheduled with a higher priority
+                    continue
+
+                lane.scheduled = None
+                if not lane.closed and lane.can_run():
+                    break
+
+            task, order_key = lane.pop()
+            if lane.policy == BLOCK:
+                self.__space.notify_all()
+
+            # Let another worker take the next task of this lane
+            self.__schedule(lane)
+            return lane, task, order_key
+
+    def __run(self):
+        """
+        Worker thread loop
+        """
+        while True:
+            task = self.__next_task()
+            if task is None:
+                return
+
+            lane, (method, args), order_key = task
+            try:
+                method(*args)
+            except Exception as ex:
+                _logger.exception("Error running a task of %s: %s",
+                                  lane.name, ex)
+
+            with self.__lock:
+                lane.done(order_key)
+                self.__schedule(lane)
+
+    def get_stats(self):
+        """
+        Returns the statistics of the lanes
+
+        :return: A dictionary: lane name -> statistics dictionary
+        """
+        with self.__lock:
+            return dict((lane.name, lane.get_stats())
+                        for lane in self.__lanes.values())
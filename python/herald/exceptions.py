@@ -103,6 +103,24 @@ class NoListener(HeraldException):
         self.subject = subject
 
 
+class Overloaded(HeraldException):
+    """
+    The message couldn't be handled, as the queues of the peer are full
+    """
+    def __init__(self, target, text, uid=None, subject=None):
+        """
+        Sets up the exception
+
+        :param target: Overloaded target peer
+        :param text: A description of the error
+        :param uid: Original message UID
+        :param subject: Subject of the original message
+        """
+        super(Overloaded, self).__init__(target, text)
+        self.uid = uid
+        self.subject = subject
+
+
 class ForgotMessage(HeraldException):
     """
     Exception given to callback methods waiting for a message that has been
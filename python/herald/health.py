@@ -0,0 +1,278 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald transports health table: keeps track of the latency and of the
+failures of each access of each peer, to choose the best transport.
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Standard library
+import threading
+import time
+
+# ------------------------------------------------------------------------------
+
+CLOSED = "closed"
+""" Circuit closed: the access can be used """
+
+OPEN = "open"
+""" Circuit open: the access is avoided until its retry time """
+
+HALF_OPEN = "half-open"
+""" Circuit half-open: a single message is probing the access """
+
+# ------------------------------------------------------------------------------
+
+
+class _AccessHealth(object):
+    """
+    Health of the access of a peer
+    """
+    __slots__ = ('latency', 'rtt', 'failures', 'state', 'delay', 'retry_at')
+
+    def __init__(self):
+        """
+        Sets up members
+        """
+        # Moving averages of the send duration and of the reply round trip
+        self.latency = None
+        self.rtt = None
+
+        # Number of consecutive failures
+        self.failures = 0
+
+        # Circuit breaker
+        self.state = CLOSED
+        self.delay = 0
+        self.retry_at = 0
+
+    @property
+    def score(self):
+        """
+        The score of the access: the lower, the better. Accesses which failed
+        recently come after the others.
+        """
+        if self.rtt is not None:
+            delay = self.rtt
+        elif self.latency is not None:
+            delay = self.latency
+        else:
+            delay = 0
+        return self.failures > 0, delay
+
+
+class HealthTable(object):
+    """
+    Stores the health of the (peer, access) couples.
+
+    Send durations and reply round trip times are smoothed with an
+    exponentially weighted moving average, which is used to order the accesses
+    of a peer. After ``threshold`` consecutive failures, the circuit of an
+    access is opened: it is tried last until ``delay`` seconds have passed.
+    Then, a single message probes the access (half-open state): its success
+    closes the circuit, its failure opens it again for twice the delay (up to
+    ``max_delay``).
+
+    This class is thread-safe.
+    """
+    def __init__(self, threshold=3, delay=30, max_delay=300, alpha=.2):
+        """
+        Sets up members
+
+        :param threshold: Number of consecutive failures opening the circuit
+        :param delay: Initial time before probing an open circuit, in seconds
+        :param max_delay: Maximum time before probing an open circuit
+        :param alpha: Smoothing factor of the moving averages (0 < alpha <= 1)
+        :raise ValueError: Invalid parameter
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("Invalid smoothing factor: {0}".format(alpha))
+
+        self.__threshold = max(1, int(threshold))
+        self.__delay = float(delay)
+        self.__max_delay = max(float(max_delay), self.__delay)
+        self.__alpha = alpha
+
+        # Peer UID -> {Access ID -> _AccessHealth}
+        self.__peers = {}
+        self.__lock = threading.Lock()
+
+    def __get(self, peer_uid, access_id):
+        """
+        Returns the health bean of the given access (lock must be held)
+
+        :param peer_uid: UID of a peer
+        :param access_id: An access ID
+        :return: An _AccessHealth bean
+        """
+        accesses = self.__peers.setdefault(peer_uid, {})
+        try:
+            return accesses[access_id]
+        except KeyError:
+            health = accesses[access_id] = _AccessHealth()
+            return health
+
+    def __average(self, previous, value):
+        """
+        Computes the new value of a moving average
+
+        :param previous: Previous average (None if unknown)
+        :param value: New sample
+        :return: The new average
+        """
+        if previous is None:
+            return value
+        return previous + self.__alpha * (value - previous)
+
+    def order(self, peer_uid, access_ids):
+        """
+        Sorts the given accesses of a peer, from the best to the worst.
+        Accesses with an open circuit are put at the end, as a last resort.
+
+        Calling this method grants the probing right of the half-open circuits
+        it puts first: the caller must then record the result of the probe.
+
+        :param peer_uid: UID of a peer
+        :param access_ids: IDs of the accesses of the peer
+        :return: The sorted list of access IDs
+        """
+        now = time.time()
+        available = []
+        unavailable = []
+        with self.__lock:
+            accesses = self.__peers.get(peer_uid)
+            if not accesses:
+                # No information about this peer
+                return list(access_ids)
+
+            for access_id in access_ids:
+                health = accesses.get(access_id)
+                if health is None or health.state == CLOSED:
+                    available.append((health.score if health else (False, 0),
+                                      access_id))
+                elif now >= health.retry_at:
+                    # Let this message probe the access (the probe is granted
+                    # again if its result isn't recorded in time)
+                    health.state = HALF_OPEN
+                    health.retry_at = now + health.delay
+                    available.append(((False, health.score[1]), access_id))
+                else:
+                    # Open circuit or probe in progress
+                    unavailable.append((health.retry_at, access_id))
+
+        # Sort is stable: the order of the peer is kept in case of equality
+        available.sort(key=lambda item: item[0])
+        unavailable.sort(key=lambda item: item[0])
+        return [access_id for _, access_id in available] \
+            + [access_id for _, access_id in unavailable]
+
+    def record_success(self, peer_uid, access_id, duration):
+        """
+        A message has been sent using the given access
+
+        :param peer_uid: UID of the peer
+        :param access_id: The access ID
+        :param duration: Time taken by the transport to send the message
+        """
+        with self.__lock:
+            health = self.__get(peer_uid, access_id)
+            health.latency = self.__average(health.latency, duration)
+            health.failures = 0
+            health.state = CLOSED
+            health.delay = 0
+
+    def record_failure(self, peer_uid, access_id):
+        """
+        A transport failed to send a message using the given access
+
+        :param peer_uid: UID of the peer
+        :param access_id: The access ID
+        """
+        with self.__lock:
+            health = self.__get(peer_uid, access_id)
+            health.failures += 1
+            if health.state == CLOSED:
+                if health.failures < self.__threshold:
+                    return
+                health.delay = self.__delay
+            elif health.state == HALF_OPEN:
+                # Probe failed: back off
+                health.delay = min(health.delay * 2, self.__max_delay)
+            else:
+                # Last resort try of an open circuit: keep the retry time
+                return
+
+            health.state = OPEN
+            health.retry_at = time.time() + health.delay
+
+    def record_reply(self, peer_uid, access_id, rtt):
+        """
+        A reply has been received from a peer
+
+        :param peer_uid: UID of the peer
+        :param access_id: The access ID the reply came from
+        :param rtt: Time between the sending of the request and the reception
+                    of the reply
+        """
+        with self.__lock:
+            health = self.__get(peer_uid, access_id)
+            health.rtt = self.__average(health.rtt, rtt)
+
+    def forget_peer(self, peer_uid):
+        """
+        Forgets the information about the given peer
+
+        :param peer_uid: UID of a peer
+        """
+        with self.__lock:
+            self.__peers.pop(peer_uid, None)
+
+    def clear(self):
+        """
+        Forgets all stored information
+        """
+        with self.__lock:
+            self.__peers.clear()
+
+    def get_stats(self, peer_uid):
+        """
+        Returns the health of the accesses of the given peer
+
+        :param peer_uid: UID of a peer
+        :return: A dictionary: Access ID -> dictionary of statistics
+        """
+        with self.__lock:
+            return dict(
+                (access_id, {'state': health.state,
+                             'latency': health.latency,
+                             'rtt': health.rtt,
+                             'failures': health.failures})
+                for access_id, health
+                in self.__peers.get(peer_uid, {}).items())
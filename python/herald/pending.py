@@ -0,0 +1,318 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald registry of the messages waiting for a reply
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Standard library
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+
+
+class _Entry(object):
+    """
+    A pending request
+    """
+    __slots__ = ('item', 'peers', 'deadline')
+
+    def __init__(self, item, peers, deadline):
+        """
+        Sets up members
+
+        :param item: The stored object
+        :param peers: Tuple of the peers the request was sent to
+        :param deadline: Expiration time (None for never)
+        """
+        self.item = item
+        self.peers = peers
+        self.deadline = deadline
+
+
+class PendingRegistry(object):
+    """
+    Stores the objects associated to the messages waiting for a reply.
+
+    Deadlines are kept in a min-heap: a timer thread sleeps until the next
+    one and calls back the expiration method only for the timed out entries.
+    Entries are also indexed by target peer, so that the loss of a peer only
+    costs the number of requests sent to it.
+
+    The expiration method must have the following signature:
+    ``callback(uid, item)``. It is called outside of the registry lock.
+    """
+    def __init__(self, expiration_callback, name="Herald-Pending"):
+        """
+        Sets up members
+
+        :param expiration_callback: Method called when an entry times out
+        :param name: Name of the timer thread
+        """
+        self.__callback = expiration_callback
+        self.__name = name
+
+        # UID -> _Entry
+        self.__entries = {}
+
+        # Peer -> set of UIDs
+        self.__peers = {}
+
+        # Heap of (deadline, sequence, uid, entry)
+        self.__heap = []
+        self.__sequence = itertools.count()
+
+        # Number of heap items which entry has been removed
+        self.__stale = 0
+
+        # Timer thread
+        self.__condition = threading.Condition()
+        self.__stopped = True
+        self.__thread = None
+
+    def __len__(self):
+        """
+        Returns the number of pending entries
+        """
+        return len(self.__entries)
+
+    def __contains__(self, uid):
+        """
+        Checks if an entry is stored for the given message UID
+        """
+        return uid in self.__entries
+
+    def start(self):
+        """
+        Starts the timer thread
+        """
+        with self.__condition:
+            if not self.__stopped:
+                return
+
+            self.__stopped = False
+            self.__thread = threading.Thread(target=self.__run,
+                                             name=self.__name)
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def stop(self):
+        """
+        Stops the timer thread. Stored entries are kept.
+        """
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify()
+            thread, self.__thread = self.__thread, None
+
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def add(self, uid, item, peers=None, timeout=None):
+        """
+        Stores an entry. Replaces the previous entry for the same UID.
+
+        :param uid: UID of the sent message
+        :param item: The object to store
+        :param peers: The peer or the iterable of peers the message was sent
+                      to (optional)
+        :param timeout: Time before the expiration of the entry, in seconds
+                        (None or <= 0 for never)
+        """
+        if peers is None:
+            peers = ()
+        elif not isinstance(peers, (list, tuple, set, frozenset)):
+            peers = (peers,)
+        else:
+            peers = tuple(peers)
+
+        if timeout is not None and timeout > 0:
+            deadline = time.time() + timeout
+        else:
+            deadline = None
+
+        entry = _Entry(item, peers, deadline)
+        with self.__condition:
+            self.__remove(uid)
+            self.__entries[uid] = entry
+            for peer in peers:
+                self.__peers.setdefault(peer, set()).add(uid)
+
+            if deadline is not None:
+                heapq.heappush(self.__heap, (deadline, next(self.__sequence),
+                                             uid, entry))
+                if self.__heap[0][3] is entry:
+                    # New earliest deadline: wake up the timer
+                    self.__condition.notify()
+
+    def __remove(self, uid):
+        """
+        Removes the entry with the given UID (lock must be held)
+
+        :param uid: A message UID
+        :return: The removed entry, or None
+        """
+        entry = self.__entries.pop(uid, None)
+        if entry is None:
+            return None
+
+        for peer in entry.peers:
+            uids = self.__peers.get(peer)
+            if uids is not None:
+                uids.discard(uid)
+                if not uids:
+                    del self.__peers[peer]
+
+        if entry.deadline is not None:
+            # The heap item will be ignored when popped
+            self.__stale += 1
+            if self.__stale > 1024 and self.__stale > len(self.__heap) // 2:
+                # Too many dead items: rebuild the heap
+                self.__heap = [heap_item for heap_item in self.__heap
+                               if self.__entries.get(heap_item[2])
+                               is heap_item[3]]
+                heapq.heapify(self.__heap)
+                self.__stale = 0
+
+        return entry
+
+    def get(self, uid):
+        """
+        Retrieves the object stored for the given message UID
+
+        :param uid: A message UID
+        :return: The stored object
+        :raise KeyError: Unknown UID
+        """
+        return self.__entries[uid].item
+
+    def pop(self, uid):
+        """
+        Removes and returns the object stored for the given message UID
+
+        :param uid: A message UID
+        :return: The stored object
+        :raise KeyError: Unknown UID
+        """
+        with self.__condition:
+            entry = self.__remove(uid)
+
+        if entry is None:
+            raise KeyError(uid)
+        return entry.item
+
+    def pop_peer(self, peer):
+        """
+        Detaches the given peer from the entries waiting for it, and returns
+        those entries. Entries without any other peer are removed; the others
+        are kept until they are popped or expire.
+
+        :param peer: A Peer bean
+        :return: A list of (uid, item) tuples
+        """
+        with self.__condition:
+            result = []
+            for uid in self.__peers.pop(peer, ()):
+                entry = self.__entries[uid]
+                entry.peers = tuple(other for other in entry.peers
+                                    if other != peer)
+                if not entry.peers:
+                    self.__remove(uid)
+                result.append((uid, entry.item))
+            return result
+
+    def clear(self):
+        """
+        Removes all entries
+
+        :return: The list of removed items
+        """
+        with self.__condition:
+            items = [entry.item for entry in self.__entries.values()]
+            self.__entries.clear()
+            self.__peers.clear()
+            del self.__heap[:]
+            self.__stale = 0
+            return items
+
+    def __pop_expired(self, now):
+        """
+        Removes the expired entries (lock must be held)
+
+        :param now: Current time
+        :return: The list of (uid, item) of the expired entries
+        """
+        expired = []
+        heap = self.__heap
+        while heap and heap[0][0] <= now:
+            _, _, uid, entry = heapq.heappop(heap)
+            if self.__entries.get(uid) is entry:
+                # Its heap item has just been popped: don't count it as stale
+                entry.deadline = None
+                self.__remove(uid)
+                expired.append((uid, entry.item))
+            else:
+                # Item of a removed entry
+                self.__stale -= 1
+        return expired
+
+    def __run(self):
+        """
+        Timer loop: waits for the next deadline and calls back the expiration
+        method for the timed out entries
+        """
+        while True:
+            with self.__condition:
+                if self.__stopped:
+                    return
+
+                now = time.time()
+                expired = self.__pop_expired(now)
+                if not expired:
+                    if self.__heap:
+                        self.__condition.wait(self.__heap[0][0] - now)
+                    else:
+                        self.__condition.wait()
+                    continue
+
+            for uid, item in expired:
+                try:
+                    self.__callback(uid, item)
+                except Exception as ex:
+                    _logger.exception("Error notifying the expiration of "
+                                      "%s: %s", uid, ex)
@@ -80,7 +80,8 @@ class HeraldCommands(object):
                 ("post_group", self.post_group),
                 ("forget", self.forget),
                 ("peers", self.list_peers),
-                ("local", self.local_peer), ]
+                ("local", self.local_peer),
+                ("queues", self.queues), ]
 
     def fire(self, io_handler, target, subject, *words):
         """
@@ -236,3 +237,16 @@ class HeraldCommands(object):
         for peer in self._directory.get_peers():
             self.__print_peer(io_handler, peer)
             io_handler.write_line("")
+
+    def queues(self, io_handler):
+        """
+        Prints the statistics of the notification queues of the listeners
+        """
+        headers = ('Queue', 'Depth', 'Max. depth', 'Size', 'Policy',
+                   'Running', 'Processed', 'Dropped', 'Rejected')
+        lines = [(name, stats['depth'], stats['max_depth'],
+                  stats['max_size'] or '-', stats['policy'], stats['running'],
+                  stats['processed'], stats['dropped'], stats['rejected'])
+                 for name, stats
+                 in sorted(self._herald.get_queues_stats().items())]
+        io_handler.write(self._utils.make_table(headers, lines))
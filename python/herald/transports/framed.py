@@ -0,0 +1,684 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald framed stream transports utilities: length-prefixed frames over
+persistent full-duplex sockets, shared by the Unix domain socket and TCP
+transports.
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald
+from herald.exceptions import InvalidPeerAccess
+import herald
+import herald.beans as beans
+import herald.codecs
+import herald.transports.peer_contact as peer_contact
+
+# Standard library
+import logging
+import socket
+import struct
+import threading
+import time
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+
+FRAME_HEADER = struct.Struct(">IB")
+"""
+Frame header: length of the payload (4 bytes) and length of the name of the
+codec used to encode the payload (1 byte). The codec name follows the header,
+then the payload.
+"""
+
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+""" Maximum size of a frame payload (64 MB) """
+
+BUFFER_SIZE = 65536
+""" Size of the socket reception buffer """
+
+# ------------------------------------------------------------------------------
+
+
+def make_frame(codec_name, payload):
+    """
+    Prepares a frame
+
+    :param codec_name: Name of the codec used to encode the payload
+    :param payload: The encoded message (bytes or string)
+    :return: The frame (bytes)
+    """
+    if not isinstance(payload, bytes):
+        payload = payload.encode('utf-8')
+    name = codec_name.encode('ascii')
+    return b"".join((FRAME_HEADER.pack(len(payload), len(name)), name,
+                     payload))
+
+
+class FrameReader(object):
+    """
+    Incremental parser of the frames read from a stream
+    """
+    def __init__(self, max_size=MAX_FRAME_SIZE):
+        """
+        Sets up members
+
+        :param max_size: Maximum size of a frame payload
+        """
+        self.__buffer = bytearray()
+        self.__max_size = max_size
+
+    def feed(self, data):
+        """
+        Adds data read from the stream
+
+        :param data: Received data
+        :return: The list of the (codec name, payload) tuples of the frames
+                 completed by these data
+        :raise ValueError: Invalid frame
+        """
+        buffer = self.__buffer
+        buffer.extend(data)
+
+        frames = []
+        offset = 0
+        header_size = FRAME_HEADER.size
+        while len(buffer) - offset >= header_size:
+            size, name_size = FRAME_HEADER.unpack_from(buffer, offset)
+            if size > self.__max_size:
+                raise ValueError("Frame too large: {0} bytes".format(size))
+
+            start = offset + header_size + name_size
+            end = start + size
+            if end > len(buffer):
+                # Incomplete frame
+                break
+
+            codec_name = bytes(buffer[offset + header_size:start]) \
+                .decode('ascii')
+            frames.append((codec_name, bytes(buffer[start:end])))
+            offset = end
+
+        if offset:
+            # Forget the parsed frames
+            del buffer[:offset]
+        return frames
+
+# ------------------------------------------------------------------------------
+
+
+class Connection(object):
+    """
+    A persistent full-duplex connection, exchanging frames. Frames are read
+    by a dedicated thread and given to a handler, which signature is:
+    ``handler(connection, codec_name, payload)``.
+    """
+    def __init__(self, sock, handler, on_close=None, name=None):
+        """
+        Sets up members
+
+        :param sock: A connected stream socket
+        :param handler: Method called for each received frame
+        :param on_close: Method called with this object when the connection
+                         is closed (optional)
+        :param name: Name of the connection (for logs)
+        """
+        self.__socket = sock
+        self.__handler = handler
+        self.__on_close = on_close
+        self.__name = name or "Herald-Connection"
+        self.__send_lock = threading.Lock()
+        self.__closed = threading.Event()
+        self.__thread = None
+
+        try:
+            self.peer_address = sock.getpeername()
+        except socket.error:
+            self.peer_address = None
+
+    def __str__(self):
+        """
+        String representation
+        """
+        return "{0}({1})".format(self.__name, self.peer_address)
+
+    @property
+    def closed(self):
+        """
+        True if the connection has been closed
+        """
+        return self.__closed.is_set()
+
+    def start(self):
+        """
+        Starts the reading thread
+        """
+        self.__thread = threading.Thread(target=self.__read,
+                                         name=self.__name)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def close(self):
+        """
+        Closes the connection
+        """
+        if self.__closed.is_set():
+            return
+
+        self.__closed.set()
+        try:
+            # Wakes up the reading thread
+            self.__socket.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.__socket.close()
+
+        if self.__on_close is not None:
+            try:
+                self.__on_close(self)
+            except Exception as ex:
+                _logger.exception("Error notifying the closing of %s: %s",
+                                  self, ex)
+
+    def send(self, codec_name, payload):
+        """
+        Sends a frame. Frames are written atomically: this method can be
+        called from any thread.
+
+        :param codec_name: Name of the codec used to encode the payload
+        :param payload: The encoded message
+        :raise IOError: Error writing the frame (the connection is closed)
+        """
+        frame = make_frame(codec_name, payload)
+        try:
+            with self.__send_lock:
+                self.__socket.sendall(frame)
+        except (IOError, socket.error) as ex:
+            self.close()
+            raise IOError("Error writing to {0}: {1}".format(self, ex))
+
+    def __read(self):
+        """
+        Reads frames until the connection is closed
+        """
+        reader = FrameReader()
+        try:
+            while not self.__closed.is_set():
+                data = self.__socket.recv(BUFFER_SIZE)
+                if not data:
+                    # Connection closed by the other side
+                    break
+
+                for codec_name, payload in reader.feed(data):
+                    try:
+                        self.__handler(self, codec_name, payload)
+                    except Exception as ex:
+                        _logger.exception("Error handling a frame from %s: "
+                                          "%s", self, ex)
+        except ValueError as ex:
+            _logger.error("Invalid frame received from %s: %s", self, ex)
+        except (IOError, socket.error) as ex:
+            if not self.__closed.is_set():
+                _logger.debug("Error reading from %s: %s", self, ex)
+        finally:
+            self.close()
+
+
+class FramedServer(object):
+    """
+    Accepts connections on a listening socket
+    """
+    def __init__(self, sock, handler, name=None):
+        """
+        Sets up members
+
+        :param sock: A bound and listening stream socket
+        :param handler: Frame handler given to accepted connections
+        :param name: Name of the server (for threads names)
+        """
+        self.__socket = sock
+        self.__handler = handler
+        self.__name = name or "Herald-Server"
+        self.__connections = set()
+        self.__lock = threading.Lock()
+        self.__thread = None
+        self.__stopped = threading.Event()
+
+    @property
+    def address(self):
+        """
+        The address the server is bound to
+        """
+        return self.__socket.getsockname()
+
+    def start(self):
+        """
+        Starts accepting connections
+        """
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__accept,
+                                         name=self.__name)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stops the server and closes the accepted connections
+        """
+        self.__stopped.set()
+        try:
+            self.__socket.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.__socket.close()
+
+        if self.__thread is not None:
+            self.__thread.join(1)
+            self.__thread = None
+
+        with self.__lock:
+            connections = list(self.__connections)
+            self.__connections.clear()
+
+        for connection in connections:
+            connection.close()
+
+    def __forget(self, connection):
+        """
+        Forgets a closed connection
+        """
+        with self.__lock:
+            self.__connections.discard(connection)
+
+    def __accept(self):
+        """
+        Accepts connections until the server is stopped
+        """
+        while not self.__stopped.is_set():
+            try:
+                client, _ = self.__socket.accept()
+            except (IOError, socket.error) as ex:
+                if not self.__stopped.is_set():
+                    _logger.error("Error accepting a connection: %s", ex)
+                    time.sleep(.1)
+                continue
+
+            setup_socket(client)
+            connection = Connection(client, self.__handler, self.__forget,
+                                    "{0}-Client".format(self.__name))
+            with self.__lock:
+                self.__connections.add(connection)
+            connection.start()
+
+
+class ConnectionPool(object):
+    """
+    Keeps a persistent connection per target address
+    """
+    def __init__(self, connect, handler, name=None):
+        """
+        Sets up members
+
+        :param connect: Method returning a socket connected to the given
+                        address
+        :param handler: Frame handler given to the connections
+        :param name: Name of the pool (for threads names)
+        """
+        self.__connect = connect
+        self.__handler = handler
+        self.__name = name or "Herald-Pool"
+        self.__connections = {}
+        self.__lock = threading.Lock()
+
+    def get(self, address):
+        """
+        Returns the connection to the given address, opening it if necessary
+
+        :param address: Address of the target
+        :return: A Connection object
+        :raise IOError: Error connecting the target
+        """
+        with self.__lock:
+            connection = self.__connections.get(address)
+            if connection is not None and not connection.closed:
+                return connection
+
+            try:
+                sock = self.__connect(address)
+            except socket.error as ex:
+                raise IOError("Error connecting {0}: {1}".format(address, ex))
+
+            setup_socket(sock)
+            connection = Connection(
+                sock, self.__handler,
+                lambda conn: self.__forget(address, conn),
+                "{0}-{1}".format(self.__name, address))
+            self.__connections[address] = connection
+
+        connection.start()
+        return connection
+
+    def __forget(self, address, connection):
+        """
+        Forgets a closed connection
+        """
+        with self.__lock:
+            if self.__connections.get(address) is connection:
+                del self.__connections[address]
+
+    def close(self):
+        """
+        Closes all connections
+        """
+        with self.__lock:
+            connections = list(self.__connections.values())
+            self.__connections.clear()
+
+        for connection in connections:
+            connection.close()
+
+
+def setup_socket(sock):
+    """
+    Configures a connected socket
+
+    :param sock: A stream socket
+    """
+    sock.settimeout(None)
+    if sock.family in (socket.AF_INET, socket.AF_INET6):
+        # Don't wait to fill packets before sending frames
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+# ------------------------------------------------------------------------------
+
+
+class FramedTransport(object):
+    """
+    Base class of the transports exchanging frames over persistent
+    connections.
+
+    Messages are sent asynchronously on a connection kept for each peer: many
+    messages can be in flight on the same connection. Replies are sent back
+    on the connection the request has been received from.
+
+    Subclasses must set the ``_core``, ``_directory``, ``_probe`` and
+    ``_access_id`` members, call ``_start_framing()`` and ``_stop_framing()``
+    when they are validated and invalidated, and implement ``_connect()`` and
+    ``_get_address()``.
+    """
+    def __init__(self):
+        """
+        Sets up members
+        """
+        # Injected services
+        self._core = None
+        self._directory = None
+        self._probe = None
+        self._access_id = None
+
+        # Local peer UID
+        self._peer_uid = None
+
+        # Server and outbound connections
+        self.__server = None
+        self.__pool = None
+
+        # Peer contact handling
+        self.__contact = None
+
+    def _start_framing(self, server_socket, name):
+        """
+        Starts accepting connections
+
+        :param server_socket: A bound and listening stream socket
+        :param name: Prefix of the names of the threads
+        """
+        self._peer_uid = self._directory.local_uid
+        self.__contact = peer_contact.PeerContact(
+            self._directory, self._load_dump, __name__ + ".contact")
+        self.__pool = ConnectionPool(self._connect, self.__handle_frame,
+                                     name)
+        self.__server = FramedServer(server_socket, self.__handle_frame,
+                                     name + "-Server")
+        self.__server.start()
+
+    def _stop_framing(self):
+        """
+        Closes the server and all connections
+        """
+        if self.__server is not None:
+            self.__server.stop()
+            self.__server = None
+
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool = None
+
+        if self.__contact is not None:
+            self.__contact.clear()
+            self.__contact = None
+
+        self._peer_uid = None
+
+    def _connect(self, address):
+        """
+        Returns a socket connected to the given address
+
+        :param address: Address of a peer, as returned by _get_address()
+        :return: A connected socket
+        :raise socket.error: Error connecting the peer
+        """
+        raise NotImplementedError
+
+    def _get_address(self, peer, extra):
+        """
+        Returns the address to connect to reach the given peer
+
+        :param peer: A Peer bean (can be None)
+        :param extra: Extra information, given for replies (can be None)
+        :return: An address, or None if the peer can't be reached
+        """
+        raise NotImplementedError
+
+    def _get_envelope(self):
+        """
+        Returns the headers added to all sent messages
+
+        :return: A dictionary of headers
+        """
+        return {herald.MESSAGE_HEADER_SENDER_UID: self._peer_uid}
+
+    def _get_extra(self, connection, message):
+        """
+        Returns the extra information associated to a received message, used
+        to reply to it
+
+        :param connection: The connection the message was received from
+        :param message: The received MessageReceived bean
+        :return: The extra information dictionary
+        """
+        return {'parent_uid': message.uid, 'connection': connection}
+
+    def _load_dump(self, message, description):
+        """
+        Updates the description of a peer received during the discovery
+
+        :param message: A message containing a remote peer description
+        :param description: The parsed remote peer description
+        :return: The peer dump map
+        """
+        return description
+
+    def __handle_frame(self, connection, codec_name, payload):
+        """
+        Handles a frame received on a connection
+
+        :param connection: The connection the frame was received from
+        :param codec_name: Name of the codec used to encode the payload
+        :param payload: The encoded message
+        """
+        codec = herald.codecs.get_codec(codec_name)
+        if codec is None:
+            _logger.error("Unknown codec %s used by %s", codec_name,
+                          connection)
+            return
+
+        message = codec.decode(payload)
+        if message is None or not message.uid or not message.subject:
+            _logger.error("Invalid message received from %s", connection)
+            return
+
+        message.set_access(self._access_id)
+        message.set_extra(self._get_extra(connection, message))
+
+        # Log before giving message to Herald
+        self._probe.store(
+            herald.PROBE_CHANNEL_MSG_RECV,
+            {"uid": message.uid, "timestamp": time.time(),
+             "transport": self._access_id, "subject": message.subject,
+             "source": message.sender, "repliesTo": message.reply_to or "",
+             "transportSource": str(connection.peer_address)})
+
+        if message.subject.startswith(peer_contact.SUBJECT_DISCOVERY_PREFIX):
+            # Handle discovery message
+            self.__contact.herald_message(self._core, message)
+        else:
+            # All other messages are given to Herald Core
+            self._core.handle_message(message)
+
+    def __get_connection(self, peer, extra=None):
+        """
+        Returns the connection to use to reach a peer
+
+        :param peer: A Peer bean (can be None)
+        :param extra: Extra information, given for replies (can be None)
+        :return: A Connection object, or None if the peer can't be reached
+        :raise IOError: Error connecting the peer
+        """
+        if extra is not None:
+            # Reply on the connection the request came from
+            connection = extra.get('connection')
+            if connection is not None and not connection.closed:
+                return connection
+
+        address = self._get_address(peer, extra)
+        if address is None:
+            return None
+        return self.__pool.get(address)
+
+    def fire(self, peer, message, extra=None):
+        """
+        Fires a message to a peer
+
+        :param peer: A Peer bean
+        :param message: Message bean to send
+        :param extra: Extra information used in case of a reply
+        :raise InvalidPeerAccess: No information found to access the peer
+        :raise IOError: Error sending the message
+        """
+        connection = self.__get_connection(peer, extra)
+        if connection is None:
+            raise InvalidPeerAccess(beans.Target(peer=peer),
+                                    "No '{0}' access found"
+                                    .format(self._access_id))
+
+        envelope = self._get_envelope()
+        parent_uid = None
+        if extra is not None:
+            parent_uid = extra.get('parent_uid')
+            if parent_uid:
+                envelope[herald.MESSAGE_HEADER_REPLIES_TO] = parent_uid
+        if peer is not None:
+            envelope[herald.MESSAGE_HEADER_TARGET_PEER] = peer.uid
+
+        codec, content = herald.codecs.encode(
+            message, (peer,) if peer is not None else None, envelope)
+
+        # Log before sending
+        self._probe.store(
+            herald.PROBE_CHANNEL_MSG_SEND,
+            {"uid": message.uid, "timestamp": time.time(),
+             "transport": self._access_id, "subject": message.subject,
+             "target": peer.uid if peer else "<unknown>",
+             "transportTarget": str(connection.peer_address),
+             "repliesTo": parent_uid or ""})
+
+        connection.send(codec.name, content)
+
+    def fire_group(self, group, peers, message):
+        """
+        Fires a message to a group of peers
+
+        :param group: Name of a group
+        :param peers: Peers to communicate with
+        :param message: Message to send
+        :return: The set of reached peers
+        """
+        envelope = self._get_envelope()
+        envelope[herald.MESSAGE_HEADER_TARGET_GROUP] = group
+
+        # The envelope is the same for all peers: encode once per codec
+        encoded = {}
+        reached = set()
+        for peer in peers:
+            try:
+                connection = self.__get_connection(peer)
+                if connection is None:
+                    _logger.debug("No '%s' access found for %s",
+                                  self._access_id, peer)
+                    continue
+
+                codec = herald.codecs.negotiate(peer)
+                try:
+                    codec, content = encoded[codec.name]
+                except KeyError:
+                    codec_name = codec.name
+                    codec, content = encoded[codec_name] = \
+                        herald.codecs.encode(message, (peer,), envelope)
+
+                # Log before sending
+                self._probe.store(
+                    herald.PROBE_CHANNEL_MSG_SEND,
+                    {"uid": message.uid, "timestamp": time.time(),
+                     "transport": self._access_id,
+                     "subject": message.subject, "target": peer.uid,
+                     "transportTarget": str(connection.peer_address),
+                     "repliesTo": ""})
+
+                connection.send(codec.name, content)
+            except IOError as ex:
+                _logger.error("Error sending a message to %s: %s", peer, ex)
+            else:
+                reached.add(peer)
+
+        return reached
@@ -34,6 +34,12 @@ __docformat__ = "restructuredtext en"
 CONTENT_TYPE_JSON = "application/json"
 """ MIME type: JSON data """
 
+CONTENT_TYPE_BATCH = "application/x-herald-batch"
+"""
+MIME type: batch of messages, as consecutive frames giving the name of the
+codec and the encoded message (see herald.transports.framed)
+"""
+
 # ------------------------------------------------------------------------------
 
 ACCESS_ID = "http"
@@ -65,6 +71,12 @@ FACTORY_SERVLET = "herald-http-servlet-factory"
 Name of the HTTP reception servlet factory
 """
 
+FACTORY_ASYNC_RECEIVER = "herald-http-async-receiver-factory"
+"""
+Name of the asyncio-based HTTP reception component factory, an alternative to
+the servlet which doesn't need a Pelix HTTP service
+"""
+
 FACTORY_DISCOVERY_MULTICAST = "herald-http-discovery-multicast-factory"
 """
 Name of the Multicast discovery component factory
@@ -87,6 +99,29 @@ PROP_DISCOVER_LOCAL_PEERS = "discover.local.peers"
 Are the local peers (from the same node) discovered?
 """
 
+PROP_SENDER_MAX_IN_FLIGHT = "sender.max.in.flight"
+"""
+Maximum number of requests sent at once to a peer by the HTTP transport
+"""
+
+PROP_SENDER_WORKERS = "sender.workers"
+"""
+Number of threads sending the HTTP requests
+"""
+
+PROP_BATCH_WINDOW = "sender.batch.window"
+"""
+Time (in seconds) during which the messages sent without waiting to the same
+peer are coalesced in a single request (0: only while the previous requests
+to the peer are in flight)
+"""
+
+PROP_BATCH_SIZE = "sender.batch.size"
+"""
+Maximum size (in bytes) of a batch of messages: a batch reaching this size is
+sent without waiting for the end of the window
+"""
+
 # ------------------------------------------------------------------------------
 
 MESSAGE_HEADER_PORT = "herald-http-tansport-port"
@@ -0,0 +1,435 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald HTTP transport asyncio-based receiver: an alternative to the servlet,
+handling all connections in a single event loop thread
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald
+from . import ACCESS_ID, SERVICE_HTTP_DIRECTORY, SERVICE_HTTP_RECEIVER, \
+    FACTORY_ASYNC_RECEIVER, CONTENT_TYPE_JSON
+from . import beans, reception
+from herald.dispatch import Dispatcher
+import herald
+import herald.transports.peer_contact as peer_contact
+import herald.utils as utils
+
+# Pelix
+from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
+    Property, Validate, Invalidate, RequiresBest
+import pelix.http
+
+# Standard library
+import asyncio
+import logging
+import threading
+from http.client import responses
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+MAX_HEADERS_SIZE = 65536
+""" Maximum size of the request line and headers of a request """
+
+MAX_BODY_SIZE = 64 * 1024 * 1024
+""" Maximum size of the body of a request """
+
+# ------------------------------------------------------------------------------
+
+
+class _HttpRequest(object):
+    """
+    A parsed HTTP request
+    """
+    __slots__ = ('method', 'path', 'headers', 'body', 'keep_alive')
+
+    def __init__(self, method, path, headers, body, keep_alive):
+        """
+        Sets up members
+
+        :param method: HTTP method (upper case)
+        :param path: Requested path, without query
+        :param headers: Headers, with lower case names
+        :param body: Body of the request (bytes)
+        :param keep_alive: True if the connection must be kept open
+        """
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+        self.keep_alive = keep_alive
+
+
+class _HttpError(Exception):
+    """
+    Invalid request: the connection must be closed after the error response
+    """
+    def __init__(self, code):
+        """
+        :param code: HTTP error code
+        """
+        Exception.__init__(self, responses.get(code, ""))
+        self.code = code
+
+
+def _parse_request(buffer):
+    """
+    Parses the first request of the given buffer, and removes it from the
+    buffer
+
+    :param buffer: A bytearray
+    :return: An _HttpRequest, or None if the request is incomplete
+    :raise _HttpError: Invalid request
+    """
+    headers_end = buffer.find(b"\r\n\r\n")
+    if headers_end == -1:
+        if len(buffer) > MAX_HEADERS_SIZE:
+            raise _HttpError(431)
+        return None
+
+    lines = bytes(buffer[:headers_end]).decode('iso-8859-1').split("\r\n")
+    try:
+        method, target, version = lines[0].split()
+    except ValueError:
+        raise _HttpError(400)
+
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        # Herald peers always give the length of their messages
+        raise _HttpError(411)
+
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise _HttpError(400)
+    if length > MAX_BODY_SIZE:
+        raise _HttpError(413)
+
+    body_start = headers_end + 4
+    if len(buffer) < body_start + length:
+        # Wait for the whole body
+        return None
+
+    body = bytes(buffer[body_start:body_start + length])
+    del buffer[:body_start + length]
+
+    connection = headers.get('connection', '').lower()
+    if version == "HTTP/1.0":
+        keep_alive = connection == "keep-alive"
+    else:
+        keep_alive = connection != "close"
+
+    return _HttpRequest(method.upper(), target.split('?', 1)[0], headers,
+                        body, keep_alive)
+
+
+class _HttpProtocol(asyncio.Protocol):
+    """
+    Handles a client connection, in the event loop thread
+    """
+    def __init__(self, receiver):
+        """
+        Sets up members
+
+        :param receiver: The AsyncHttpReceiver component
+        """
+        self.__receiver = receiver
+        self.__transport = None
+        self.__buffer = bytearray()
+        self.__host = None
+
+    def connection_made(self, transport):
+        """
+        A client connected
+        """
+        self.__transport = transport
+        self.__host = utils.normalize_ip(
+            transport.get_extra_info('peername')[0])
+        self.__receiver.connection_made(self)
+
+    def connection_lost(self, exc):
+        """
+        The connection has been closed
+        """
+        self.__receiver.connection_lost(self)
+        self.__transport = None
+
+    def close(self):
+        """
+        Closes the connection
+        """
+        if self.__transport is not None:
+            self.__transport.close()
+
+    def data_received(self, data):
+        """
+        Parses the received requests and answers them. The received messages
+        are given to the receiver as a single batch.
+        """
+        self.__buffer.extend(data)
+        batch = []
+        try:
+            while self.__transport is not None:
+                request = _parse_request(self.__buffer)
+                if request is None:
+                    break
+
+                code, content = self.__receiver.handle_request(
+                    request, self.__host, batch)
+                self.__respond(code, content, request.keep_alive)
+                if not request.keep_alive:
+                    self.__transport.close()
+                    break
+        except _HttpError as ex:
+            self.__respond(ex.code, b"", False)
+            self.__transport.close()
+
+        if batch:
+            self.__receiver.deliver(batch, id(self))
+
+    def __respond(self, code, content, keep_alive):
+        """
+        Writes a response
+
+        :param code: HTTP status code
+        :param content: Body of the response (bytes)
+        :param keep_alive: If False, the client is told that the connection
+                           will be closed
+        """
+        self.__transport.write(
+            "HTTP/1.1 {0} {1}\r\nContent-Type: {2}\r\nContent-Length: {3}\r\n"
+            "Connection: {4}\r\n\r\n"
+            .format(code, responses.get(code, ""), CONTENT_TYPE_JSON,
+                    len(content), "keep-alive" if keep_alive else "close")
+            .encode('ascii') + content)
+
+# ------------------------------------------------------------------------------
+
+
+@ComponentFactory(FACTORY_ASYNC_RECEIVER)
+@RequiresBest('_probe', herald.SERVICE_PROBE)
+@Requires('_core', herald.SERVICE_HERALD_INTERNAL)
+@Requires('_directory', herald.SERVICE_DIRECTORY)
+@Requires('_http_directory', SERVICE_HTTP_DIRECTORY)
+@Provides(SERVICE_HTTP_RECEIVER, '_controller')
+@Property('_host', pelix.http.HTTP_SERVICE_ADDRESS, '0.0.0.0')
+@Property('_port', pelix.http.HTTP_SERVICE_PORT, 8080)
+@Property('_servlet_path', pelix.http.HTTP_SERVLET_PATH, '/herald')
+@Property('_workers', 'herald.http.async.workers', 4)
+class AsyncHttpReceiver(object):
+    """
+    HTTP reception component based on asyncio: all connections are handled
+    by a single event loop thread. The received messages are decoded and
+    given to Herald by a pool of workers, in batches.
+
+    It implements the same protocol as the servlet and doesn't need a Pelix
+    HTTP service: only one of them must be instantiated.
+    """
+    def __init__(self):
+        """
+        Sets up the component
+        """
+        # Herald services
+        self._core = None
+        self._directory = None
+        self._http_directory = None
+        self._probe = None
+
+        # Properties
+        self._host = '0.0.0.0'
+        self._port = 8080
+        self._servlet_path = '/herald'
+        self._workers = 4
+
+        # Service controller (set once bound)
+        self._controller = False
+
+        # Peer contact handling
+        self.__contact = None
+
+        # Event loop
+        self.__loop = None
+        self.__server = None
+        self.__thread = None
+        self.__protocols = set()
+
+        # Messages handling
+        self.__pool = Dispatcher("herald-http-async")
+        self.__pool.set_lane("inbound")
+
+    @Validate
+    def _validate(self, _):
+        """
+        Component validated
+        """
+        # Normalize the servlet path
+        if not self._servlet_path.startswith('/'):
+            self._servlet_path = '/{0}'.format(self._servlet_path)
+        self._servlet_path = self._servlet_path.rstrip('/') or '/'
+
+        # Prepare the peer contact handler
+        self.__contact = peer_contact.PeerContact(
+            self._directory, reception.load_dump, __name__ + ".contact")
+        self.__pool.start(int(self._workers))
+
+        # Start the server
+        self.__loop = asyncio.new_event_loop()
+        self.__server = self.__loop.run_until_complete(
+            self.__loop.create_server(lambda: _HttpProtocol(self),
+                                      self._host, int(self._port),
+                                      backlog=1024, reuse_address=True))
+        self._port = self.__server.sockets[0].getsockname()[1]
+
+        self.__thread = threading.Thread(target=self.__loop.run_forever,
+                                         name="Herald-HTTP-Async")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+        # Tell the directory we're ready
+        access = beans.HTTPAccess(self._host, self._port, self._servlet_path,
+                                  True)
+        self._directory.get_local_peer().set_access(ACCESS_ID, access)
+        self._controller = True
+
+    @Invalidate
+    def _invalidate(self, _):
+        """
+        Component invalidated
+        """
+        self._controller = False
+        self._directory.get_local_peer().unset_access(ACCESS_ID)
+
+        # Stop the server and close the connections
+        self.__loop.call_soon_threadsafe(self.__stop_server)
+        self.__thread.join()
+        self.__loop.run_until_complete(self.__server.wait_closed())
+        self.__loop.close()
+        self.__loop = None
+        self.__server = None
+        self.__thread = None
+
+        # Stop handling messages
+        self.__pool.stop()
+        self.__pool.clear()
+        self.__contact.clear()
+        self.__contact = None
+
+    def __stop_server(self):
+        """
+        Closes the server and the connections, then stops the event loop.
+        Called in the event loop thread.
+        """
+        self.__server.close()
+        for protocol in list(self.__protocols):
+            protocol.close()
+        self.__loop.stop()
+
+    def get_access_info(self):
+        """
+        Retrieves the (host, port, path) tuple to access this receiver.
+
+        :return: An (host, port, path) tuple
+        """
+        return self._host, self._port, self._servlet_path
+
+    def connection_made(self, protocol):
+        """
+        A client connected (event loop thread)
+        """
+        self.__protocols.add(protocol)
+
+    def connection_lost(self, protocol):
+        """
+        A client connection has been closed (event loop thread)
+        """
+        self.__protocols.discard(protocol)
+
+    def handle_request(self, request, host, batch):
+        """
+        Handles a parsed request (event loop thread)
+
+        :param request: An _HttpRequest bean
+        :param host: Normalized address of the client
+        :param batch: List where to store the received messages
+        :return: A (HTTP code, response body) tuple
+        """
+        path = request.path.rstrip('/') or '/'
+        if path != self._servlet_path:
+            return 404, b""
+
+        if request.method == "POST":
+            # Messages are decoded by the workers
+            batch.append((request.body, request.headers.get('content-type'),
+                          host))
+            return 200, b""
+        elif request.method == "GET":
+            return 200, reception.make_peer_dump(self._directory) \
+                .encode('utf-8')
+        return 405, b""
+
+    def deliver(self, batch, order_key):
+        """
+        Queues a batch of received messages (event loop thread)
+
+        :param batch: A list of (body, content type, host) tuples
+        :param order_key: Key used to keep the order of the messages of a
+                          connection
+        """
+        self.__pool.submit("inbound", self.__deliver, (batch,),
+                           order_key=order_key)
+
+    def __deliver(self, batch):
+        """
+        Decodes the messages of a batch and gives them to Herald (worker
+        thread)
+
+        :param batch: A list of (body, content type, host) tuples
+        """
+        for data, content_type, host in batch:
+            try:
+                messages = reception.make_messages(
+                    data, content_type, host, self._http_directory)
+            except Exception as ex:
+                _logger.exception("Error decoding a received request: %s", ex)
+                continue
+
+            for message in messages:
+                try:
+                    reception.deliver_message(message, self._core,
+                                              self.__contact, self._probe)
+                except Exception as ex:
+                    _logger.exception("Error handling a received message: %s",
+                                      ex)
@@ -46,13 +46,14 @@ class HTTPAccess(object):
     """
     Description of an HTTP access
     """
-    def __init__(self, host, port, path):
+    def __init__(self, host, port, path, batch=False):
         """
         Sets up the access
 
         :param host: HTTP server host
         :param port: HTTP server port
         :param path: Path to the Herald service
+        :param batch: True if the Herald service accepts batches of messages
         """
         # Normalize path
         if path[0] == '/':
@@ -61,6 +62,7 @@ class HTTPAccess(object):
         self.__host = host
         self.__port = int(port)
         self.__path = path
+        self.__batch = bool(batch)
 
     def __hash__(self):
         """
@@ -133,9 +135,19 @@ class HTTPAccess(object):
         """
         return self.__path
 
+    @property
+    def batch(self):
+        """
+        True if the Herald service accepts batches of messages
+        """
+        return self.__batch
+
     def dump(self):
         """
         Returns the content to store in a directory dump to describe this
-        access
+        access. The batch flag is appended to the access tuple only if set:
+        older peers only read the first three items.
         """
+        if self.__batch:
+            return self.access + (True,)
         return self.access
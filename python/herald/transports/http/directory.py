@@ -93,7 +93,8 @@ class HTTPDirectory(object):
         :param data: Result of a call to HTTPAccess.dump()
         :return: An HTTPAccess bean
         """
-        return HTTPAccess(data[0], data[1], data[2])
+        return HTTPAccess(data[0], data[1], data[2],
+                          len(data) > 3 and data[3])
 
     def peer_access_set(self, peer, data):
         """
@@ -512,6 +512,9 @@ class MulticastHeartbeat(object):
     """
     Discovery of Herald peers based on multicast
     """
+    _access_id = ACCESS_ID
+    """ ID of the access discovered by this component """
+
     def __init__(self):
         """
         Sets up the component
@@ -569,10 +572,11 @@ class MulticastHeartbeat(object):
         self._multicast_target = (address, self._port)
 
         # Start the heart & TTL threads
+        prefix = "Herald-{0}".format(self._access_id.upper())
         self._heart_thread = threading.Thread(target=self.__heart_loop,
-                                              name="Herald-HTTP-HeartBeat")
+                                              name=prefix + "-HeartBeat")
         self._lst_thread = threading.Thread(target=self.__lst_loop,
-                                            name="Herald-HTTP-LST")
+                                            name=prefix + "-LST")
         self._heart_thread.start()
         self._lst_thread.start()
 
@@ -636,7 +640,7 @@ class MulticastHeartbeat(object):
             try:
                 # Peer is going away
                 peer = self._directory.get_peer(peer_uid)
-                peer.unset_access(ACCESS_ID)
+                peer.unset_access(self._access_id)
             except KeyError:
                 # Unknown peer
                 pass
@@ -0,0 +1,251 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald HTTP transport reception utilities: conversion of the HTTP requests
+received by the servlet or by the asyncio receiver into message beans
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald
+from . import ACCESS_ID, MESSAGE_HEADER_PORT, MESSAGE_HEADER_PATH, \
+    CONTENT_TYPE_BATCH
+from .beans import HTTPAccess
+import herald
+import herald.beans as beans
+import herald.codecs
+import herald.transports.framed as framed
+import herald.transports.peer_contact as peer_contact
+import herald.utils as utils
+
+# Pelix
+from pelix.utilities import to_str
+import pelix.misc.jabsorb as jabsorb
+
+# Standard library
+import json
+import logging
+import time
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+
+
+def make_peer_dump(directory):
+    """
+    Prepares the content of the answer to a GET request: the description of
+    the local peer
+
+    :param directory: The Herald directory
+    :return: The JSON description of the local peer
+    """
+    peer_dump = directory.get_local_peer().dump()
+    jabsorb_content = jabsorb.to_jabsorb(peer_dump)
+    return json.dumps(jabsorb_content, default=utils.json_converter)
+
+
+def make_messages(data, content_type, host, http_directory):
+    """
+    Converts the body of a POST request into message beans: a batch contains
+    several messages, other requests a single one
+
+    :param data: Body of the request
+    :param content_type: Content type of the request
+    :param host: Normalized address of the client
+    :param http_directory: The HTTP transport directory, used to check the
+                           sender UID
+    :return: A list of MessageReceived beans
+    """
+    if content_type != CONTENT_TYPE_BATCH:
+        return [make_message(data, content_type, host, http_directory)]
+
+    try:
+        frames = framed.FrameReader().feed(data)
+    except ValueError as ex:
+        _logger.error("Invalid batch received from %s: %s", host, ex)
+        return []
+
+    # The messages of a batch usually come from the same peer
+    checked = {}
+    messages = []
+    for codec_name, payload in frames:
+        codec = herald.codecs.get_codec(codec_name)
+        if codec is None:
+            _logger.error("Unknown codec %s in a batch from %s", codec_name,
+                          host)
+            continue
+
+        try:
+            received_msg = codec.decode(payload)
+        except Exception as ex:
+            _logger.exception("Error decoding a message: %s", ex)
+            continue
+
+        if received_msg is None \
+                or not received_msg.uid or not received_msg.subject:
+            _logger.error("Invalid message in a batch from %s", host)
+            continue
+
+        messages.append(_prepare_message(received_msg, host, http_directory,
+                                         checked))
+    return messages
+
+
+def make_message(data, content_type, host, http_directory):
+    """
+    Converts the body of a POST request into a message bean
+
+    :param data: Body of the request
+    :param content_type: Content type of the request
+    :param host: Normalized address of the client
+    :param http_directory: The HTTP transport directory, used to check the
+                           sender UID
+    :return: A MessageReceived bean
+    """
+    received_msg = None
+
+    # Herald messages are decoded according to their content type
+    codec = herald.codecs.get_codec_for(content_type)
+    if codec is not None:
+        try:
+            received_msg = codec.decode(data)
+        except Exception as ex:
+            _logger.exception("Error decoding a message: %s", ex)
+
+    if received_msg is None \
+            or not received_msg.uid or not received_msg.subject:
+        # Raw message
+        try:
+            msg_content = to_str(data)
+        except UnicodeDecodeError:
+            # Binary content
+            msg_content = data
+        extra = {'host': host, 'raw': True}
+        return beans.MessageReceived(utils.generate_uid(), herald.SUBJECT_RAW,
+                                     msg_content, None, None, ACCESS_ID,
+                                     None, extra)
+
+    return _prepare_message(received_msg, host, http_directory)
+
+
+def _prepare_message(received_msg, host, http_directory, checked=None):
+    """
+    Stores the sender information in a decoded message
+
+    :param received_msg: A decoded MessageReceived bean
+    :param host: Normalized address of the client
+    :param http_directory: The HTTP transport directory, used to check the
+                           sender UID
+    :param checked: A (sender UID, port) -> checked sender UID dictionary,
+                    to check the sender of a batch only once (optional)
+    :return: The updated bean
+    """
+    try:
+        port = int(received_msg.get_header(MESSAGE_HEADER_PORT))
+    except (KeyError, ValueError, TypeError):
+        port = 80
+    path = None
+    if MESSAGE_HEADER_PATH in received_msg.headers:
+        path = received_msg.get_header(MESSAGE_HEADER_PATH)
+    extra = {'host': host, 'port': port, 'path': path,
+             'parent_uid': received_msg.uid}
+
+    sender_uid = received_msg.sender
+    key = (sender_uid, port)
+    if checked is not None and key in checked:
+        sender_uid = checked[key]
+    else:
+        try:
+            # Check the sender UID port
+            # (not perfect, but can avoid spoofing)
+            if not http_directory.check_access(sender_uid, host, port):
+                # Port doesn't match: invalid UID
+                sender_uid = "<invalid>"
+        except ValueError:
+            # Unknown peer UID: keep it as is
+            pass
+
+        if checked is not None:
+            checked[key] = sender_uid
+
+    # Prepare the bean
+    received_msg.add_header(herald.MESSAGE_HEADER_SENDER_UID, sender_uid)
+    received_msg.set_access(ACCESS_ID)
+    received_msg.set_extra(extra)
+    return received_msg
+
+
+def deliver_message(message, core, contact, probe):
+    """
+    Gives a received message to the peer contact (discovery messages) or to
+    the Herald core (all other messages)
+
+    :param message: A MessageReceived bean, from make_message()
+    :param core: The Herald core service
+    :param contact: The PeerContact object of the receiver
+    :param probe: The debug probe service
+    """
+    # Log before giving message to Herald
+    extra = message.extra
+    probe.store(
+        herald.PROBE_CHANNEL_MSG_RECV,
+        {"uid": message.uid, "timestamp": time.time(),
+         "transport": ACCESS_ID, "subject": message.subject,
+         "source": message.sender, "repliesTo": message.reply_to or "",
+         "transportSource": "[{0}]:{1}".format(extra['host'],
+                                               extra.get('port', -1))})
+
+    if message.subject.startswith(peer_contact.SUBJECT_DISCOVERY_PREFIX):
+        # Handle discovery message
+        contact.herald_message(core, message)
+    else:
+        # All other messages are given to Herald Core
+        core.handle_message(message)
+
+
+def load_dump(message, description):
+    """
+    Loads and updates the remote peer dump with its HTTP access
+
+    :param message: A message containing a remote peer description
+    :param description: The parsed remote peer description
+    :return: The peer dump map
+    """
+    if message.access == ACCESS_ID:
+        # Forge the access to the HTTP server using extra information
+        extra = message.extra
+        accesses = description['accesses']
+        previous = accesses.get(ACCESS_ID) or ()
+        accesses[ACCESS_ID] = HTTPAccess(
+            extra['host'], extra['port'], extra['path'],
+            len(previous) > 3 and previous[3]).dump()
+    return description
@@ -0,0 +1,424 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald HTTP transport sender engine: non-blocking posts, with keep-alive
+connections and a bounded number of in-flight requests per peer. Messages to
+the same peer can be coalesced in batches.
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald HTTP
+from . import CONTENT_TYPE_BATCH
+
+# HTTP requests
+import requests
+import requests.adapters
+
+# Herald
+from herald.dispatch import Dispatcher, PRIORITY_NORMAL
+from herald.transports.framed import make_frame
+
+# Standard library
+from concurrent.futures import Future
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+MAX_TARGETS_POOLS = 256
+""" Maximum number of targets with a pool of kept-alive connections """
+
+# States of a batch
+_IDLE = 0
+_WAITING = 1
+_QUEUED = 2
+
+# ------------------------------------------------------------------------------
+
+
+class _Batch(object):
+    """
+    Messages waiting to be sent to a target
+    """
+    __slots__ = ('url', 'items', 'size', 'state', 'priority')
+
+    def __init__(self, url):
+        """
+        :param url: Target URL
+        """
+        self.url = url
+        self.items = []
+        self.size = 0
+        self.state = _IDLE
+        self.priority = PRIORITY_NORMAL
+
+    def pop(self):
+        """
+        Returns and removes the waiting messages
+
+        :return: A list of (codec name, content, content type, future) tuples
+        """
+        items = self.items
+        self.items = []
+        self.size = 0
+        self.state = _IDLE
+        self.priority = PRIORITY_NORMAL
+        return items
+
+
+class HttpSender(object):
+    """
+    Sends HTTP POST requests from a pool of workers. Each target (peer HTTP
+    server) has its own queue, with a bounded number of in-flight requests:
+    a slow peer can't hold all the workers. Connections are kept alive and
+    reused, up to the in-flight limit per target.
+
+    Messages posted with post_batched() are coalesced: those waiting for an
+    in-flight slot, or posted during the batch window, are sent in a single
+    request.
+
+    Each post returns a future, resolved with the HTTP response, or failing
+    with the connection or HTTP error.
+    """
+    def __init__(self, name="herald-http", max_in_flight=4, workers=10,
+                 batch_window=0, batch_size=65536):
+        """
+        Sets up members
+
+        :param name: Prefix of the name of the worker threads
+        :param max_in_flight: Maximum number of requests sent at once to a
+                              target
+        :param workers: Number of worker threads
+        :param batch_window: Time (in seconds) to wait for other messages
+                             before sending a batch which isn't flushed
+        :param batch_size: Size (in bytes) of a batch which is sent without
+                           waiting
+        """
+        self.__name = name
+        self.__max_in_flight = max(1, int(max_in_flight))
+        self.__workers = max(1, int(workers))
+        self.__batch_window = max(0, float(batch_window))
+        self.__batch_size = max(1, int(batch_size))
+        self.__pool = Dispatcher(name)
+        self.__session = None
+
+        # Target -> Futures not yet resolved (targets with a lane)
+        self.__pending = {}
+        self.__lock = threading.Lock()
+
+        # Target -> _Batch
+        self.__batches = {}
+
+        # Batch window: heap of (deadline, counter, target)
+        self.__deadlines = []
+        self.__counter = itertools.count()
+        self.__timer = threading.Condition(self.__lock)
+        self.__timer_thread = None
+        self.__stopped = True
+
+    def start(self):
+        """
+        Starts the workers
+        """
+        self.__session = requests.Session()
+        self.__session.stream = False
+
+        # Keep as many connections per target as in-flight requests
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=MAX_TARGETS_POOLS,
+            pool_maxsize=self.__max_in_flight)
+        self.__session.mount('http://', adapter)
+        self.__pool.start(self.__workers)
+
+        self.__stopped = False
+        if self.__batch_window:
+            self.__timer_thread = threading.Thread(
+                target=self.__timer_loop,
+                name="{0}-BatchWindow".format(self.__name))
+            self.__timer_thread.daemon = True
+            self.__timer_thread.start()
+
+    def stop(self):
+        """
+        Stops the workers. The pending requests fail with an IOError.
+        """
+        with self.__lock:
+            self.__stopped = True
+            self.__timer.notify_all()
+
+        if self.__timer_thread is not None:
+            self.__timer_thread.join()
+            self.__timer_thread = None
+
+        self.__pool.stop()
+        with self.__lock:
+            targets = set(self.__pending)
+            targets.update(self.__batches)
+            del self.__deadlines[:]
+        for target in targets:
+            self.forget(target)
+
+        if self.__session is not None:
+            self.__session.close()
+            self.__session = None
+
+    def forget(self, target):
+        """
+        Drops the queue of a target, e.g. when the associated peer is gone.
+        Its pending requests fail with an IOError.
+
+        :param target: A target address, as given to post()
+        """
+        with self.__lock:
+            pending = self.__pending.pop(target, None) or set()
+            batch = self.__batches.pop(target, None)
+            if batch is not None:
+                pending.update(item[3] for item in batch.pop())
+            self.__pool.remove_lane(target)
+
+        for future in pending:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(IOError("Request to {0} dropped"
+                                             .format(target)))
+
+    def __get_pending(self, target):
+        """
+        Returns the set of pending futures of a target, and prepares its
+        lane if necessary. Must be called with the lock held.
+
+        :param target: A target address
+        :return: The set of pending futures of the target
+        """
+        pending = self.__pending.get(target)
+        if pending is None:
+            self.__pool.set_lane(target, "http-{0}".format(target),
+                                 concurrency=self.__max_in_flight)
+            pending = self.__pending[target] = set()
+        return pending
+
+    def __submit(self, target, method, args, priority):
+        """
+        Queues a task in the lane of a target
+
+        :return: True if the task has been queued
+        """
+        try:
+            return self.__pool.submit(target, method, args,
+                                      priority=priority)
+        except KeyError:
+            # Lane removed meanwhile
+            return False
+
+    def post(self, target, url, content, headers, priority=PRIORITY_NORMAL):
+        """
+        Queues a POST request
+
+        :param target: Address of the target server, e.g. a (host, port)
+                       tuple: requests to the same target share its in-flight
+                       limit
+        :param url: Target URL
+        :param content: Request body
+        :param headers: Request headers
+        :param priority: Priority of the request in the target queue
+        :return: A Future object, resolved with the response bean
+        """
+        future = Future()
+        with self.__lock:
+            self.__get_pending(target).add(future)
+
+        if not self.__submit(target, self.__post,
+                             (target, future, url, content, headers),
+                             priority):
+            if self.__pop(target, future) \
+                    and future.set_running_or_notify_cancel():
+                future.set_exception(IOError("Request to {0} dropped"
+                                             .format(url)))
+        return future
+
+    def post_batched(self, target, url, codec_name, content, content_type,
+                     priority=PRIORITY_NORMAL, flush=True):
+        """
+        Queues an encoded message, which can be sent in a batch with other
+        messages to the same target. The target must accept batches.
+
+        :param target: Address of the target server
+        :param url: Target URL
+        :param codec_name: Name of the codec used to encode the message
+        :param content: The encoded message
+        :param content_type: Content type of the message, used if it is sent
+                             alone
+        :param priority: Priority of the message in the target queue
+        :param flush: If True, the batch is sent as soon as possible, else it
+                      waits for the end of the batch window
+        :return: A Future object, resolved with the response bean
+        """
+        future = Future()
+        with self.__lock:
+            # Prepare the lane
+            self.__get_pending(target)
+
+            batch = self.__batches.get(target)
+            if batch is None:
+                batch = self.__batches[target] = _Batch(url)
+
+            batch.items.append((codec_name, content, content_type, future))
+            batch.size += len(content)
+            batch.priority = max(batch.priority, priority)
+
+            submit = False
+            if batch.state != _QUEUED:
+                if flush or not self.__batch_window \
+                        or batch.size >= self.__batch_size:
+                    # Send as soon as an in-flight slot is free
+                    batch.state = _QUEUED
+                    submit = True
+                elif batch.state == _IDLE:
+                    # Wait for other messages
+                    batch.state = _WAITING
+                    heapq.heappush(self.__deadlines,
+                                   (time.time() + self.__batch_window,
+                                    next(self.__counter), target))
+                    self.__timer.notify()
+
+            if submit and not self.__submit(target, self.__post_batch,
+                                            (target,), batch.priority):
+                self.__fail_batch(target)
+        return future
+
+    def __fail_batch(self, target):
+        """
+        Fails the messages of the batch of a target, which couldn't be queued.
+        Must be called with the lock held.
+        """
+        batch = self.__batches.pop(target, None)
+        if batch is not None:
+            for item in batch.pop():
+                future = item[3]
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(IOError("Request to {0} dropped"
+                                                 .format(target)))
+
+    def __timer_loop(self):
+        """
+        Queues the batches at the end of their window
+        """
+        with self.__lock:
+            while not self.__stopped:
+                if not self.__deadlines:
+                    self.__timer.wait()
+                    continue
+
+                delay = self.__deadlines[0][0] - time.time()
+                if delay > 0:
+                    self.__timer.wait(delay)
+                    continue
+
+                target = heapq.heappop(self.__deadlines)[2]
+                batch = self.__batches.get(target)
+                if batch is not None and batch.state == _WAITING:
+                    batch.state = _QUEUED
+                    if not self.__submit(target, self.__post_batch,
+                                         (target,), batch.priority):
+                        self.__fail_batch(target)
+
+    def __pop(self, target, future):
+        """
+        Removes a future from the pending ones
+
+        :return: True if the future was pending
+        """
+        with self.__lock:
+            try:
+                self.__pending[target].remove(future)
+                return True
+            except KeyError:
+                return False
+
+    def __post(self, target, future, url, content, headers):
+        """
+        Sends a request (worker thread)
+        """
+        if not self.__pop(target, future):
+            # Already resolved (target forgotten)
+            return
+
+        if not future.set_running_or_notify_cancel():
+            # Cancelled by the caller
+            return
+
+        try:
+            response = self.__session.post(url, content, headers=headers)
+            # Raise an error if the status isn't 2XX
+            response.raise_for_status()
+        except Exception as ex:
+            future.set_exception(ex)
+        else:
+            future.set_result(response)
+
+    def __post_batch(self, target):
+        """
+        Sends the messages waiting for a target (worker thread)
+        """
+        with self.__lock:
+            batch = self.__batches.get(target)
+            if batch is None:
+                # Target forgotten
+                return
+            url = batch.url
+            items = [item for item in batch.pop()
+                     if item[3].set_running_or_notify_cancel()]
+
+        if not items:
+            # All messages have been cancelled
+            return
+        elif len(items) == 1:
+            # Single message: send it as is
+            _, content, content_type, _ = items[0]
+        else:
+            content = b"".join(make_frame(item[0], item[1])
+                               for item in items)
+            content_type = CONTENT_TYPE_BATCH
+
+        try:
+            response = self.__session.post(
+                url, content, headers={'content-type': content_type})
+            # Raise an error if the status isn't 2XX
+            response.raise_for_status()
+        except Exception as ex:
+            for item in items:
+                item[3].set_exception(ex)
+        else:
+            for item in items:
+                item[3].set_result(response)
@@ -35,25 +35,21 @@ __version__=herald.version.__version__
 # Herald
 from . import ACCESS_ID, SERVICE_HTTP_DIRECTORY, SERVICE_HTTP_RECEIVER, \
     FACTORY_SERVLET, CONTENT_TYPE_JSON
-from . import beans
-import herald.beans
+from . import beans, reception
+import herald
 import herald.transports.peer_contact as peer_contact
 import herald.utils as utils
-import herald.transports.http
 
 # Pelix
 from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
     Property, Validate, Invalidate, RequiresBest
-from pelix.utilities import to_bytes, to_unicode
+from pelix.utilities import to_bytes
 import pelix.http
-import pelix.misc.jabsorb as jabsorb
 
 # Standard library
 import json
 import logging
 import threading
-import time
-import uuid
 
 # ------------------------------------------------------------------------------
 
@@ -112,23 +108,6 @@ class HeraldServlet(object):
         self._port = None
         self._servlet_path = None
 
-    @staticmethod
-    def __load_dump(message, description):
-        """
-        Loads and updates the remote peer dump with its HTTP access
-
-        :param message: A message containing a remote peer description
-        :param description: The parsed remote peer description
-        :return: The peer dump map
-        """
-        if message.access == ACCESS_ID:
-            # Forge the access to the HTTP server using extra information
-            extra = message.extra
-            description['accesses'][ACCESS_ID] = \
-                beans.HTTPAccess(extra['host'], extra['port'],
-                                 extra['path']).dump()
-        return description
-
     @Validate
     def validate(self, _):
         """
@@ -140,7 +119,7 @@ class HeraldServlet(object):
 
         # Prepare the peer contact handler
         self.__contact = peer_contact.PeerContact(
-            self._directory, self.__load_dump, __name__ + ".contact")
+            self._directory, reception.load_dump, __name__ + ".contact")
 
     @Invalidate
     def invalidate(self, _):
@@ -181,7 +160,7 @@ class HeraldServlet(object):
             self._port = int(parameters[pelix.http.PARAM_PORT])
 
             # Tell the directory we're ready
-            access = beans.HTTPAccess(self._host, self._port, path)
+            access = beans.HTTPAccess(self._host, self._port, path, True)
             self._directory.get_local_peer().set_access(ACCESS_ID, access)
 
             with self.__lock:
@@ -224,138 +203,26 @@ class HeraldServlet(object):
         :param response: The HTTP response handler
         """
         # pylint: disable=C0103
-        peer_dump = self._directory.get_local_peer().dump()
-        jabsorb_content = jabsorb.to_jabsorb(peer_dump)
-        content = json.dumps(jabsorb_content, default=utils.json_converter)
+        content = reception.make_peer_dump(self._directory)
         response.send_content(200, content, CONTENT_TYPE_JSON)
 
     def do_POST(self, request, response):
         """
-        Handles a POST request, i.e. the reception of a message
+        Handles a POST request, i.e. the reception of a message or of a batch
+        of messages
 
         :param request: The HTTP request bean
         :param response: The HTTP response handler
         """
         # pylint: disable=C0103
-        # Default code and content
-        code = 200
-        content = ""
-
-        # Extract headers
-        """
-        content_type = request.get_header('content-type')
-        subject = request.get_header('herald-subject')
-        uid = request.get_header('herald-uid')
-        reply_to = request.get_header('herald-reply-to')
-        timestamp = request.get_header('herald-timestamp')
-        sender_uid = request.get_header('herald-sender-uid')
-        """
-        content_type = request.get_header('content-type')
-        subject = None
-        uid = None
-        reply_to = None
-        timestamp = None
-        sender_uid = None
-        
-        raw_content = to_unicode(request.read_data())
-        
         # Client information
         host = utils.normalize_ip(request.get_client_address()[0])
-        
-        message = None
-        
-        if content_type != CONTENT_TYPE_JSON:
-            # Raw message
-            uid = str(uuid.uuid4())
-            subject = herald.SUBJECT_RAW
-            #msg_content = raw_content
-            msg_content = raw_content
-            port = -1
-            extra = {'host': host, 'raw': True}     
-            
-            # construct a new Message bean
-            message = herald.beans.MessageReceived(uid, subject, msg_content,
-                                               None, None,
-                                               ACCESS_ID, None, extra)                  
-        else:
-            # Herald message
-            try:            
-                received_msg = utils.from_json(raw_content)                
-            except Exception as ex:
-                _logger.exception("DoPOST ERROR:: %s", ex)
-                
-            msg_content = received_msg.content
-            
-            subject = received_msg.subject
-            uid = received_msg.uid
-            reply_to = received_msg.reply_to
-            timestamp = received_msg.timestamp
-            sender_uid = received_msg.sender
-            
-            if not uid or not subject:
-                # Raw message
-                uid = str(uuid.uuid4())
-                subject = herald.SUBJECT_RAW
-                #msg_content = raw_content
-                msg_content = raw_content
-                port = -1
-                extra = {'host': host, 'raw': True}     
-                
-                # construct a new Message bean
-                message = herald.beans.MessageReceived(uid, subject, msg_content,
-                                               None, None,
-                                               ACCESS_ID, None, extra) 
-                
-            else:       
-                # Store sender information
-                try:                 
-                    port = int(received_msg.get_header(herald.transports.http.MESSAGE_HEADER_PORT))                    
-                except (KeyError, ValueError, TypeError):
-                    port = 80
-                path = None
-                if herald.transports.http.MESSAGE_HEADER_PATH in received_msg.headers:
-                    path = received_msg.get_header(herald.transports.http.MESSAGE_HEADER_PATH)                
-                extra = {'host': host, 'port': port,
-                         'path': path,
-                         'parent_uid': uid}
-    
-                try:
-                    # Check the sender UID port
-                    # (not perfect, but can avoid spoofing)
-                    if not self._http_directory.check_access(
-                            sender_uid, host, port):
-                        # Port doesn't match: invalid UID
-                        sender_uid = "<invalid>"
-                except ValueError:
-                    # Unknown peer UID: keep it as is
-                    pass
-            
-                # Prepare the bean
-                received_msg.add_header(herald.MESSAGE_HEADER_SENDER_UID, sender_uid)
-                received_msg.set_access(ACCESS_ID)
-                received_msg.set_extra(extra)
-                message = received_msg
-                           
-        # Log before giving message to Herald
-        self._probe.store(
-            herald.PROBE_CHANNEL_MSG_RECV,
-            {"uid": message.uid, "timestamp": time.time(),
-             "transport": ACCESS_ID, "subject": message.subject,
-             "source": sender_uid, "repliesTo": reply_to or "",
-             "transportSource": "[{0}]:{1}".format(host, port)})
-
-        if subject.startswith(peer_contact.SUBJECT_DISCOVERY_PREFIX):
-            # Handle discovery message
-            self.__contact.herald_message(self._core, message)
-        else:
-            # All other messages are given to Herald Core
-            self._core.handle_message(message)
-
-        # Convert content (Python 3)
-        if content:
-            content = jabsorb.to_jabsorb(content)
 
-        content = to_bytes(content)
+        for message in reception.make_messages(
+                request.read_data(), request.get_header('content-type'), host,
+                self._http_directory):
+            reception.deliver_message(message, self._core, self.__contact,
+                                      self._probe)
 
         # Send response
-        response.send_content(code, content, CONTENT_TYPE_JSON)
+        response.send_content(200, to_bytes(""), CONTENT_TYPE_JSON)
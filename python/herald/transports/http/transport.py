@@ -34,15 +34,19 @@ __version__=herald.version.__version__
 
 # Herald HTTP
 from . import ACCESS_ID, SERVICE_HTTP_RECEIVER, SERVICE_HTTP_TRANSPORT, \
-    CONTENT_TYPE_JSON
+    CONTENT_TYPE_JSON, PROP_SENDER_MAX_IN_FLIGHT, PROP_SENDER_WORKERS, \
+    PROP_BATCH_WINDOW, PROP_BATCH_SIZE
+from .sender import HttpSender
 
 # HTTP requests
 import requests.exceptions
 
 # Herald Core
+from herald.dispatch import PriorityMap
 from herald.exceptions import InvalidPeerAccess
 import herald
 import herald.beans as beans
+import herald.codecs
 import herald.utils as utils
 import herald.transports.http
 
@@ -50,12 +54,10 @@ import herald.transports.http
 from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
     Property, BindField, Validate, Invalidate, Instantiate, RequiresBest
 from pelix.utilities import to_str
-import pelix.utilities
-import pelix.threadpool
 import pelix.misc.jabsorb as jabsorb
 
 # Standard library
-import json
+import functools
 import logging
 import time
 
@@ -72,10 +74,23 @@ _logger = logging.getLogger(__name__)
 @Requires('_local_recv', SERVICE_HTTP_RECEIVER)
 @Provides((herald.SERVICE_TRANSPORT, SERVICE_HTTP_TRANSPORT))
 @Property('_access_id', herald.PROP_ACCESS_ID, ACCESS_ID)
+@Property('_priorities', herald.PROP_PRIORITIES, None)
+@Property('_max_in_flight', PROP_SENDER_MAX_IN_FLIGHT, 4)
+@Property('_workers', PROP_SENDER_WORKERS, 10)
+@Property('_batch_window', PROP_BATCH_WINDOW, 0)
+@Property('_batch_size', PROP_BATCH_SIZE, 65536)
 @Instantiate('herald-http-transport')
 class HttpTransport(object):
     """
     HTTP sender for Herald.
+
+    Requests are sent by a pool of workers, with a bounded number of
+    in-flight requests per peer: fire() waits for the result of its request,
+    while fire_group() returns as soon as the requests are queued.
+
+    Messages to peers accepting batches are coalesced: those waiting for an
+    in-flight slot, or sent without waiting during the batch window, are
+    posted in a single request.
     """
     def __init__(self):
         """
@@ -93,11 +108,14 @@ class HttpTransport(object):
         # Local UID
         self.__peer_uid = None
 
-        # Request send pool
-        self.__pool = pelix.threadpool.ThreadPool(5, logname="herald-http")
-
-        # Requests session
-        self.__session = requests.Session()
+        # Request sender, sending control messages first
+        self._priorities = None
+        self._max_in_flight = 4
+        self._workers = 10
+        self._batch_window = 0
+        self._batch_size = 65536
+        self.__priorities = PriorityMap()
+        self.__sender = None
 
         # Local access information
         self.__access_port = None
@@ -118,9 +136,17 @@ class HttpTransport(object):
         Component validated
         """
         self.__peer_uid = self._directory.local_uid
-        self.__session = requests.Session()
-        self.__session.stream = False
-        self.__pool.start()
+
+        try:
+            self.__priorities = PriorityMap(self._priorities)
+        except (AttributeError, TypeError, ValueError) as ex:
+            _logger.error("Invalid priorities configuration: %s", ex)
+            self.__priorities = PriorityMap()
+
+        self.__sender = HttpSender("herald-http", self._max_in_flight,
+                                   self._workers, self._batch_window,
+                                   self._batch_size)
+        self.__sender.start()
 
     @Invalidate
     def _invalidate(self, _):
@@ -128,8 +154,8 @@ class HttpTransport(object):
         Component invalidated
         """
         self.__peer_uid = None
-        self.__session.close()
-        self.__pool.stop()
+        self.__sender.stop()
+        self.__sender = None
 
     def __get_access(self, peer, extra=None):
         """
@@ -137,7 +163,7 @@ class HttpTransport(object):
 
         :param peer: A Peer bean
         :param extra: Extra information, given for replies
-        :return: A URL, or None
+        :return: A ((host, port), URL) tuple, or (None, None)
         """
         host = None
         port = 0
@@ -154,7 +180,7 @@ class HttpTransport(object):
                 host, port, path = peer.get_access(ACCESS_ID).access
             except (KeyError, AttributeError):
                 # Invalid access: stop here
-                return None
+                return None, None
 
         # Normalize arguments
         if ':' in host:
@@ -167,72 +193,103 @@ class HttpTransport(object):
         if path[0] == '/':
             path = path[1:]
 
-        return 'http://{0}:{1}/{2}'.format(host, port, path)
+        return (host, port), 'http://{0}:{1}/{2}'.format(host, port, path)
 
-    def __prepare_message(self, message, parent_uid=None, target_peer=None, target_group=None):
+    def __prepare_message(self, message, parent_uid=None, target_peer=None,
+                          target_group=None, peers=None):
         """
         Prepares a HTTP request.
 
         :param message: The Message bean to send
         :param parent_uid: UID of the message this one replies to (optional)
-        :return: A (headers, content) tuple
+        :param target_peer: Targeted peer (optional)
+        :param target_group: Targeted group (optional)
+        :param peers: Peers of the targeted group (optional)
+        :return: A (headers, content, codec name) tuple. The codec name is None
+                 for raw messages.
         """
-        # Prepare headers
-        """
-        headers = {'content-type': CONTENT_TYPE_JSON,
-                   'herald-subject': message.subject,
-                   'herald-uid': message.uid,
-                   'herald-sender-uid': self.__peer_uid,
-                   'herald-timestamp': int(time.time() * 1000),
-                   'herald-port': self.__access_port,
-                   'herald-path': self.__access_path}
-        """
-        headers = {'content-type': CONTENT_TYPE_JSON} 
-        message.add_header(herald.MESSAGE_HEADER_SENDER_UID, self.__peer_uid)
-        message.add_header(herald.transports.http.MESSAGE_HEADER_PORT, self.__access_port)
-        message.add_header(herald.transports.http.MESSAGE_HEADER_PATH, self.__access_path)
-        if parent_uid:
-            #headers['herald-reply-to'] = parent_uid
-            message.add_header(herald.MESSAGE_HEADER_REPLIES_TO, parent_uid)
-        # update target peer header
-        if target_peer is not None:
-            message.add_header(herald.MESSAGE_HEADER_TARGET_PEER, target_peer.uid) 
-        # update target peer header
-        if target_group is not None:
-            message.add_header(herald.MESSAGE_HEADER_TARGET_GROUP, target_group)     
+        headers = {'content-type': CONTENT_TYPE_JSON}
+        codec_name = None
         if message.subject in herald.SUBJECTS_RAW:
             content = utils.to_str(message.content)
         else:
-            # Convert content to JSON
-            content = utils.to_json(message)
-            
-        return headers, content
-
-    def __post_message(self, url, content, headers):
+            # Headers depending on the target are given as an envelope: the
+            # message is left untouched and its encoded body can be reused
+            envelope = {
+                herald.MESSAGE_HEADER_SENDER_UID: self.__peer_uid,
+                herald.transports.http.MESSAGE_HEADER_PORT:
+                    self.__access_port,
+                herald.transports.http.MESSAGE_HEADER_PATH:
+                    self.__access_path}
+            if parent_uid:
+                envelope[herald.MESSAGE_HEADER_REPLIES_TO] = parent_uid
+            if target_peer is not None:
+                envelope[herald.MESSAGE_HEADER_TARGET_PEER] = target_peer.uid
+                peers = (target_peer,)
+            if target_group is not None:
+                envelope[herald.MESSAGE_HEADER_TARGET_GROUP] = target_group
+
+            # Use a codec supported by all targets (JSON for older peers)
+            codec, content = herald.codecs.encode(message, peers, envelope)
+            headers['content-type'] = codec.content_type
+            codec_name = codec.name
+
+        return headers, content, codec_name
+
+    def __post(self, peer, address, url, headers, content, codec_name,
+               priority, flush):
         """
-        Method called directly or in a thread to send a POST HTTP request
+        Queues a request in the sender
 
+        :param peer: The targeted Peer bean (can be None)
+        :param address: The (host, port) address of the peer
         :param url: Target URL
-        :param content: Request body
         :param headers: Request headers
-        :return: A response bean
+        :param content: Request body
+        :param codec_name: Name of the codec used to encode the message
+                           (None for raw messages)
+        :param priority: Priority of the message
+        :param flush: If False, the message can wait for other ones during
+                      the batch window
+        :return: A Future object, resolved with the HTTP response
         """
         try:
-            return self.__session.post(url, content, headers=headers)
-        except requests.exceptions.ConnectionError as ex:
-            # Connection aborted during request
-            _logger.error("Connection error while posting a message: %s", ex)
-            return None
+            batch = codec_name is not None \
+                and peer.get_access(ACCESS_ID).batch
+        except (KeyError, AttributeError):
+            # Unknown peer or access
+            batch = False
+
+        if batch:
+            return self.__sender.post_batched(
+                address, url, codec_name, content, headers['content-type'],
+                priority, flush)
+        return self.__sender.post(address, url, content, headers, priority)
+
+    @staticmethod
+    def __log_result(future, peer):
+        """
+        Logs the failure of a request sent to a member of a group
 
-    def fire(self, peer, message, extra=None):
+        :param future: The future of the request
+        :param peer: The targeted peer
+        """
+        if not future.cancelled() and future.exception() is not None:
+            _logger.error("Error posting a message to %s: %s", peer,
+                          future.exception())
+
+    def fire_async(self, peer, message, extra=None, flush=False):
         """
-        Fires a message to a peer
+        Fires a message to a peer, without waiting for the request to be
+        sent
 
         :param peer: A Peer bean
         :param message: Message bean to send
         :param extra: Extra information used in case of a reply
+        :param flush: If False, the message can wait for other ones during
+                      the batch window
+        :return: A Future object, resolved with the HTTP response
         :raise InvalidPeerAccess: No information found to access the peer
-        :raise Exception: Error sending the request or on the server side
         """
         # Get the request message UID, if any
         parent_uid = None
@@ -240,14 +297,15 @@ class HttpTransport(object):
             parent_uid = extra.get('parent_uid')
 
         # Try to read extra information
-        url = self.__get_access(peer, extra)
+        address, url = self.__get_access(peer, extra)
         if not url:
             # No HTTP access description
             raise InvalidPeerAccess(beans.Target(peer=peer),
                                     "No '{0}' access found"
-                                    .format(self._access_id))           
-        # Send the HTTP request (blocking) and raise an error if necessary
-        headers, content = self.__prepare_message(message, parent_uid, target_peer=peer)
+                                    .format(self._access_id))
+
+        headers, content, codec_name = self.__prepare_message(
+            message, parent_uid, target_peer=peer)
 
         # Log before sending
         self._probe.store(
@@ -262,41 +320,43 @@ class HttpTransport(object):
             {"uid": message.uid, "content": content}
         )
 
-        response = self.__post_message(url, content, headers)
-        if response is None:
-            # The error has been logged in post_message
+        return self.__post(peer, address, url, headers, content, codec_name,
+                           self.__priorities.get(message.subject), flush)
+
+    def fire(self, peer, message, extra=None):
+        """
+        Fires a message to a peer, and waits for the request to be sent
+
+        :param peer: A Peer bean
+        :param message: Message bean to send
+        :param extra: Extra information used in case of a reply
+        :raise InvalidPeerAccess: No information found to access the peer
+        :raise Exception: Error sending the request or on the server side
+        """
+        future = self.fire_async(peer, message, extra, True)
+        try:
+            future.result()
+        except requests.exceptions.ConnectionError as ex:
+            # Connection aborted during request
+            _logger.error("Connection error while posting a message: %s", ex)
             raise IOError("Error sending message {0}".format(message.uid))
-        else:
-            # Raise an error if the status isn't 2XX
-            response.raise_for_status()
 
-    def fire_group(self, group, peers, message):
+    def fire_group_async(self, group, peers, message):
         """
-        Fires a message to a group of peers
+        Fires a message to a group of peers, without waiting for the requests
+        to be sent
 
         :param group: Name of a group
         :param peers: Peers to communicate with
         :param message: Message to send
-        :return: The list of reached peers
-
+        :return: A Peer -> Future dictionary, for the peers with an HTTP access
         """
         # Prepare the message
-        headers, content = self.__prepare_message(message, target_group=group)
-
-        # The list of peers having been reached
-        accessed_peers = set()
-        countdown = pelix.utilities.CountdownEvent(len(peers))
-
-        def peer_result(_, exception, target_peer):
-            """
-            Called back once the request has been posted
-            """
-            if exception is None:
-                # No exception => success
-                accessed_peers.add(target_peer)
+        headers, content, codec_name = self.__prepare_message(
+            message, target_group=group, peers=peers)
 
-            # In any case: update the count down
-            countdown.step()
+        # Control messages are sent before the others
+        priority = self.__priorities.get(message.subject)
 
         # Store the message once
         self._probe.store(
@@ -305,10 +365,10 @@ class HttpTransport(object):
         )
 
         # Send a request to each peers
+        futures = {}
         for peer in peers:
-
             # Try to read extra information
-            url = self.__get_access(peer)
+            address, url = self.__get_access(peer)
             if url:
                 # Log before sending
                 self._probe.store(
@@ -318,17 +378,28 @@ class HttpTransport(object):
                      "target": peer.uid, "transportTarget": url,
                      "repliesTo": ""})
 
-                # Send the HTTP requests (from the thread pool)
-                future = self.__pool.enqueue(self.__post_message,
-                                             url, content, headers)
-                future.set_callback(peer_result, peer)
+                futures[peer] = self.__post(peer, address, url, headers,
+                                            content, codec_name, priority,
+                                            False)
             else:
                 # No HTTP access description
                 _logger.debug("No '%s' access found for %s", self._access_id,
                               peer)
 
-        # Wait for the requests to be sent (no more than 30s)
-        if not countdown.wait(10):
-            _logger.warning("Not all peers have been reached after 10s...")
+        return futures
 
-        return set(accessed_peers)
+    def fire_group(self, group, peers, message):
+        """
+        Fires a message to a group of peers. Returns as soon as the requests
+        are queued: delivery errors are logged.
+
+        :param group: Name of a group
+        :param peers: Peers to communicate with
+        :param message: Message to send
+        :return: The set of peers with an HTTP access
+        """
+        futures = self.fire_group_async(group, peers, message)
+        for peer, future in futures.items():
+            future.add_done_callback(
+                functools.partial(self.__log_result, peer=peer))
+        return set(futures)
@@ -0,0 +1,101 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald in-process transport beans
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald in-process
+from . import ACCESS_ID
+
+# ------------------------------------------------------------------------------
+
+
+class InProcessAccess(object):
+    """
+    Description of an in-process access: the UID of the peer in the process
+    registry
+    """
+    __slots__ = ('__uid',)
+
+    def __init__(self, uid):
+        """
+        Sets up the access
+
+        :param uid: UID of the peer
+        """
+        self.__uid = uid
+
+    def __hash__(self):
+        """
+        Hash is based on the peer UID
+        """
+        return hash(self.__uid)
+
+    def __eq__(self, other):
+        """
+        Equality based on the peer UID
+        """
+        if isinstance(other, InProcessAccess):
+            return self.__uid == other.uid
+        return False
+
+    def __ne__(self, other):
+        """
+        Inequality based on the peer UID
+        """
+        return not self.__eq__(other)
+
+    def __str__(self):
+        """
+        String representation
+        """
+        return "inprocess:{0}".format(self.__uid)
+
+    @property
+    def access_id(self):
+        """
+        Retrieves the access ID associated to this kind of access
+        """
+        return ACCESS_ID
+
+    @property
+    def uid(self):
+        """
+        Retrieves the UID of the peer in the process registry
+        """
+        return self.__uid
+
+    def dump(self):
+        """
+        Returns the content to store in a directory dump to describe this
+        access
+        """
+        return self.__uid
@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald in-process transport directory
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald in-process
+from . import ACCESS_ID, SERVICE_INPROCESS_DIRECTORY
+from .beans import InProcessAccess
+
+# Herald
+import herald
+
+# Pelix
+from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
+    Property, Validate, Invalidate, Instantiate
+
+# ------------------------------------------------------------------------------
+
+
+@ComponentFactory('herald-inprocess-directory-factory')
+@Requires('_directory', herald.SERVICE_DIRECTORY)
+@Property('_access_id', herald.PROP_ACCESS_ID, ACCESS_ID)
+@Provides((herald.SERVICE_TRANSPORT_DIRECTORY, SERVICE_INPROCESS_DIRECTORY))
+@Instantiate('herald-inprocess-directory')
+class InProcessDirectory(object):
+    """
+    In-process directory for Herald
+    """
+    def __init__(self):
+        """
+        Sets up the transport directory
+        """
+        # Herald Core Directory
+        self._directory = None
+        self._access_id = ACCESS_ID
+
+        # UIDs of the peers reachable in-process
+        self._uids = set()
+
+    @Validate
+    def _validate(self, _):
+        """
+        Component validated
+        """
+        self._uids.clear()
+
+    @Invalidate
+    def _invalidate(self, _):
+        """
+        Component invalidated
+        """
+        self._uids.clear()
+
+    def load_access(self, data):
+        """
+        Loads a dumped access
+
+        :param data: Result of a call to InProcessAccess.dump()
+        :return: An InProcessAccess bean
+        """
+        return InProcessAccess(data)
+
+    def peer_access_set(self, peer, data):
+        """
+        The access to the given peer matching our access ID has been set
+
+        :param peer: The Peer bean
+        :param data: The peer access data, previously loaded with load_access()
+        """
+        if peer.uid != self._directory.local_uid:
+            self._uids.add(peer.uid)
+
+    def peer_access_unset(self, peer, data):
+        """
+        The access to the given peer matching our access ID has been removed
+
+        :param peer: The Peer bean
+        :param data: The peer access data
+        """
+        self._uids.discard(peer.uid)
@@ -0,0 +1,90 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Process-wide registry of the in-process transports, shared by all the Pelix
+frameworks of the interpreter
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Standard library
+import threading
+
+# ------------------------------------------------------------------------------
+
+# Peer UID -> in-process transport
+_ENDPOINTS = {}
+_LOCK = threading.Lock()
+
+# ------------------------------------------------------------------------------
+
+
+def register(uid, endpoint):
+    """
+    Registers the in-process transport of a peer
+
+    :param uid: UID of the peer
+    :param endpoint: The in-process transport of the peer
+    :return: The list of the transports of the other peers
+    :raise ValueError: A transport is already registered for this peer
+    """
+    with _LOCK:
+        if uid in _ENDPOINTS:
+            raise ValueError("Peer already registered: {0}".format(uid))
+
+        others = list(_ENDPOINTS.values())
+        _ENDPOINTS[uid] = endpoint
+        return others
+
+
+def unregister(uid, endpoint):
+    """
+    Unregisters the in-process transport of a peer
+
+    :param uid: UID of the peer
+    :param endpoint: The in-process transport of the peer
+    :return: The list of the transports of the other peers (empty if the
+             transport wasn't registered)
+    """
+    with _LOCK:
+        if _ENDPOINTS.get(uid) is not endpoint:
+            return []
+
+        del _ENDPOINTS[uid]
+        return list(_ENDPOINTS.values())
+
+
+def get_endpoint(uid):
+    """
+    Returns the in-process transport of a peer
+
+    :param uid: UID of a peer
+    :return: The transport of the peer, or None
+    """
+    return _ENDPOINTS.get(uid)
@@ -0,0 +1,283 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald in-process transport implementation (sending side)
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald in-process
+from . import ACCESS_ID, SERVICE_INPROCESS_TRANSPORT
+from .beans import InProcessAccess
+import herald.transports.inprocess.registry as registry
+
+# Herald Core
+from herald.exceptions import InvalidPeerAccess
+import herald
+import herald.beans as beans
+
+# Pelix
+from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
+    Property, Validate, Invalidate, Instantiate, RequiresBest
+
+# Standard library
+import logging
+import time
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+
+
+@ComponentFactory('herald-inprocess-transport-factory')
+@RequiresBest('_probe', herald.SERVICE_PROBE)
+@Requires('_core', herald.SERVICE_HERALD_INTERNAL)
+@Requires('_directory', herald.SERVICE_DIRECTORY)
+@Provides((herald.SERVICE_TRANSPORT, SERVICE_INPROCESS_TRANSPORT))
+@Property('_access_id', herald.PROP_ACCESS_ID, ACCESS_ID)
+@Instantiate('herald-inprocess-transport')
+class InProcessTransport(object):
+    """
+    In-process transport for Herald: gives messages to the Herald core of the
+    peers hosted in the same interpreter.
+
+    Messages are neither serialized nor copied: the content given to the
+    listeners of the targeted peers is the object given by the sender. It
+    must not be modified by either side.
+    """
+    def __init__(self):
+        """
+        Sets up the transport
+        """
+        # Herald Core service
+        self._core = None
+
+        # Herald Core directory
+        self._directory = None
+
+        # Debug probe
+        self._probe = None
+
+        # Properties
+        self._access_id = ACCESS_ID
+
+        # Local UID
+        self.__peer_uid = None
+
+    @Validate
+    def _validate(self, _):
+        """
+        Component validated
+        """
+        local_peer = self._directory.get_local_peer()
+        self.__peer_uid = local_peer.uid
+        local_peer.set_access(self._access_id,
+                              InProcessAccess(self.__peer_uid))
+
+        # Register in the process and exchange descriptions with the peers
+        # hosted in the same interpreter
+        local_dump = local_peer.dump()
+        for endpoint in registry.register(self.__peer_uid, self):
+            try:
+                endpoint.peer_arrived(local_dump)
+                self.peer_arrived(endpoint.get_local_dump())
+            except Exception as ex:
+                _logger.exception("Error exchanging descriptions with an "
+                                  "in-process peer: %s", ex)
+
+    @Invalidate
+    def _invalidate(self, _):
+        """
+        Component invalidated
+        """
+        for endpoint in registry.unregister(self.__peer_uid, self):
+            try:
+                endpoint.peer_left(self.__peer_uid)
+            except Exception as ex:
+                _logger.exception("Error notifying an in-process peer: %s",
+                                  ex)
+
+        self._directory.get_local_peer().unset_access(self._access_id)
+        self.__peer_uid = None
+
+    def get_local_dump(self):
+        """
+        Returns the description of the local peer. Called by the in-process
+        transport of another peer.
+
+        :return: The dump of the local peer
+        """
+        return self._directory.get_local_peer().dump()
+
+    def peer_arrived(self, description):
+        """
+        A peer has been registered in the process. Called by its in-process
+        transport.
+
+        :param description: The dump of the peer
+        """
+        try:
+            self._directory.register(description)
+        except ValueError as ex:
+            _logger.error("Error registering an in-process peer: %s", ex)
+
+    def peer_left(self, uid):
+        """
+        A peer has been unregistered from the process. Called by its
+        in-process transport.
+
+        :param uid: UID of the peer
+        """
+        try:
+            peer = self._directory.get_peer(uid)
+        except KeyError:
+            # Unknown peer
+            pass
+        else:
+            # The peer is unregistered if it has no other access
+            peer.unset_access(self._access_id)
+
+    def deliver(self, message):
+        """
+        Gives a message to the local Herald core. Called by the in-process
+        transport of the sender.
+
+        :param message: A MessageReceived bean
+        """
+        # Log before giving message to Herald
+        self._probe.store(
+            herald.PROBE_CHANNEL_MSG_RECV,
+            {"uid": message.uid, "timestamp": time.time(),
+             "transport": ACCESS_ID, "subject": message.subject,
+             "source": message.sender, "repliesTo": message.reply_to or "",
+             "transportSource": message.sender})
+
+        self._core.handle_message(message)
+
+    def __make_message(self, message, parent_uid=None, target_peer=None,
+                       target_group=None):
+        """
+        Prepares the bean received by the targeted peer
+
+        :param message: The Message bean to send
+        :param parent_uid: UID of the message this one replies to (optional)
+        :param target_peer: Targeted peer (optional)
+        :param target_group: Targeted group (optional)
+        :return: A MessageReceived bean
+        """
+        received = beans.MessageReceived(
+            message.uid, message.subject, message.content, self.__peer_uid,
+            parent_uid, self._access_id, message.timestamp,
+            {'parent_uid': message.uid, 'sender_uid': self.__peer_uid})
+
+        # Other headers and metadata
+        headers = received.headers
+        for key, value in message.headers.items():
+            if key not in headers:
+                headers[key] = value
+
+        if target_peer is not None:
+            headers[herald.MESSAGE_HEADER_TARGET_PEER] = target_peer.uid
+        if target_group is not None:
+            headers[herald.MESSAGE_HEADER_TARGET_GROUP] = target_group
+
+        if message.metadata:
+            received.metadata.update(message.metadata)
+        return received
+
+    def fire(self, peer, message, extra=None):
+        """
+        Fires a message to a peer
+
+        :param peer: A Peer bean
+        :param message: Message bean to send
+        :param extra: Extra information used in case of a reply
+        :raise InvalidPeerAccess: The peer isn't hosted in this interpreter
+        """
+        # Get the request message UID, if any
+        parent_uid = None
+        uid = peer.uid if peer is not None else None
+        if extra is not None:
+            parent_uid = extra.get('parent_uid')
+            uid = uid or extra.get('sender_uid')
+
+        endpoint = registry.get_endpoint(uid)
+        if endpoint is None:
+            raise InvalidPeerAccess(beans.Target(uid=uid),
+                                    "No '{0}' access found"
+                                    .format(self._access_id))
+
+        # Log before sending
+        self._probe.store(
+            herald.PROBE_CHANNEL_MSG_SEND,
+            {"uid": message.uid, "timestamp": time.time(),
+             "transport": ACCESS_ID, "subject": message.subject,
+             "target": uid, "transportTarget": uid,
+             "repliesTo": parent_uid or ""})
+
+        endpoint.deliver(self.__make_message(message, parent_uid,
+                                             target_peer=peer))
+
+    def fire_group(self, group, peers, message):
+        """
+        Fires a message to a group of peers
+
+        :param group: Name of a group
+        :param peers: Peers to communicate with
+        :param message: Message to send
+        :return: The list of reached peers
+        """
+        reached = set()
+        for peer in peers:
+            endpoint = registry.get_endpoint(peer.uid)
+            if endpoint is None:
+                _logger.debug("No '%s' access found for %s", self._access_id,
+                              peer)
+                continue
+
+            # Log before sending
+            self._probe.store(
+                herald.PROBE_CHANNEL_MSG_SEND,
+                {"uid": message.uid, "timestamp": time.time(),
+                 "transport": ACCESS_ID, "subject": message.subject,
+                 "target": peer.uid, "transportTarget": peer.uid,
+                 "repliesTo": ""})
+
+            try:
+                endpoint.deliver(self.__make_message(
+                    message, target_group=group))
+            except Exception as ex:
+                _logger.error("Error delivering a message to %s: %s",
+                              peer, ex)
+            else:
+                reached.add(peer)
+
+        return reached
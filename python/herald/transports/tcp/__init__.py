@@ -0,0 +1,83 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald TCP transport implementation: messages are exchanged through
+persistent full-duplex TCP connections, carrying length-prefixed frames.
+Many messages can be in flight on a connection, and replies are sent back on
+the connection of the request.
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+ACCESS_ID = "tcp"
+"""
+Access ID used by the TCP transport implementation
+"""
+
+# ------------------------------------------------------------------------------
+
+SERVICE_TCP_DIRECTORY = "herald.tcp.directory"
+"""
+Specification of the TCP transport directory
+"""
+
+SERVICE_TCP_RECEIVER = "herald.tcp.receiver"
+"""
+Specification of the TCP transport server (reception side)
+"""
+
+SERVICE_TCP_TRANSPORT = "herald.tcp.transport"
+"""
+Specification of the TCP transport implementation (sending side)
+"""
+
+# ------------------------------------------------------------------------------
+
+FACTORY_DISCOVERY_MULTICAST = "herald-tcp-discovery-multicast-factory"
+"""
+Name of the Multicast discovery component factory
+"""
+
+# ------------------------------------------------------------------------------
+
+PROP_TCP_HOST = "tcp.host"
+"""
+Name of the address the TCP server binds to
+"""
+
+PROP_TCP_PORT = "tcp.port"
+"""
+Name of the port the TCP server listens to (0 for a random port)
+"""
+
+# ------------------------------------------------------------------------------
+
+MESSAGE_HEADER_PORT = "herald-tcp-transport-port"
+"""
+Header giving the port of the TCP server of the sender
+"""
@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald TCP transport beans
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald TCP
+from . import ACCESS_ID
+
+# ------------------------------------------------------------------------------
+
+
+class TCPAccess(object):
+    """
+    Description of a TCP access: the address of the TCP server of the peer
+    """
+    __slots__ = ('__host', '__port')
+
+    def __init__(self, host, port):
+        """
+        Sets up the access
+
+        :param host: Host name or IP address of the peer
+        :param port: Port of the TCP server of the peer
+        """
+        self.__host = host
+        self.__port = int(port)
+
+    def __hash__(self):
+        """
+        Hash is based on the access tuple
+        """
+        return hash(self.access)
+
+    def __eq__(self, other):
+        """
+        Equality based on the access tuple
+        """
+        if isinstance(other, TCPAccess):
+            return self.access == other.access
+        return False
+
+    def __ne__(self, other):
+        """
+        Inequality based on the access tuple
+        """
+        return not self.__eq__(other)
+
+    def __lt__(self, other):
+        """
+        Access tuple ordering
+        """
+        if isinstance(other, TCPAccess):
+            return self.access < other.access
+        return False
+
+    def __str__(self):
+        """
+        String representation
+        """
+        return "tcp://{0}:{1}".format(self.__host, self.__port)
+
+    @property
+    def access_id(self):
+        """
+        Retrieves the access ID associated to this kind of access
+        """
+        return ACCESS_ID
+
+    @property
+    def access(self):
+        """
+        Returns the access to the peer as a 2-tuple (host, port)
+        """
+        return self.__host, self.__port
+
+    @property
+    def host(self):
+        """
+        Retrieves the host address of the associated peer
+        """
+        return self.__host
+
+    @property
+    def port(self):
+        """
+        Retrieves the port of the TCP server of the associated peer
+        """
+        return self.__port
+
+    def dump(self):
+        """
+        Returns the content to store in a directory dump to describe this
+        access
+        """
+        return self.access
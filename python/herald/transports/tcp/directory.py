@@ -0,0 +1,131 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald TCP transport directory
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald TCP
+from . import ACCESS_ID, SERVICE_TCP_DIRECTORY
+from .beans import TCPAccess
+
+# Herald
+import herald
+
+# Pelix
+from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
+    Property, Validate, Invalidate, Instantiate
+from pelix.utilities import to_str
+
+# ------------------------------------------------------------------------------
+
+
+@ComponentFactory('herald-tcp-directory-factory')
+@Requires('_directory', herald.SERVICE_DIRECTORY)
+@Property('_access_id', herald.PROP_ACCESS_ID, ACCESS_ID)
+@Provides((herald.SERVICE_TRANSPORT_DIRECTORY, SERVICE_TCP_DIRECTORY))
+@Instantiate('herald-tcp-directory')
+class TCPDirectory(object):
+    """
+    TCP Directory for Herald
+    """
+    def __init__(self):
+        """
+        Sets up the transport directory
+        """
+        # Herald Core Directory
+        self._directory = None
+        self._access_id = ACCESS_ID
+
+        # Peer UID -> (host, port)
+        self._uid_address = {}
+
+    @Validate
+    def _validate(self, _):
+        """
+        Component validated
+        """
+        self._uid_address.clear()
+
+    @Invalidate
+    def _invalidate(self, _):
+        """
+        Component invalidated
+        """
+        self._uid_address.clear()
+
+    def load_access(self, data):
+        """
+        Loads a dumped access
+
+        :param data: Result of a call to TCPAccess.dump()
+        :return: A TCPAccess bean
+        """
+        return TCPAccess(data[0], data[1])
+
+    def peer_access_set(self, peer, data):
+        """
+        The access to the given peer matching our access ID has been set
+
+        :param peer: The Peer bean
+        :param data: The peer access data, previously loaded with load_access()
+        """
+        if peer.uid != self._directory.local_uid:
+            peer_address = to_str(data.host)
+            if peer_address not in ("::", "0.0.0.0"):
+                self._uid_address[peer.uid] = data.access
+
+    def peer_access_unset(self, peer, data):
+        """
+        The access to the given peer matching our access ID has been removed
+
+        :param peer: The Peer bean
+        :param data: The peer access data
+        """
+        try:
+            del self._uid_address[peer.uid]
+        except KeyError:
+            pass
+
+    def check_access(self, uid, host, port):
+        """
+        Checks if the peer with the given UID is known to have the given access
+
+        :param uid: The UID of a peer
+        :param host: The tested peer host
+        :param port: The tested TCP port
+        :return: True if the given access matches the peer UID
+        :raise ValueError: The access doesn't match the peer
+        """
+        try:
+            peer_port = self._uid_address[uid][1]
+            return peer_port == port
+        except KeyError:
+            raise ValueError("Unknown peer: {0}".format(uid))
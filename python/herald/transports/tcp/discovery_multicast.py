@@ -0,0 +1,75 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald TCP transport discovery based on multicast: same heart beats as the
+HTTP discovery, giving the port of the TCP server, on a distinct multicast
+port
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald TCP
+from . import ACCESS_ID, SERVICE_TCP_TRANSPORT, SERVICE_TCP_RECEIVER, \
+    FACTORY_DISCOVERY_MULTICAST
+
+# Herald HTTP
+from herald.transports.http import PROP_MULTICAST_GROUP, PROP_MULTICAST_PORT
+from herald.transports.http.discovery_multicast import MulticastHeartbeat
+
+# Herald
+import herald
+
+# Pelix/iPOPO
+from pelix.ipopo.decorators import ComponentFactory, Requires, Property
+import pelix.ipopo.constants as constants
+
+# ------------------------------------------------------------------------------
+
+
+# Requirements are not inherited: iPOPO would keep the HTTP specifications
+@ComponentFactory(FACTORY_DISCOVERY_MULTICAST,
+                  excluded=[constants.HANDLER_REQUIRES])
+@Requires('_directory', herald.SERVICE_DIRECTORY)
+@Requires('_receiver', SERVICE_TCP_RECEIVER)
+@Requires('_transport', SERVICE_TCP_TRANSPORT)
+@Property('_group', PROP_MULTICAST_GROUP, '239.0.0.1')
+@Property('_port', PROP_MULTICAST_PORT, 42001)
+class TCPMulticastHeartbeat(MulticastHeartbeat):
+    """
+    Discovery of Herald TCP peers based on multicast
+    """
+    _access_id = ACCESS_ID
+    """ ID of the access discovered by this component """
+
+    def __init__(self):
+        """
+        Sets up the component
+        """
+        MulticastHeartbeat.__init__(self)
+        self._port = 42001
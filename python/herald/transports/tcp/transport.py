@@ -0,0 +1,215 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald TCP transport implementation
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald TCP
+from . import ACCESS_ID, SERVICE_TCP_RECEIVER, SERVICE_TCP_TRANSPORT, \
+    PROP_TCP_HOST, PROP_TCP_PORT, MESSAGE_HEADER_PORT
+from .beans import TCPAccess
+
+# Herald Core
+from herald.transports.framed import FramedTransport
+import herald
+import herald.utils as utils
+
+# Pelix
+from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
+    Property, Validate, Invalidate, Instantiate, RequiresBest
+
+# Standard library
+import logging
+import socket
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+UNSPECIFIED_ADDRESSES = ("", "0.0.0.0", "::")
+""" Addresses given to bind a server on all interfaces """
+
+# ------------------------------------------------------------------------------
+
+
+@ComponentFactory('herald-tcp-transport-factory')
+@RequiresBest('_probe', herald.SERVICE_PROBE)
+@Requires('_core', herald.SERVICE_HERALD_INTERNAL)
+@Requires('_directory', herald.SERVICE_DIRECTORY)
+@Provides((herald.SERVICE_TRANSPORT, SERVICE_TCP_TRANSPORT,
+           SERVICE_TCP_RECEIVER))
+@Property('_access_id', herald.PROP_ACCESS_ID, ACCESS_ID)
+@Property('_host', PROP_TCP_HOST, "0.0.0.0")
+@Property('_port', PROP_TCP_PORT, 0)
+@Instantiate('herald-tcp-transport')
+class TCPTransport(FramedTransport):
+    """
+    TCP transport for Herald: keeps a persistent connection per peer, on
+    which many messages can be in flight.
+    """
+    def __init__(self):
+        """
+        Sets up the transport
+        """
+        FramedTransport.__init__(self)
+
+        # Properties
+        self._access_id = ACCESS_ID
+        self._host = "0.0.0.0"
+        self._port = 0
+
+        # Bound port
+        self.__port = None
+
+    @Validate
+    def _validate(self, _):
+        """
+        Component validated
+        """
+        try:
+            family = socket.getaddrinfo(self._host or None, None, 0,
+                                        socket.SOCK_STREAM)[0][0]
+        except socket.gaierror:
+            family = socket.AF_INET
+
+        server = socket.socket(family, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self._host, int(self._port)))
+        server.listen(128)
+        self.__port = server.getsockname()[1]
+
+        self._start_framing(server, "Herald-TCP")
+
+        # Advertise the access
+        self._directory.get_local_peer().set_access(
+            self._access_id, TCPAccess(self._host, self.__port))
+
+    @Invalidate
+    def _invalidate(self, _):
+        """
+        Component invalidated
+        """
+        self._directory.get_local_peer().unset_access(self._access_id)
+        self._stop_framing()
+        self.__port = None
+
+    def get_access_info(self):
+        """
+        Retrieves the (host, port, path) tuple to access the TCP server.
+        The path is always empty.
+
+        :return: An (host, port, path) tuple
+        """
+        return self._host, self.__port, ""
+
+    def _connect(self, address):
+        """
+        Returns a socket connected to the given address
+
+        :param address: A (host, port) tuple
+        :return: A connected socket
+        :raise socket.error: Error connecting the peer
+        """
+        return socket.create_connection(address)
+
+    def _get_address(self, peer, extra):
+        """
+        Returns the address of the TCP server of the given peer
+
+        :param peer: A Peer bean (can be None)
+        :param extra: Extra information, given for replies (can be None)
+        :return: A (host, port) tuple, or None
+        """
+        if extra is not None and extra.get('host') and extra.get('port'):
+            # Use extra information
+            return extra['host'], int(extra['port'])
+
+        try:
+            # Use the directory
+            host, port = peer.get_access(ACCESS_ID).access
+        except (KeyError, AttributeError):
+            # Invalid access: stop here
+            return None
+
+        if host in UNSPECIFIED_ADDRESSES:
+            # The server listens on all interfaces: use the host known by
+            # another transport
+            for access_id in peer.get_accesses():
+                other_host = getattr(peer.get_access(access_id), 'host', None)
+                if other_host and other_host not in UNSPECIFIED_ADDRESSES:
+                    host = other_host
+                    break
+            else:
+                return None
+
+        return host, port
+
+    def _get_envelope(self):
+        """
+        Returns the headers added to all sent messages
+
+        :return: A dictionary of headers
+        """
+        envelope = FramedTransport._get_envelope(self)
+        envelope[MESSAGE_HEADER_PORT] = self.__port
+        return envelope
+
+    def _get_extra(self, connection, message):
+        """
+        Returns the extra information associated to a received message: the
+        address of the sender is added to the connection, in case it is
+        closed before the reply is sent.
+
+        :param connection: The connection the message was received from
+        :param message: The received MessageReceived bean
+        :return: The extra information dictionary
+        """
+        extra = FramedTransport._get_extra(self, connection, message)
+        if connection.peer_address:
+            extra['host'] = utils.normalize_ip(connection.peer_address[0])
+        extra['port'] = message.get_header(MESSAGE_HEADER_PORT)
+        return extra
+
+    def _load_dump(self, message, description):
+        """
+        Loads and updates the remote peer dump with its TCP access
+
+        :param message: A message containing a remote peer description
+        :param description: The parsed remote peer description
+        :return: The peer dump map
+        """
+        extra = message.extra
+        if message.access == ACCESS_ID and extra.get('host') \
+                and extra.get('port'):
+            # Forge the access to the TCP server using extra information
+            description['accesses'][ACCESS_ID] = \
+                TCPAccess(extra['host'], extra['port']).dump()
+        return description
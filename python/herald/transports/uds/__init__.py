@@ -0,0 +1,59 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald Unix domain socket transport implementation: messages are exchanged
+with the peers hosted on the same node (same node UID) through persistent
+AF_UNIX stream sockets, carrying length-prefixed frames.
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+ACCESS_ID = "uds"
+"""
+Access ID used by the Unix domain socket transport implementation
+"""
+
+# ------------------------------------------------------------------------------
+
+SERVICE_UDS_DIRECTORY = "herald.uds.directory"
+"""
+Specification of the Unix domain socket transport directory
+"""
+
+SERVICE_UDS_TRANSPORT = "herald.uds.transport"
+"""
+Specification of the Unix domain socket transport implementation
+"""
+
+# ------------------------------------------------------------------------------
+
+PROP_SOCKET_FOLDER = "uds.folder"
+"""
+Name of the folder where to create the socket files (default: the temporary
+folder)
+"""
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald Unix domain socket transport beans
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald UDS
+from . import ACCESS_ID
+
+# ------------------------------------------------------------------------------
+
+
+class UDSAccess(object):
+    """
+    Description of a Unix domain socket access: the UID of the node the peer
+    is hosted on, and the path to its socket file
+    """
+    __slots__ = ('__node_uid', '__path')
+
+    def __init__(self, node_uid, path):
+        """
+        Sets up the access
+
+        :param node_uid: UID of the node hosting the peer
+        :param path: Path to the socket file of the peer
+        """
+        self.__node_uid = node_uid
+        self.__path = path
+
+    def __hash__(self):
+        """
+        Hash is based on the access tuple
+        """
+        return hash((self.__node_uid, self.__path))
+
+    def __eq__(self, other):
+        """
+        Equality based on node UID and path
+        """
+        if isinstance(other, UDSAccess):
+            return self.__node_uid == other.node_uid \
+                and self.__path == other.path
+        return False
+
+    def __ne__(self, other):
+        """
+        Inequality based on node UID and path
+        """
+        return not self.__eq__(other)
+
+    def __str__(self):
+        """
+        String representation
+        """
+        return "uds:{0}@{1}".format(self.__path, self.__node_uid)
+
+    @property
+    def access_id(self):
+        """
+        Retrieves the access ID associated to this kind of access
+        """
+        return ACCESS_ID
+
+    @property
+    def node_uid(self):
+        """
+        Retrieves the UID of the node hosting the peer
+        """
+        return self.__node_uid
+
+    @property
+    def path(self):
+        """
+        Retrieves the path to the socket file of the peer
+        """
+        return self.__path
+
+    def dump(self):
+        """
+        Returns the content to store in a directory dump to describe this
+        access
+        """
+        return self.__node_uid, self.__path
@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald Unix domain socket transport directory
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald UDS
+from . import ACCESS_ID, SERVICE_UDS_DIRECTORY
+from .beans import UDSAccess
+
+# Herald
+import herald
+
+# Pelix
+from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
+    Property, Validate, Invalidate, Instantiate
+
+# ------------------------------------------------------------------------------
+
+
+@ComponentFactory('herald-uds-directory-factory')
+@Requires('_directory', herald.SERVICE_DIRECTORY)
+@Property('_access_id', herald.PROP_ACCESS_ID, ACCESS_ID)
+@Provides((herald.SERVICE_TRANSPORT_DIRECTORY, SERVICE_UDS_DIRECTORY))
+@Instantiate('herald-uds-directory')
+class UDSDirectory(object):
+    """
+    Unix domain socket directory for Herald
+    """
+    def __init__(self):
+        """
+        Sets up the transport directory
+        """
+        # Herald Core Directory
+        self._directory = None
+        self._access_id = ACCESS_ID
+
+        # Peer UID -> socket path, for the peers on the local node
+        self._uid_path = {}
+
+    @Validate
+    def _validate(self, _):
+        """
+        Component validated
+        """
+        self._uid_path.clear()
+
+    @Invalidate
+    def _invalidate(self, _):
+        """
+        Component invalidated
+        """
+        self._uid_path.clear()
+
+    def load_access(self, data):
+        """
+        Loads a dumped access
+
+        :param data: Result of a call to UDSAccess.dump()
+        :return: An UDSAccess bean
+        """
+        return UDSAccess(data[0], data[1])
+
+    def peer_access_set(self, peer, data):
+        """
+        The access to the given peer matching our access ID has been set
+
+        :param peer: The Peer bean
+        :param data: The peer access data, previously loaded with load_access()
+        """
+        local_peer = self._directory.get_local_peer()
+        if peer.uid != local_peer.uid \
+                and data.node_uid == local_peer.node_uid:
+            self._uid_path[peer.uid] = data.path
+
+    def peer_access_unset(self, peer, data):
+        """
+        The access to the given peer matching our access ID has been removed
+
+        :param peer: The Peer bean
+        :param data: The peer access data
+        """
+        try:
+            del self._uid_path[peer.uid]
+        except KeyError:
+            pass
+
+    def get_path(self, uid):
+        """
+        Returns the path to the socket file of the given peer, if it is hosted
+        on the local node
+
+        :param uid: The UID of a peer
+        :return: The path to its socket file, or None
+        """
+        return self._uid_path.get(uid)
@@ -0,0 +1,178 @@
+#!/usr/bin/python
+# -- Content-Encoding: UTF-8 --
+"""
+Herald Unix domain socket transport implementation
+
+:author: Thomas Calmant
+:copyright: Copyright 2015, isandlaTech
+:license: Apache License 2.0
+:version: 1.0.1
+:status: Alpha
+
+..
+
+    Copyright 2015 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Bundle version
+import herald.version
+__version__=herald.version.__version__
+
+# ------------------------------------------------------------------------------
+
+# Herald UDS
+from . import ACCESS_ID, SERVICE_UDS_DIRECTORY, SERVICE_UDS_TRANSPORT, \
+    PROP_SOCKET_FOLDER
+from .beans import UDSAccess
+
+# Herald Core
+from herald.transports.framed import FramedTransport
+import herald
+
+# Pelix
+from pelix.ipopo.decorators import ComponentFactory, Requires, Provides, \
+    Property, Validate, Invalidate, Instantiate, RequiresBest
+
+# Standard library
+import logging
+import os
+import socket
+import tempfile
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+
+
+@ComponentFactory('herald-uds-transport-factory')
+@RequiresBest('_probe', herald.SERVICE_PROBE)
+@Requires('_core', herald.SERVICE_HERALD_INTERNAL)
+@Requires('_directory', herald.SERVICE_DIRECTORY)
+@Requires('_uds_directory', SERVICE_UDS_DIRECTORY)
+@Provides((herald.SERVICE_TRANSPORT, SERVICE_UDS_TRANSPORT))
+@Property('_access_id', herald.PROP_ACCESS_ID, ACCESS_ID)
+@Property('_folder', PROP_SOCKET_FOLDER, None)
+@Instantiate('herald-uds-transport')
+class UDSTransport(FramedTransport):
+    """
+    Unix domain socket transport for Herald: sends messages to the peers
+    hosted on the same node through persistent AF_UNIX stream connections.
+
+    The peers hosted on other nodes are not reachable with this transport:
+    the core then uses another access, like HTTP.
+    """
+    def __init__(self):
+        """
+        Sets up the transport
+        """
+        FramedTransport.__init__(self)
+
+        # UDS directory
+        self._uds_directory = None
+
+        # Properties
+        self._access_id = ACCESS_ID
+        self._folder = None
+
+        # Path to the socket file
+        self.__path = None
+
+    @Validate
+    def _validate(self, _):
+        """
+        Component validated
+        """
+        if not hasattr(socket, 'AF_UNIX'):
+            # Unix domain sockets are not available on this platform
+            _logger.warning("Unix domain sockets are not supported: "
+                            "no '%s' access will be advertised",
+                            self._access_id)
+            return
+
+        local_peer = self._directory.get_local_peer()
+        self.__path = os.path.join(self._folder or tempfile.gettempdir(),
+                                   "herald-{0}.sock".format(local_peer.uid))
+        self.__remove_file()
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(self.__path)
+            server.listen(16)
+        except socket.error as ex:
+            _logger.error("Error binding the Unix domain socket %s: %s",
+                          self.__path, ex)
+            server.close()
+            self.__path = None
+            return
+
+        self._start_framing(server, "Herald-UDS")
+
+        # Advertise the access
+        local_peer.set_access(self._access_id,
+                              UDSAccess(local_peer.node_uid, self.__path))
+
+    @Invalidate
+    def _invalidate(self, _):
+        """
+        Component invalidated
+        """
+        if self.__path is None:
+            # Nothing was started
+            return
+
+        self._directory.get_local_peer().unset_access(self._access_id)
+        self._stop_framing()
+        self.__remove_file()
+        self.__path = None
+
+    def __remove_file(self):
+        """
+        Removes the socket file, if any
+        """
+        try:
+            os.remove(self.__path)
+        except OSError:
+            # File not found
+            pass
+
+    def _connect(self, address):
+        """
+        Returns a socket connected to the given address
+
+        :param address: Path to the socket file of a peer
+        :return: A connected socket
+        :raise socket.error: Error connecting the peer
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(address)
+        except socket.error:
+            sock.close()
+            raise
+        return sock
+
+    def _get_address(self, peer, extra):
+        """
+        Returns the path to the socket file of the given peer
+
+        :param peer: A Peer bean (can be None)
+        :param extra: Extra information, given for replies (can be None)
+        :return: A path, or None if the peer isn't on the local node
+        """
+        if peer is None or self.__path is None:
+            return None
+        return self._uds_directory.get_path(peer.uid)
@@ -591,12 +591,12 @@ class XmppTransport(object):
         except KeyError:
             sender_uid = "<unknown>"
 
-        try:            
-            received_msg = utils.from_json(msg['body'])
-            content = received_msg.content
-        except ValueError:
-            # Content can't be decoded, use its string representation as is
-            content = msg['body']
+        # The content is decoded when a listener reads it
+        received_msg = utils.from_json(msg['body'])
+        if received_msg is None:
+            # Not an Herald message body: handle it as a raw message
+            self.__handle_raw_message(msg)
+            return
 
         uid = msg['thread']
         reply_to = msg['parent_thread']
@@ -608,7 +608,6 @@ class XmppTransport(object):
         received_msg.add_header(herald.MESSAGE_HEADER_UID, uid)
         received_msg.add_header(herald.MESSAGE_HEADER_SENDER_UID, sender_uid)
         received_msg.add_header(herald.MESSAGE_HEADER_REPLIES_TO, reply_to)
-        received_msg.set_content(content)
         received_msg.set_access(self._access_id)
         received_msg.set_extra(extra)
         
@@ -701,14 +700,15 @@ class XmppTransport(object):
         if message.subject in herald.SUBJECTS_RAW:
             content = to_str(message.content)
         else:
-            # update headers
-            local_peer = self._directory.get_local_peer()
-            message.add_header(herald.MESSAGE_HEADER_SENDER_UID, local_peer.uid)
+            # Target headers are added without modifying the message, to
+            # reuse its encoded body
+            envelope = {herald.MESSAGE_HEADER_SENDER_UID:
+                        self._directory.get_local_peer().uid}
             if target_peer is not None:
-                message.add_header(herald.MESSAGE_HEADER_TARGET_PEER, target_peer.uid)
+                envelope[herald.MESSAGE_HEADER_TARGET_PEER] = target_peer.uid
             if target_group is not None:
-                message.add_header(herald.MESSAGE_HEADER_TARGET_GROUP, target_group)
-            content = utils.to_json(message)
+                envelope[herald.MESSAGE_HEADER_TARGET_GROUP] = target_group
+            content = utils.to_json(message, envelope)
         
         # Prepare an XMPP message, based on the Herald message
         xmpp_msg = self._bot.make_message(mto=target,
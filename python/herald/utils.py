@@ -32,9 +32,13 @@ __version__=herald.version.__version__
 
 # ------------------------------------------------------------------------------
 
-import threading
+import binascii
+import functools
+import itertools
 import json
 import logging
+import os
+import threading
 
 import herald
 
@@ -57,39 +61,56 @@ def json_converter(obj):
 
     raise TypeError
 
-def to_json(msg):
+def to_json(msg, envelope=None):
     """
-    Returns a JSON string representation of this message
+    Returns a JSON string representation of this message.
+
+    The subject, content and metadata are converted once: the result is
+    cached in the message. Only the headers are converted on each call.
+
+    :param msg: A Message bean
+    :param envelope: Headers to add to those of the message, without
+                     modifying it (target peer, ...)
+    :return: A JSON string
     """
-    result = {}
-    
-    # herald specification version
-    #result[herald.MESSAGE_HERALD_VERSION] = herald.HERALD_SPECIFICATION_VERSION
-    
     # headers
-    result[herald.MESSAGE_HEADERS] = {}        
+    headers = {}
     if msg.headers is not None:
         for key in msg.headers:
-            result[herald.MESSAGE_HEADERS][key] = msg.headers.get(key) or None        
-    
-    # subject
-    result[herald.MESSAGE_SUBJECT] = msg.subject
-    # content
-    if msg.content is not None:
-        if isinstance(msg.content, str):
-            # string content
-            result[herald.MESSAGE_CONTENT] = msg.content
-        else:
-            # jaborb content
-            result[herald.MESSAGE_CONTENT] = jabsorb.to_jabsorb(msg.content)
-    
-    # metadata
-    result[herald.MESSAGE_METADATA] = {}        
-    if msg.metadata is not None:
-        for key in msg.metadata:
-            result[herald.MESSAGE_METADATA][key] = msg.metadata.get(key) or None
-            
-    return json.dumps(result, default=herald.utils.json_converter)
+            headers[key] = msg.headers.get(key) or None
+    if envelope:
+        headers.update(envelope)
+
+    body = msg.get_encoded("json")
+    if body is None:
+        result = {}
+
+        # subject
+        result[herald.MESSAGE_SUBJECT] = msg.subject
+        # content
+        if msg.content is not None:
+            if isinstance(msg.content, str):
+                # string content
+                result[herald.MESSAGE_CONTENT] = msg.content
+            else:
+                # jaborb content
+                result[herald.MESSAGE_CONTENT] = jabsorb.to_jabsorb(msg.content)
+
+        # metadata
+        result[herald.MESSAGE_METADATA] = {}
+        if msg.metadata is not None:
+            for key in msg.metadata:
+                result[herald.MESSAGE_METADATA][key] = \
+                    msg.metadata.get(key) or None
+
+        # Keep the members, without the opening brace
+        body = json.dumps(result, default=herald.utils.json_converter)[1:]
+        msg.set_encoded("json", body)
+
+    # Splice the headers in the cached object
+    return '{{{0}: {1}, {2}'.format(
+        json.dumps(herald.MESSAGE_HEADERS),
+        json.dumps(headers, default=herald.utils.json_converter), body)
 
 
 def from_json(json_string):
@@ -122,27 +143,23 @@ def from_json(json_string):
                           access=None,
                           timestamp=(parsed_msg[herald.MESSAGE_HEADERS].get(herald.MESSAGE_HEADER_TIMESTAMP) or None) 
                           )                           
-    # set content
-    try:
-        if herald.MESSAGE_CONTENT in parsed_msg:
-            parsed_content = parsed_msg[herald.MESSAGE_CONTENT]                              
-            if parsed_content is not None:
-                if isinstance(parsed_content, str):
-                    msg.set_content(parsed_content)
-                else:
-                    msg.set_content(jabsorb.from_jabsorb(parsed_content))
-    except KeyError as ex:
-        _logger.error("Error retrieving message content! " + str(ex)) 
+    # set content: the Jabsorb conversion is done on first access
+    parsed_content = parsed_msg.get(herald.MESSAGE_CONTENT)
+    if parsed_content is not None:
+        if isinstance(parsed_content, str):
+            msg.set_content(parsed_content)
+        else:
+            msg.set_content_loader(
+                functools.partial(jabsorb.from_jabsorb, parsed_content))
+    msg.set_payload("json", json_string)
     # other headers
     if herald.MESSAGE_HEADERS in parsed_msg:
         for key in parsed_msg[herald.MESSAGE_HEADERS]:
             if key not in msg._headers:
                 msg._headers[key] = parsed_msg[herald.MESSAGE_HEADERS][key]         
     # metadata
-    if herald.MESSAGE_METADATA in parsed_msg:
-        for key in parsed_msg[herald.MESSAGE_METADATA]:
-            if key not in msg._metadata:
-                msg._metadata[key] = parsed_msg[herald.MESSAGE_METADATA][key] 
+    if parsed_msg.get(herald.MESSAGE_METADATA):
+        msg.metadata.update(parsed_msg[herald.MESSAGE_METADATA])
                        
     return msg
 
@@ -186,6 +203,58 @@ else:
 # ------------------------------------------------------------------------------
 
 
+class _UidGenerator(object):
+    """
+    Generates message UIDs: a random prefix, drawn once per process, followed
+    by a counter. UIDs have the same format as the former upper-case UUIDs
+    (32 hexadecimal characters) but are much cheaper to generate.
+
+    The prefix is drawn again in child processes after a fork.
+    """
+    def __init__(self):
+        """
+        Sets up members
+        """
+        self.__lock = threading.Lock()
+        self.__pid = os.getpid()
+        self.__prefix = None
+        self.__counter = None
+        self.__reset()
+
+        try:
+            os.register_at_fork(after_in_child=self.__reset)
+        except AttributeError:
+            # Python < 3.7: the PID is checked on each call
+            pass
+        else:
+            # No need to check the PID
+            self.__pid = None
+
+    def __reset(self):
+        """
+        Draws a new prefix and resets the counter
+        """
+        self.__prefix = binascii.hexlify(os.urandom(8)).decode('ascii').upper()
+        self.__counter = itertools.count()
+        if self.__pid is not None:
+            self.__pid = os.getpid()
+
+    def generate(self):
+        """
+        Returns a new UID
+
+        :return: A 32 characters UID
+        """
+        if self.__pid is not None and self.__pid != os.getpid():
+            with self.__lock:
+                if self.__pid != os.getpid():
+                    self.__reset()
+
+        return "{0}{1:016X}".format(self.__prefix, next(self.__counter))
+
+# ------------------------------------------------------------------------------
+
+
 class LoopTimer(threading.Thread):
     """
     Same as Python's Timer class, but executes the requested method
@@ -223,3 +292,8 @@ class LoopTimer(threading.Thread):
         while not (self.finished.wait(self.interval)
                    or self.finished.is_set()):
             self.function(*self.args, **self.kwargs)
+
+# ------------------------------------------------------------------------------
+
+generate_uid = _UidGenerator().generate
+""" Returns a new message UID """
@@ -64,6 +64,9 @@ setup(
         'herald.remote',
         'herald.transports',
         'herald.transports.http',
+        'herald.transports.inprocess',
+        'herald.transports.tcp',
+        'herald.transports.uds',
         'herald.transports.xmpp'],
     classifiers=[
         'Development Status :: 3 - Alpha',
@@ -79,6 +82,7 @@ setup(
     install_requires=[
         'iPOPO>=0.6.1',
         'sleekxmpp>=1.3.1',
-        'requests>=2.3.0'
+        'requests>=2.3.0',
+        'futures>=2.1.6; python_version<"3.2"'
     ]
 )
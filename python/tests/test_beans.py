@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the Herald beans
+
+:author: Thomas Calmant
+"""
+
+# Herald
+import herald
+import herald.beans as beans
+import herald.utils as utils
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+
+class BeansTests(unittest.TestCase):
+    """
+    Tests the Message and Peer beans
+    """
+    def test_uid(self):
+        """
+        Tests the generation of message UIDs
+        """
+        uids = set(utils.generate_uid() for _ in range(1000))
+        self.assertEqual(len(uids), 1000)
+        for uid in uids:
+            self.assertEqual(len(uid), 32)
+            self.assertEqual(uid, uid.upper())
+            int(uid, 16)
+
+        # Same process: same prefix
+        self.assertEqual(len(set(uid[:16] for uid in uids)), 1)
+        self.assertNotEqual(beans.Message("a").uid, beans.Message("a").uid)
+
+    def test_message(self):
+        """
+        Tests the slotted message beans
+        """
+        message = beans.Message("subject")
+        self.assertRaises(AttributeError, setattr, message, "other", 1)
+        self.assertIsNone(message._metadata)
+        self.assertIsNone(message.get_metadata("key"))
+        message.remove_metadata("key")
+        self.assertIsNone(message._metadata)
+        message.add_metadata("key", "value")
+        self.assertEqual(message.metadata, {"key": "value"})
+
+        received = beans.MessageReceived("uid", "subject", "content",
+                                         "sender", None, "http", 42)
+        self.assertRaises(AttributeError, setattr, received, "other", 1)
+        self.assertEqual(received.uid, "uid")
+        self.assertEqual(received.sender, "sender")
+        self.assertEqual(received.timestamp, 42)
+        self.assertEqual(received.get_header(herald.MESSAGE_HERALD_VERSION),
+                         herald.HERALD_SPECIFICATION_VERSION)
+
+    def test_peer(self):
+        """
+        Tests the slotted peer bean
+        """
+        peer = beans.Peer("uid", "node", "app", ["group"], None)
+        self.assertRaises(AttributeError, setattr, peer, "other", 1)
+        peer.set_access("http", beans.RawAccess("http", "data"))
+        self.assertEqual(peer.get_accesses(), ("http",))
+        self.assertEqual(peer.unset_access("http").dump(), "data")
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the Herald message codecs
+
+:author: Thomas Calmant
+"""
+
+# Herald
+import herald
+import herald.beans as beans
+import herald.codecs as codecs
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+
+class FakePeer(object):
+    """
+    A peer advertising its codecs
+    """
+    def __init__(self, *codec_names):
+        self.codecs = codec_names or codecs.LEGACY_CODECS
+
+
+class JavaBean(object):
+    """
+    A bean only handled by Jabsorb
+    """
+    javaClass = "org.cohorte.Bean"
+
+    def __init__(self):
+        self.value = 42
+
+# ------------------------------------------------------------------------------
+
+
+class CodecsTests(unittest.TestCase):
+    """
+    Tests the message codecs
+    """
+    def _check_round_trip(self, codec, content):
+        """
+        Encodes and decodes a message with the given content
+        """
+        message = beans.Message("some/subject", content)
+        message.add_header(herald.MESSAGE_HEADER_SENDER_UID, "sender")
+        message.add_header("custom", 42)
+        message.add_metadata("meta", [1, "two"])
+
+        received = codec.decode(codec.encode(message))
+        self.assertEqual(received.uid, message.uid)
+        self.assertEqual(received.subject, message.subject)
+        self.assertEqual(received.sender, "sender")
+        self.assertEqual(received.timestamp, message.timestamp)
+        self.assertEqual(received.get_header("custom"), 42)
+        self.assertEqual(received.get_metadata("meta"), [1, "two"])
+        return received.content
+
+    def test_binary(self):
+        """
+        Tests the round trip of values with the binary codec
+        """
+        codec = codecs.get_codec(codecs.CODEC_BINARY)
+        for content in (None, True, False, 0, -1, 2 ** 40, 2 ** 70, 1.5, "",
+                        u"été", b"\x00\xff", [1, [2, None]],
+                        (1, "a"), {"a", 1}, {"uid": {1: 2.5}, "x": ()}):
+            self.assertEqual(self._check_round_trip(codec, content), content)
+
+        # Unsupported content
+        self.assertRaises(TypeError, codec.encode,
+                          beans.Message("subject", object()))
+
+    def test_binary_invalid(self):
+        """
+        Tests the decoding of invalid data
+        """
+        codec = codecs.get_codec(codecs.CODEC_BINARY)
+        data = codec.encode(beans.Message("subject", "content" * 10))
+        self.assertIsNone(codec.decode(b"{}"))
+        self.assertIsNone(codec.decode(data[:3] + b"?" + data[4:]))
+
+        # Invalid content is detected when it is read
+        message = codec.decode(data[:-20])
+        self.assertEqual(message.subject, "subject")
+        self.assertRaises(ValueError, getattr, message, "content")
+        message = codec.decode(data + b"N")
+        self.assertRaises(ValueError, getattr, message, "content")
+
+    def test_lazy_content(self):
+        """
+        Tests the decoding of the content on first access
+        """
+        for name in (codecs.CODEC_JSON, codecs.CODEC_BINARY):
+            codec = codecs.get_codec(name)
+            data = codec.encode(beans.Message("subject", {"a": [1]}))
+            message = codec.decode(data)
+            self.assertIsNotNone(message._content_loader)
+            self.assertEqual(message.payload_codec, name)
+            self.assertIs(message.payload, data)
+
+            # Decoded once
+            content = message.content
+            self.assertEqual(content, {"a": [1]})
+            self.assertIs(message.content, content)
+            self.assertIsNone(message._content_loader)
+
+            # Replaced content is never decoded
+            message = codec.decode(data)
+            message.set_content("other")
+            self.assertEqual(message.content, "other")
+
+    def test_json(self):
+        """
+        Tests the round trip of a message with the JSON codec
+        """
+        codec = codecs.get_codec(codecs.CODEC_JSON)
+        self.assertEqual(
+            self._check_round_trip(codec, {"a": [1, 2]}), {"a": [1, 2]})
+
+    def test_negotiate(self):
+        """
+        Tests the selection of the codec according to the peers
+        """
+        binary = codecs.get_codec(codecs.CODEC_BINARY)
+        json_codec = codecs.get_codec(codecs.CODEC_JSON)
+        new_peer = FakePeer(codecs.CODEC_BINARY, codecs.CODEC_JSON)
+        old_peer = FakePeer()
+
+        self.assertIs(codecs.negotiate(new_peer), binary)
+        self.assertIs(codecs.negotiate(new_peer, new_peer), binary)
+        self.assertIs(codecs.negotiate(new_peer, old_peer), json_codec)
+        self.assertIs(codecs.negotiate(FakePeer("unknown")), json_codec)
+        self.assertIs(codecs.negotiate(), json_codec)
+
+        # Fall back to JSON when the content can't be encoded
+        codec, _ = codecs.encode(beans.Message("subject", "text"), [new_peer])
+        self.assertIs(codec, binary)
+        codec, data = codecs.encode(
+            beans.Message("subject", JavaBean()), [new_peer])
+        self.assertIs(codec, json_codec)
+        self.assertIsNotNone(json_codec.decode(data))
+
+    def test_encoded_cache(self):
+        """
+        Tests the reuse of the encoded body of a message
+        """
+        for name in (codecs.CODEC_JSON, codecs.CODEC_BINARY):
+            codec = codecs.get_codec(name)
+            message = beans.Message("subject", {"a": 1})
+            first = codec.decode(codec.encode(
+                message, {herald.MESSAGE_HEADER_TARGET_PEER: "peer1"}))
+            body = message.get_encoded(name)
+            self.assertIsNotNone(body)
+
+            # Envelope headers don't modify the message nor its body
+            second = codec.decode(codec.encode(
+                message, {herald.MESSAGE_HEADER_TARGET_PEER: "peer2"}))
+            self.assertIs(message.get_encoded(name), body)
+            self.assertIsNone(
+                message.get_header(herald.MESSAGE_HEADER_TARGET_PEER))
+            self.assertEqual(
+                first.get_header(herald.MESSAGE_HEADER_TARGET_PEER), "peer1")
+            self.assertEqual(
+                second.get_header(herald.MESSAGE_HEADER_TARGET_PEER), "peer2")
+            self.assertEqual(second.content, {"a": 1})
+
+            # Headers are always encoded
+            message.add_header("custom", "value")
+            self.assertEqual(codec.decode(codec.encode(message))
+                             .get_header("custom"), "value")
+            self.assertIs(message.get_encoded(name), body)
+
+            # Content and metadata updates clear the cache
+            message.set_content({"b": 2})
+            self.assertIsNone(message.get_encoded(name))
+            self.assertEqual(
+                codec.decode(codec.encode(message)).content, {"b": 2})
+            message.add_metadata("meta", "data")
+            self.assertIsNone(message.get_encoded(name))
+            self.assertEqual(codec.decode(codec.encode(message))
+                             .get_metadata("meta"), "data")
+
+    def test_content_type(self):
+        """
+        Tests the look up of codecs by content type
+        """
+        self.assertIs(
+            codecs.get_codec_for("application/x-herald-binary"),
+            codecs.get_codec(codecs.CODEC_BINARY))
+        self.assertIs(
+            codecs.get_codec_for("Application/JSON; charset=utf-8"),
+            codecs.get_codec(codecs.CODEC_JSON))
+        self.assertIsNone(codecs.get_codec_for("text/plain"))
+        self.assertIsNone(codecs.get_codec_for(None))
+
+    def test_peer_dump(self):
+        """
+        Tests the advertisement of codecs in the peer description
+        """
+        peer = beans.Peer("uid", "node", "app", ["group"], None)
+        self.assertEqual(peer.dump()["codecs"], ["json"])
+        peer.codecs = codecs.get_codecs_names()
+        self.assertEqual(peer.dump()["codecs"], ["binary", "json"])
+        peer.codecs = None
+        self.assertEqual(peer.codecs, ("json",))
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the Herald core service, using fake directory and transports
+
+:author: Thomas Calmant
+"""
+
+# Herald
+from herald.core import Herald
+from herald.exceptions import HeraldTimeout, NoListener, PeerLost, \
+    ForgotMessage, Overloaded
+import herald
+import herald.beans as beans
+
+# Standard library
+import concurrent.futures
+import threading
+import time
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+ACCESS_ID = "fake"
+
+
+class FakeAccess(object):
+    """
+    Access bean of the fake transport
+    """
+    access_id = ACCESS_ID
+
+    def dump(self):
+        return None
+
+
+class FakeDirectory(object):
+    """
+    Fake Herald directory
+    """
+    def __init__(self):
+        self.local_uid = "local"
+        self.peers = {}
+        self.groups = {}
+
+    def add_peer(self, uid, groups=None, reachable=True):
+        peer = beans.Peer(uid, None, None, groups, self)
+        if reachable:
+            peer.set_access(ACCESS_ID, FakeAccess())
+        self.peers[uid] = peer
+        for group in groups or ():
+            self.groups.setdefault(group, set()).add(peer)
+        return peer
+
+    def get_peer(self, uid):
+        return self.peers[uid]
+
+    def get_peers_for_group(self, group):
+        if group == 'all':
+            return list(self.peers.values())
+        return self.groups[group].copy()
+
+
+class FakeTransport(object):
+    """
+    Fake transport: stores the fired messages
+    """
+    def __init__(self):
+        self.fired = []
+        self.condition = threading.Condition()
+
+    def fire(self, peer, message, extra=None):
+        with self.condition:
+            self.fired.append((peer, message, extra))
+            self.condition.notify_all()
+
+    def fire_group(self, group, peers, message):
+        with self.condition:
+            for peer in peers:
+                self.fired.append((peer, message, None))
+            self.condition.notify_all()
+        return peers
+
+    def wait_fired(self, count, timeout=5):
+        deadline = time.time() + timeout
+        with self.condition:
+            while len(self.fired) < count:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+
+class FailingTransport(object):
+    """
+    Transport which always fails
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def fire(self, peer, message, extra=None):
+        self.calls += 1
+        raise IOError("Transport is down")
+
+
+class FakeReference(object):
+    """
+    Fake service reference
+    """
+    def __init__(self, props):
+        self.props = props
+
+    def get_property(self, name):
+        return self.props.get(name)
+
+
+class Listener(object):
+    """
+    A message listener storing received messages
+    """
+    def __init__(self):
+        self.messages = []
+        self.event = threading.Event()
+
+    def herald_message(self, herald_svc, message):
+        self.messages.append(message)
+        self.event.set()
+
+
+def make_reply(message, peer, subject=None, content=None):
+    """
+    Prepares a reply to the given message, as if it was sent by the given peer
+    """
+    return beans.MessageReceived(
+        beans.Message("reply").uid, subject or "reply/" + message.subject,
+        content, peer.uid, message.uid, ACCESS_ID)
+
+# ------------------------------------------------------------------------------
+
+
+class HeraldCoreTests(unittest.TestCase):
+    """
+    Tests the Herald core service
+    """
+    def setUp(self):
+        """
+        Prepares a core service
+        """
+        self.directory = FakeDirectory()
+        self.transport = FakeTransport()
+        self.peer = self.directory.add_peer("peer1", ["group"])
+        self.directory.add_peer("peer2", ["group"])
+
+        self.herald = Herald()
+        self.herald._directory = self.directory
+        self.herald._transports = {ACCESS_ID: self.transport}
+        self.herald._validate(None)
+
+    def tearDown(self):
+        """
+        Cleans up the core service
+        """
+        self.herald._invalidate(None)
+
+    def _bind_listener(self, filters, listener=None, **props):
+        """
+        Binds a new listener to the core service
+        """
+        if listener is None:
+            listener = Listener()
+        props[herald.PROP_FILTERS] = filters
+        self.herald._bind_listener(None, listener, FakeReference(props))
+        return listener
+
+    def test_listeners(self):
+        """
+        Tests the notification of listeners and duplicates filtering
+        """
+        listener = self._bind_listener(["test/*"])
+        message = beans.MessageReceived("uid", "test/subject", "content",
+                                        "peer1", None, ACCESS_ID)
+        self.herald.handle_message(message)
+        self.assertTrue(listener.event.wait(5))
+        self.assertEqual(listener.messages, [message])
+
+        # Duplicate message
+        listener.event.clear()
+        self.herald.handle_message(message)
+        self.assertFalse(listener.event.wait(.1))
+
+        # Unknown subject: an error is sent back
+        self.herald.handle_message(
+            beans.MessageReceived("uid2", "other", None, "peer1", None,
+                                  ACCESS_ID))
+        self.assertTrue(self.transport.wait_fired(1))
+        self.assertEqual(self.transport.fired[0][1].subject,
+                         "herald/error/no-listener")
+
+    def test_ordering(self):
+        """
+        Tests the notification of messages in order, per sender
+        """
+        class SlowListener(Listener):
+            def herald_message(self, herald_svc, message):
+                threading.Event().wait(.001)
+                Listener.herald_message(self, herald_svc, message)
+
+        listener = self._bind_listener(
+            ["test/*"], SlowListener(), **{herald.PROP_ORDER_KEY: "sender"})
+        for idx in range(20):
+            for sender in ("peer1", "peer2"):
+                self.herald.handle_message(beans.MessageReceived(
+                    "{0}-{1}".format(sender, idx), "test/order", idx, sender,
+                    None, ACCESS_ID))
+
+        for _ in range(500):
+            if len(listener.messages) == 40:
+                break
+            threading.Event().wait(.01)
+
+        for sender in ("peer1", "peer2"):
+            self.assertEqual([message.content for message in listener.messages
+                              if message.sender == sender], list(range(20)))
+
+    def test_overloaded(self):
+        """
+        Tests the rejection of messages when the queue of a listener is full
+        """
+        gate = threading.Event()
+
+        class BlockingListener(Listener):
+            def herald_message(self, herald_svc, message):
+                gate.wait()
+                Listener.herald_message(self, herald_svc, message)
+
+        listener = self._bind_listener(
+            ["test/*"], BlockingListener(),
+            **{herald.PROP_QUEUE_SIZE: 1,
+               herald.PROP_QUEUE_POLICY: "reject"})
+        try:
+            for idx in range(10):
+                self.herald.handle_message(beans.MessageReceived(
+                    "uid{0}".format(idx), "test/load", None, "peer1", None,
+                    ACCESS_ID))
+
+            # At most 6 messages accepted: one per worker and a queued one
+            self.assertTrue(self.transport.wait_fired(4))
+            for _, message, _ in self.transport.fired:
+                self.assertEqual(message.subject, "herald/error/overloaded")
+
+            stats = self.herald.get_queues_stats()
+            self.assertEqual(len(stats), 1)
+            self.assertEqual(list(stats.values())[0]['rejected'],
+                             len(self.transport.fired))
+        finally:
+            gate.set()
+
+        # Error reply received by the sender
+        message = beans.Message("test/error")
+        future = self.herald.send_async("peer1", message)
+        self.herald.handle_message(
+            make_reply(message, self.peer, "herald/error/overloaded",
+                       {'uid': message.uid, 'subject': message.subject}))
+        self.assertIsInstance(future.exception(5), Overloaded)
+
+    def test_send(self):
+        """
+        Tests the send() method
+        """
+        message = beans.Message("test/send", "request")
+        threading.Timer(
+            .05, lambda: self.herald.handle_message(
+                make_reply(message, self.peer, content="ok"))).start()
+        reply = self.herald.send("peer1", message, 5)
+        self.assertEqual(reply.content, "ok")
+
+        # Timeout
+        self.assertRaises(HeraldTimeout, self.herald.send, "peer1",
+                          beans.Message("test/timeout"), .05)
+
+    def test_send_errors(self):
+        """
+        Tests the errors raised in send()
+        """
+        message = beans.Message("test/error")
+
+        def reply_error():
+            self.herald.handle_message(
+                make_reply(message, self.peer, "herald/error/no-listener",
+                           {'uid': message.uid, 'subject': message.subject}))
+
+        threading.Timer(.05, reply_error).start()
+        self.assertRaises(NoListener, self.herald.send, "peer1", message, 5)
+
+        threading.Timer(
+            .05, lambda: self.herald.peer_unregistered(self.peer)).start()
+        self.assertRaises(PeerLost, self.herald.send, "peer1",
+                          beans.Message("test/lost"), 5)
+
+    def test_transport_health(self):
+        """
+        Tests the circuit breaker of a failing access
+        """
+        failing = FailingTransport()
+        self.herald._transports["bad"] = failing
+        peer = self.directory.add_peer("peer3", reachable=False)
+        peer.set_access("bad", FakeAccess())
+        peer.set_access(ACCESS_ID, FakeAccess())
+        self.assertEqual(peer.get_accesses(), ("bad", ACCESS_ID))
+
+        for _ in range(10):
+            self.herald.fire(peer, beans.Message("test/health"))
+
+        # The failing transport is tried last
+        self.assertEqual(failing.calls, 1)
+        self.assertEqual(len(self.transport.fired), 10)
+
+    def test_send_async(self):
+        """
+        Tests the send_async() method
+        """
+        message = beans.Message("test/async")
+        future = self.herald.send_async("peer1", message, 5)
+        self.assertFalse(future.done())
+        self.herald.handle_message(make_reply(message, self.peer,
+                                              content="ok"))
+        self.assertEqual(future.result(5).content, "ok")
+
+        # Timeout
+        future = self.herald.send_async("peer1", beans.Message("test/to"),
+                                        .05)
+        self.assertIsInstance(future.exception(5), HeraldTimeout)
+
+        # Forget
+        message = beans.Message("test/forget")
+        future = self.herald.send_async("peer1", message)
+        self.assertTrue(self.herald.forget(message.uid))
+        self.assertIsInstance(future.exception(5), ForgotMessage)
+
+        # Cancellation: the message is forgotten
+        message = beans.Message("test/cancel")
+        future = self.herald.send_async("peer1", message)
+        self.assertTrue(future.cancel())
+        self.assertFalse(self.herald.forget(message.uid))
+
+        # Lost peer
+        futures = [self.herald.send_async("peer1", beans.Message("test/lost"))
+                   for _ in range(10)]
+        self.herald.peer_unregistered(self.peer)
+        done, _ = concurrent.futures.wait(futures, 5)
+        self.assertEqual(len(done), 10)
+        for future in futures:
+            self.assertIsInstance(future.exception(), PeerLost)
+
+    def test_send_group(self):
+        """
+        Tests the send_group() method
+        """
+        peer2 = self.directory.get_peer("peer2")
+        peer3 = self.directory.add_peer("peer3", ["group"])
+
+        # All peers reply
+        message = beans.Message("test/group")
+        future = self.herald.send_group("group", message, 5)
+        self.assertEqual(len(self.transport.fired), 3)
+        self.herald.handle_message(make_reply(message, self.peer))
+        self.herald.handle_message(make_reply(message, peer2))
+        self.assertFalse(future.done())
+        self.herald.handle_message(
+            make_reply(message, peer3, "herald/error/no-listener",
+                       {'uid': message.uid, 'subject': message.subject}))
+        result = future.result(5)
+        self.assertEqual(sorted(result.replies), ["peer1", "peer2"])
+        self.assertIsInstance(result.errors["peer3"], NoListener)
+        self.assertFalse(result.missing)
+        self.assertFalse(self.herald.forget(message.uid))
+
+        # Quorum
+        message = beans.Message("test/quorum")
+        future = self.herald.send_group("group", message, 5, 2)
+        self.herald.handle_message(make_reply(message, peer2))
+        self.herald.peer_unregistered(peer3)
+        self.assertFalse(future.done())
+        self.herald.handle_message(make_reply(message, self.peer))
+        result = future.result(5)
+        self.assertEqual(sorted(result.replies), ["peer1", "peer2"])
+        self.assertIsInstance(result.errors["peer3"], PeerLost)
+
+        # Timeout: partial result
+        message = beans.Message("test/partial")
+        future = self.herald.send_group("group", message, .1)
+        self.herald.handle_message(make_reply(message, self.peer))
+        result = future.result(5)
+        self.assertEqual(list(result.replies), ["peer1"])
+        self.assertEqual(result.missing, set(["peer2", "peer3"]))
+
+        # Unreached peers are not waited for
+        self.directory.add_peer("peer4", ["group"], False)
+        message = beans.Message("test/unreached")
+        future = self.herald.send_group("group", message)
+        for peer in (self.peer, peer2, peer3):
+            self.herald.handle_message(make_reply(message, peer))
+        result = future.result(5)
+        self.assertEqual(len(result.replies), 3)
+        self.assertEqual(result.unreached, set(["peer4"]))
+
+        # Forgotten request
+        message = beans.Message("test/forget")
+        future = self.herald.send_group("group", message)
+        self.assertTrue(self.herald.forget(message.uid))
+        self.assertIsInstance(future.exception(5), ForgotMessage)
+
+    def test_post(self):
+        """
+        Tests the post() method
+        """
+        replies = []
+        errors = []
+        event = threading.Event()
+
+        def callback(_, reply):
+            replies.append(reply)
+            event.set()
+
+        def errback(_, exception):
+            errors.append(exception)
+            event.set()
+
+        message = beans.Message("test/post")
+        self.herald.post("peer1", message, callback, errback)
+        self.herald.handle_message(make_reply(message, self.peer))
+        self.assertTrue(event.wait(5))
+        self.assertEqual(len(replies), 1)
+
+        # Forgotten message
+        event.clear()
+        message = beans.Message("test/forget")
+        self.herald.post("peer1", message, callback, errback)
+        self.assertTrue(self.herald.forget(message.uid))
+        self.assertFalse(self.herald.forget(message.uid))
+        self.assertIsInstance(errors[0], ForgotMessage)
+
+        # Lost peer
+        self.herald.post("peer1", beans.Message("test/lost"), callback,
+                         errback)
+        self.herald.peer_unregistered(self.peer)
+        self.assertIsInstance(errors[1], PeerLost)
+
+        # Timed out post is forgotten
+        message = beans.Message("test/timeout")
+        self.herald.post("peer2", message, callback, errback, .05)
+        threading.Event().wait(.2)
+        self.assertFalse(self.herald.forget(message.uid))
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
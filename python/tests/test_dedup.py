@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the Herald duplicate messages filter
+
+:author: Thomas Calmant
+"""
+
+# Herald
+import herald.dedup
+from herald.dedup import DuplicateFilter
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+
+class FakeClock(object):
+    """
+    Replaces the time module in the tested module
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class DuplicateFilterTests(unittest.TestCase):
+    """
+    Tests the duplicate messages filter
+    """
+    def setUp(self):
+        """
+        Replaces the clock
+        """
+        self.clock = FakeClock()
+        self._time = herald.dedup.time
+        herald.dedup.time = self.clock
+
+    def tearDown(self):
+        """
+        Restores the clock
+        """
+        herald.dedup.time = self._time
+
+    def test_duplicates(self):
+        """
+        Tests the detection of duplicates
+        """
+        dedup = DuplicateFilter(300)
+        self.assertTrue(dedup.check("A"))
+        self.assertTrue(dedup.check("B"))
+        self.assertFalse(dedup.check("A"))
+        self.assertIn("B", dedup)
+        self.assertNotIn("C", dedup)
+        self.assertEqual(len(dedup), 2)
+
+        dedup.clear()
+        self.assertEqual(len(dedup), 0)
+        self.assertTrue(dedup.check("A"))
+
+    def test_window(self):
+        """
+        Tests the expiration of UIDs
+        """
+        dedup = DuplicateFilter(300, 5)
+        self.assertTrue(dedup.check("A"))
+
+        # Still known just before the end of the window
+        self.clock.now += 239
+        self.assertFalse(dedup.check("A"))
+        self.assertTrue(dedup.check("B"))
+
+        # Forgotten after the window
+        self.clock.now += 61
+        self.assertTrue(dedup.check("A"))
+        self.assertFalse(dedup.check("B"))
+
+        # Everything forgotten after a long pause
+        self.clock.now += 3600
+        self.assertEqual(len(dedup), 0)
+        self.assertTrue(dedup.check("B"))
+
+    def test_bounded(self):
+        """
+        Tests the maximum number of entries
+        """
+        dedup = DuplicateFilter(300, 4, max_entries=8)
+        for idx in range(100):
+            self.assertTrue(dedup.check(idx))
+            self.assertLessEqual(len(dedup), 8)
+
+        # Latest entries are still known
+        self.assertFalse(dedup.check(99))
+        self.assertTrue(dedup.check(0))
+
+    def test_invalid(self):
+        """
+        Tests invalid parameters
+        """
+        self.assertRaises(ValueError, DuplicateFilter, 0)
+        self.assertRaises(ValueError, DuplicateFilter, 10, 1)
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
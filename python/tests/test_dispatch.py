@@ -0,0 +1,376 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the Herald subject index and dispatcher
+
+:author: Thomas Calmant
+"""
+
+# Herald
+from herald.dispatch import SubjectIndex, Dispatcher, PriorityMap, BLOCK, \
+    DROP_OLDEST, DROP_NEWEST, REJECT, PRIORITY_HIGH, PRIORITY_NORMAL, \
+    PRIORITY_LOW
+from herald.exceptions import Overloaded
+
+# Standard library
+import fnmatch
+import re
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+PATTERNS = ("herald/directory/*", "herald/*", "*", "herald/rpc*",
+            "herald/error/no-listener", "HERALD/Error/*", "a/?/c", "a/[bc]/*",
+            "reply/*", "foo", "foo/bar/*", "*/bar", "")
+
+SUBJECTS = ("herald/directory/bye", "herald/directory/discovery/step1",
+            "herald/error/no-listener", "herald/rpc/discovery/add",
+            "herald/rpcx", "heraldry", "Herald/Directory/Dump", "a/b/c",
+            "a/c/d", "a/bb/c", "reply/herald/rpc", "foo", "foo/bar",
+            "foo/bar/", "foo/bar/baz/qux", "x/bar", "", "/", "herald")
+
+
+class SubjectIndexTests(unittest.TestCase):
+    """
+    Tests the subject index against the regular expression scan
+    """
+    def _check(self, index, patterns):
+        """
+        Checks that the index gives the same results as a regex scan
+        """
+        regexes = [(re.compile(fnmatch.translate(pattern), re.IGNORECASE),
+                    pattern) for pattern in patterns]
+        for subject in SUBJECTS:
+            expected = set(pattern for regex, pattern in regexes
+                           if regex.match(subject) is not None)
+            # Twice: the second time uses the memo
+            for _ in range(2):
+                self.assertEqual(index.match(subject), expected,
+                                 "Invalid result for {0!r}".format(subject))
+
+    def test_match(self):
+        """
+        Tests matching with all kinds of filters
+        """
+        index = SubjectIndex()
+        for pattern in PATTERNS:
+            index.add(pattern, pattern)
+
+        self.assertEqual(len(index), len(PATTERNS))
+        self._check(index, PATTERNS)
+
+    def test_remove(self):
+        """
+        Tests the invalidation of results after a removal
+        """
+        index = SubjectIndex()
+        for pattern in PATTERNS:
+            index.add(pattern, pattern)
+
+        # Fill the memo
+        self._check(index, PATTERNS)
+
+        remaining = list(PATTERNS)
+        for pattern in PATTERNS:
+            index.remove(pattern, pattern)
+            remaining.remove(pattern)
+            self._check(index, remaining)
+
+        self.assertEqual(len(index), 0)
+        self.assertFalse(index)
+
+        # Unknown associations are ignored
+        index.remove("unknown/*", "value")
+        index.remove("herald/*", "value")
+
+    def test_shared_filter(self):
+        """
+        Tests a filter shared by multiple values
+        """
+        index = SubjectIndex()
+        index.add("herald/*", 1)
+        index.add("Herald/*", 2)
+        index.add("herald/*", 1)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.match("herald/test"), set((1, 2)))
+
+        index.remove("HERALD/*", 1)
+        self.assertEqual(index.match("herald/test"), set((2,)))
+
+    def test_memo_size(self):
+        """
+        Checks that the memo stays bounded
+        """
+        index = SubjectIndex(memo_size=2)
+        index.add("a/*", "a")
+        for idx in range(10):
+            self.assertEqual(index.match("a/{0}".format(idx)), set("a"))
+
+        # Disabled memo
+        index = SubjectIndex(memo_size=0)
+        index.add("a/*", "a")
+        self.assertEqual(index.match("a/b"), set("a"))
+
+
+
+class PriorityMapTests(unittest.TestCase):
+    """
+    Tests the subject -> priority mapping
+    """
+    def test_defaults(self):
+        """
+        Tests the default mapping
+        """
+        priorities = PriorityMap()
+        for subject in ("herald/directory/bye",
+                        "herald/directory/discovery/step1",
+                        "herald/error/no-listener"):
+            self.assertEqual(priorities.get(subject), PRIORITY_HIGH)
+
+        for subject in ("herald/rpc/xmlrpc", "app/data", "herald"):
+            self.assertEqual(priorities.get(subject), PRIORITY_NORMAL)
+
+    def test_configuration(self):
+        """
+        Tests a custom mapping
+        """
+        priorities = PriorityMap({"bulk/*": "low", "bulk/urgent/*": "high",
+                                  "app/*": 5}, "low")
+        self.assertEqual(priorities.get("bulk/data"), PRIORITY_LOW)
+        self.assertEqual(priorities.get("bulk/urgent/data"), PRIORITY_HIGH)
+        self.assertEqual(priorities.get("app/data"), 5)
+        self.assertEqual(priorities.get("herald/directory/bye"), PRIORITY_LOW)
+        self.assertRaises(ValueError, PriorityMap, {"a": "urgent"})
+
+
+class DispatcherTests(unittest.TestCase):
+    """
+    Tests the dispatcher and its bounded lanes
+    """
+    def setUp(self):
+        """
+        Prepares a dispatcher with a single worker
+        """
+        self.dispatcher = Dispatcher("Test-Dispatcher")
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.results = []
+
+    def tearDown(self):
+        """
+        Stops the dispatcher
+        """
+        self.gate.set()
+        self.dispatcher.stop()
+
+    def _blocking(self, value):
+        """
+        Task waiting for the gate to be opened
+        """
+        self.started.set()
+        self.gate.wait()
+        self.results.append(value)
+
+    def _fill(self, key, policy):
+        """
+        Starts a blocking task and fills the lane (2 slots)
+        """
+        self.dispatcher.set_lane(key, max_size=2, policy=policy)
+        self.dispatcher.start(1)
+        self.dispatcher.submit(key, self._blocking, (0,))
+        self.assertTrue(self.started.wait(5))
+        self.assertTrue(self.dispatcher.submit(key, self.results.append, (1,)))
+        self.assertTrue(self.dispatcher.submit(key, self.results.append, (2,)))
+
+    def _wait_processed(self, key, count):
+        """
+        Waits for the lane to have processed the given number of tasks
+        """
+        for _ in range(500):
+            if self.dispatcher.get_stats()[key]['processed'] >= count:
+                return
+            threading.Event().wait(.01)
+        self.fail("Tasks not processed")
+
+    def test_round_robin(self):
+        """
+        Tests the execution of tasks from many lanes
+        """
+        self.dispatcher.set_lane("a")
+        self.dispatcher.set_lane("b")
+        self.dispatcher.start(1)
+        self.dispatcher.submit("a", self._blocking, ("a0",))
+        self.assertTrue(self.started.wait(5))
+        for idx in range(1, 3):
+            self.dispatcher.submit("a", self.results.append, ("a" + str(idx),))
+            self.dispatcher.submit("b", self.results.append, ("b" + str(idx),))
+
+        self.gate.set()
+        self._wait_processed("a", 3)
+        self._wait_processed("b", 2)
+        self.assertEqual(self.results, ["a0", "a1", "b1", "a2", "b2"])
+        self.assertRaises(KeyError, self.dispatcher.submit, "c", id, (0,))
+
+    def test_drop_oldest(self):
+        """
+        Tests the drop-oldest policy
+        """
+        self._fill("lane", DROP_OLDEST)
+        self.assertTrue(self.dispatcher.submit("lane", self.results.append,
+                                               (3,)))
+        self.gate.set()
+        self._wait_processed("lane", 3)
+        self.assertEqual(self.results, [0, 2, 3])
+        self.assertEqual(self.dispatcher.get_stats()["lane"]['dropped'], 1)
+
+    def test_drop_newest(self):
+        """
+        Tests the drop-newest policy
+        """
+        self._fill("lane", DROP_NEWEST)
+        self.assertFalse(self.dispatcher.submit("lane", self.results.append,
+                                                (3,)))
+        self.gate.set()
+        self._wait_processed("lane", 3)
+        self.assertEqual(self.results, [0, 1, 2])
+
+    def test_reject(self):
+        """
+        Tests the reject policy
+        """
+        self._fill("lane", REJECT)
+        self.assertRaises(Overloaded, self.dispatcher.submit, "lane",
+                          self.results.append, (3,))
+        stats = self.dispatcher.get_stats()["lane"]
+        self.assertEqual(stats['rejected'], 1)
+        self.assertEqual(stats['depth'], 2)
+        self.assertEqual(stats['running'], 1)
+
+    def test_block(self):
+        """
+        Tests the block policy
+        """
+        self._fill("lane", BLOCK)
+        submitted = threading.Event()
+
+        def submit():
+            self.dispatcher.submit("lane", self.results.append, (3,))
+            submitted.set()
+
+        threading.Thread(target=submit).start()
+        self.assertFalse(submitted.wait(.1))
+        self.gate.set()
+        self.assertTrue(submitted.wait(5))
+        self._wait_processed("lane", 4)
+        self.assertEqual(self.results, [0, 1, 2, 3])
+
+    def test_ordering(self):
+        """
+        Tests the sequential execution of tasks with the same ordering key
+        """
+        lock = threading.Lock()
+        running = set()
+        concurrent = []
+        done = dict((key, []) for key in "abc")
+
+        def task(key, idx):
+            with lock:
+                if key in running:
+                    concurrent.append(key)
+                running.add(key)
+            threading.Event().wait(.001)
+            with lock:
+                running.discard(key)
+                done[key].append(idx)
+
+        self.dispatcher.set_lane("lane")
+        self.dispatcher.start(4)
+        for idx in range(20):
+            for key in "abc":
+                self.dispatcher.submit("lane", task, (key, idx), key)
+
+        self._wait_processed("lane", 60)
+        self.assertEqual(concurrent, [])
+        for key in "abc":
+            self.assertEqual(done[key], list(range(20)))
+
+    def test_ordering_drop(self):
+        """
+        Tests the drop-oldest policy with ordered tasks
+        """
+        self.dispatcher.set_lane("lane", max_size=2, policy=DROP_OLDEST)
+        self.dispatcher.start(2)
+        self.dispatcher.submit("lane", self._blocking, (0,), "key")
+        self.assertTrue(self.started.wait(5))
+
+        # Both tasks wait for the busy key: the oldest one is dropped
+        self.dispatcher.submit("lane", self.results.append, (1,), "key")
+        self.dispatcher.submit("lane", self.results.append, (2,), "key")
+        self.dispatcher.submit("lane", self.results.append, (3,), "key")
+        self.assertEqual(self.dispatcher.get_stats()["lane"]['keys'], 1)
+        self.gate.set()
+        self._wait_processed("lane", 3)
+        self.assertEqual(self.results, [0, 2, 3])
+
+    def test_priorities(self):
+        """
+        Tests the execution of tasks with a higher priority first
+        """
+        self.dispatcher.set_lane("bulk")
+        self.dispatcher.set_lane("control")
+        self.dispatcher.start(1)
+        self.dispatcher.submit("bulk", self._blocking, ("b0",))
+        self.assertTrue(self.started.wait(5))
+
+        for idx in range(1, 3):
+            self.dispatcher.submit("bulk", self.results.append,
+                                   ("b{0}".format(idx),))
+        self.dispatcher.submit("bulk", self.results.append, ("low",),
+                               priority=PRIORITY_LOW)
+        self.dispatcher.submit("control", self.results.append, ("c1",),
+                               priority=PRIORITY_HIGH)
+        self.dispatcher.submit("bulk", self.results.append, ("high",),
+                               priority=PRIORITY_HIGH)
+
+        self.gate.set()
+        self._wait_processed("bulk", 5)
+        self.assertEqual(self.results,
+                         ["b0", "c1", "high", "b1", "b2", "low"])
+
+    def test_priorities_drop(self):
+        """
+        Tests the drop-oldest policy with priorities: low priority tasks are
+        dropped first
+        """
+        self.dispatcher.set_lane("lane", max_size=2, policy=DROP_OLDEST)
+        self.dispatcher.start(1)
+        self.dispatcher.submit("lane", self._blocking, (0,))
+        self.assertTrue(self.started.wait(5))
+        self.dispatcher.submit("lane", self.results.append, (1,))
+        self.dispatcher.submit("lane", self.results.append, ("low",),
+                               priority=PRIORITY_LOW)
+        self.dispatcher.submit("lane", self.results.append, (2,))
+        self.gate.set()
+        self._wait_processed("lane", 3)
+        self.assertEqual(self.results, [0, 1, 2])
+
+    def test_remove(self):
+        """
+        Tests the removal of a lane
+        """
+        self._fill("lane", BLOCK)
+        self.assertEqual(self.dispatcher.remove_lane("lane"), 2)
+        self.assertEqual(self.dispatcher.remove_lane("lane"), 0)
+        self.gate.set()
+        self.dispatcher.stop()
+        self.assertEqual(self.results, [0])
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
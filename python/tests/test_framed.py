@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the framed stream transports utilities and the Unix domain socket
+transport, using fake core and directories
+
+:author: Thomas Calmant
+"""
+
+# Herald
+from herald.exceptions import InvalidPeerAccess
+from herald.transports.framed import FrameReader, Connection, make_frame
+from herald.transports.uds import ACCESS_ID
+from herald.transports.uds.transport import UDSTransport
+import herald.beans as beans
+
+# Standard library
+import shutil
+import socket
+import tempfile
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+
+class FakeDirectory(object):
+    """
+    Fake Herald directory
+    """
+    def __init__(self, uid, node_uid):
+        self.local_uid = uid
+        self.local_peer = beans.Peer(uid, node_uid, "app", ["all"], None)
+        self.peers = {}
+
+    def get_local_peer(self):
+        return self.local_peer
+
+    def add_peer(self, peer):
+        self.peers[peer.uid] = peer
+
+
+class FakeUDSDirectory(object):
+    """
+    Fake UDS transport directory
+    """
+    def __init__(self):
+        self.paths = {}
+
+    def get_path(self, uid):
+        return self.paths.get(uid)
+
+
+class FakeCore(object):
+    """
+    Fake Herald core: stores the received messages
+    """
+    def __init__(self):
+        self.received = []
+        self.event = threading.Event()
+
+    def handle_message(self, message):
+        self.received.append(message)
+        self.event.set()
+
+
+class FakeProbe(object):
+    """
+    Fake debug probe
+    """
+    def store(self, channel, data):
+        pass
+
+# ------------------------------------------------------------------------------
+
+
+class FrameReaderTests(unittest.TestCase):
+    """
+    Tests the frames parser
+    """
+    def test_split(self):
+        """
+        Tests the parsing of frames received in pieces
+        """
+        data = make_frame("json", "abc") + make_frame("binary", b"\x00\x01")
+        reader = FrameReader()
+        frames = []
+        for idx in range(len(data)):
+            frames.extend(reader.feed(data[idx:idx + 1]))
+
+        self.assertEqual(frames, [("json", b"abc"), ("binary", b"\x00\x01")])
+        self.assertEqual(reader.feed(b""), [])
+
+    def test_too_large(self):
+        """
+        Tests the rejection of frames larger than the limit
+        """
+        reader = FrameReader(max_size=4)
+        self.assertRaises(ValueError, reader.feed, make_frame("json", "abcde"))
+
+    def test_connection(self):
+        """
+        Tests the exchange of frames over a socket pair
+        """
+        received = []
+        event = threading.Event()
+
+        def handler(connection, codec_name, payload):
+            received.append((codec_name, payload))
+            if len(received) == 2:
+                event.set()
+
+        sock_a, sock_b = socket.socketpair()
+        conn_a = Connection(sock_a, handler)
+        conn_b = Connection(sock_b, handler)
+        conn_a.start()
+        conn_b.start()
+        try:
+            conn_a.send("json", "from a")
+            conn_b.send("json", b"from b")
+            self.assertTrue(event.wait(5))
+            self.assertEqual(sorted(received),
+                             [("json", b"from a"), ("json", b"from b")])
+        finally:
+            conn_a.close()
+            conn_b.close()
+
+        self.assertTrue(conn_a.closed)
+        self.assertRaises(IOError, conn_a.send, "json", "closed")
+
+# ------------------------------------------------------------------------------
+
+
+@unittest.skipIf(not hasattr(socket, 'AF_UNIX'),
+                 "Unix domain sockets are not supported")
+class UDSTransportTests(unittest.TestCase):
+    """
+    Tests the Unix domain socket transport
+    """
+    def setUp(self):
+        """
+        Sets up two peers on the same node
+        """
+        self.folder = tempfile.mkdtemp()
+        self.transports = {}
+        for uid in ("A", "B"):
+            transport = UDSTransport()
+            transport._core = FakeCore()
+            transport._directory = FakeDirectory(uid, "node")
+            transport._uds_directory = FakeUDSDirectory()
+            transport._probe = FakeProbe()
+            transport._folder = self.folder
+            transport._validate(None)
+            self.transports[uid] = transport
+
+        # Exchange descriptions
+        for uid, transport in self.transports.items():
+            for other_uid, other in self.transports.items():
+                if other_uid != uid:
+                    local_peer = other._directory.local_peer
+                    transport._directory.add_peer(local_peer)
+                    transport._uds_directory.paths[other_uid] = \
+                        local_peer.get_access(ACCESS_ID).path
+
+    def tearDown(self):
+        """
+        Stops the transports
+        """
+        for transport in self.transports.values():
+            transport._invalidate(None)
+        shutil.rmtree(self.folder)
+
+    def test_fire(self):
+        """
+        Tests the sending of a message and of its reply
+        """
+        transport_a = self.transports["A"]
+        transport_b = self.transports["B"]
+        peer_b = transport_a._directory.peers["B"]
+        message = beans.Message("some/subject", {"key": [1, 2]})
+        transport_a.fire(peer_b, message)
+
+        self.assertTrue(transport_b._core.event.wait(5))
+        msg = transport_b._core.received[0]
+        self.assertEqual(msg.uid, message.uid)
+        self.assertEqual(msg.sender, "A")
+        self.assertEqual(msg.access, ACCESS_ID)
+        self.assertEqual(msg.content, {"key": [1, 2]})
+
+        # Reply on the same connection
+        reply = beans.Message("some/reply", "ok")
+        transport_b.fire(None, reply, msg.extra)
+        self.assertTrue(transport_a._core.event.wait(5))
+        msg = transport_a._core.received[0]
+        self.assertEqual(msg.uid, reply.uid)
+        self.assertEqual(msg.reply_to, message.uid)
+
+    def test_fire_group(self):
+        """
+        Tests the sending of a message to a group
+        """
+        transport_a = self.transports["A"]
+        peer_b = transport_a._directory.peers["B"]
+        message = beans.Message("some/subject", "group")
+        self.assertEqual(transport_a.fire_group("all", [peer_b], message),
+                         set([peer_b]))
+        self.assertTrue(self.transports["B"]._core.event.wait(5))
+
+    def test_other_node(self):
+        """
+        Tests the refusal of peers hosted on other nodes
+        """
+        peer = beans.Peer("C", "other-node", "app", ["all"], None)
+        self.assertRaises(InvalidPeerAccess, self.transports["A"].fire,
+                          peer, beans.Message("some/subject"))
+        self.assertEqual(self.transports["A"].fire_group(
+            "all", [peer], beans.Message("some/subject")), set())
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the Herald transports health table
+
+:author: Thomas Calmant
+"""
+
+# Herald
+import herald.health
+from herald.health import HealthTable, CLOSED, OPEN, HALF_OPEN
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+
+class FakeClock(object):
+    """
+    Replaces the time module in the tested module
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class HealthTableTests(unittest.TestCase):
+    """
+    Tests the transports health table
+    """
+    def setUp(self):
+        """
+        Replaces the clock
+        """
+        self.clock = FakeClock()
+        self._time = herald.health.time
+        herald.health.time = self.clock
+
+    def tearDown(self):
+        """
+        Restores the clock
+        """
+        herald.health.time = self._time
+
+    def test_order(self):
+        """
+        Tests the ordering of accesses according to their performances
+        """
+        table = HealthTable()
+        accesses = ["http", "xmpp"]
+        self.assertEqual(table.order("peer", accesses), accesses)
+
+        table.record_success("peer", "http", .5)
+        table.record_success("peer", "xmpp", .1)
+        self.assertEqual(table.order("peer", accesses), ["xmpp", "http"])
+
+        # Round trip time prevails
+        table.record_reply("peer", "xmpp", 2)
+        table.record_reply("peer", "http", 1)
+        self.assertEqual(table.order("peer", accesses), ["http", "xmpp"])
+        self.assertEqual(table.order("other", accesses), accesses)
+
+        # Forgotten peer
+        table.forget_peer("peer")
+        self.assertEqual(table.order("peer", accesses[::-1]), ["xmpp", "http"])
+
+    def test_circuit_breaker(self):
+        """
+        Tests the opening of the circuit after failures and half-open probes
+        """
+        table = HealthTable(threshold=2, delay=10, max_delay=15)
+        accesses = ["http", "xmpp"]
+        table.record_success("peer", "http", .1)
+        table.record_success("peer", "xmpp", .5)
+
+        table.record_failure("peer", "http")
+        self.assertEqual(table.get_stats("peer")["http"]["state"], CLOSED)
+        table.record_failure("peer", "http")
+        self.assertEqual(table.get_stats("peer")["http"]["state"], OPEN)
+
+        # Open circuit is tried last
+        self.assertEqual(table.order("peer", accesses), ["xmpp", "http"])
+
+        # Half-open: a single probe is allowed
+        self.clock.now += 10
+        self.assertEqual(table.order("peer", accesses), ["http", "xmpp"])
+        self.assertEqual(table.get_stats("peer")["http"]["state"], HALF_OPEN)
+        self.assertEqual(table.order("peer", accesses), ["xmpp", "http"])
+
+        # Failed probe: back off
+        table.record_failure("peer", "http")
+        self.clock.now += 10
+        self.assertEqual(table.order("peer", accesses), ["xmpp", "http"])
+        self.clock.now += 5
+        self.assertEqual(table.order("peer", accesses), ["http", "xmpp"])
+
+        # Successful probe closes the circuit
+        table.record_success("peer", "http", .1)
+        self.assertEqual(table.get_stats("peer")["http"]["state"], CLOSED)
+        self.assertEqual(table.order("peer", accesses), ["http", "xmpp"])
+
+    def test_lost_probe(self):
+        """
+        Tests the probing of an access which result was never recorded
+        """
+        table = HealthTable(threshold=1, delay=10)
+        table.record_failure("peer", "http")
+        self.clock.now += 10
+        self.assertEqual(table.order("peer", ["http"]), ["http"])
+        self.assertEqual(table.order("peer", ["http", "xmpp"]),
+                         ["xmpp", "http"])
+        self.clock.now += 10
+        self.assertEqual(table.order("peer", ["http", "xmpp"]),
+                         ["http", "xmpp"])
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
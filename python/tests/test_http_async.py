@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the asyncio-based Herald HTTP receiver, using fake core and directories
+
+:author: Thomas Calmant
+"""
+
+# Herald
+from herald.transports.http import ACCESS_ID, MESSAGE_HEADER_PORT, \
+    MESSAGE_HEADER_PATH, CONTENT_TYPE_BATCH
+from herald.transports.http.async_receiver import AsyncHttpReceiver
+from herald.transports.http.beans import HTTPAccess
+from herald.transports.framed import make_frame
+import herald
+import herald.beans as beans
+import herald.utils as utils
+
+# Pelix
+import pelix.misc.jabsorb as jabsorb
+
+# Standard library
+import json
+import threading
+
+try:
+    # Python 3
+    import http.client as httplib
+except ImportError:
+    # Python 2
+    import httplib
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+
+class FakeDirectory(object):
+    """
+    Fake Herald directory
+    """
+    def __init__(self, uid):
+        self.local_uid = uid
+        self.local_peer = beans.Peer(uid, "node", "app", ["all"], None)
+
+    def get_local_peer(self):
+        return self.local_peer
+
+
+class FakeHttpDirectory(object):
+    """
+    Fake HTTP transport directory: all peers are unknown
+    """
+    def check_access(self, uid, host, port):
+        raise ValueError("Unknown peer: {0}".format(uid))
+
+
+class FakeCore(object):
+    """
+    Fake Herald core: stores the received messages
+    """
+    def __init__(self, count=1):
+        self.received = []
+        self.count = count
+        self.event = threading.Event()
+
+    def handle_message(self, message):
+        self.received.append(message)
+        if len(self.received) >= self.count:
+            self.event.set()
+
+
+class FakeProbe(object):
+    """
+    Fake debug probe
+    """
+    def store(self, channel, data):
+        pass
+
+# ------------------------------------------------------------------------------
+
+
+class AsyncHttpReceiverTests(unittest.TestCase):
+    """
+    Tests the asyncio-based HTTP receiver
+    """
+    def setUp(self):
+        """
+        Starts a receiver on a random port
+        """
+        self.receiver = AsyncHttpReceiver()
+        self.receiver._core = FakeCore()
+        self.receiver._directory = FakeDirectory("local")
+        self.receiver._http_directory = FakeHttpDirectory()
+        self.receiver._probe = FakeProbe()
+        self.receiver._host = "127.0.0.1"
+        self.receiver._port = 0
+        self.receiver._validate(None)
+
+        self.port = self.receiver.get_access_info()[1]
+        self.conn = httplib.HTTPConnection("127.0.0.1", self.port)
+
+    def tearDown(self):
+        """
+        Stops the receiver
+        """
+        self.conn.close()
+        self.receiver._invalidate(None)
+
+    def __request(self, method, path, body=None, headers=None):
+        """
+        Sends a request and returns the (status, body) tuple
+        """
+        self.conn.request(method, path, body, headers or {})
+        response = self.conn.getresponse()
+        return response.status, response.read()
+
+    def test_access(self):
+        """
+        Tests the access information
+        """
+        host, port, path = self.receiver.get_access_info()
+        self.assertEqual((host, path), ("127.0.0.1", "/herald"))
+        self.assertNotEqual(port, 0)
+        access = self.receiver._directory.local_peer.get_access(ACCESS_ID)
+        self.assertEqual(access, HTTPAccess(host, port, path))
+        self.assertTrue(access.batch)
+        self.assertEqual(access.dump(), (host, port, "herald", True))
+        self.assertTrue(self.receiver._controller)
+
+    def test_get(self):
+        """
+        Tests the description of the local peer
+        """
+        status, content = self.__request("GET", "/herald")
+        self.assertEqual(status, 200)
+        dump = jabsorb.from_jabsorb(json.loads(content.decode('utf-8')))
+        self.assertEqual(dump['uid'], "local")
+
+        status, _ = self.__request("GET", "/other")
+        self.assertEqual(status, 404)
+
+    def test_post(self):
+        """
+        Tests the reception of messages on a persistent connection
+        """
+        core = self.receiver._core
+        core.count = 2
+
+        messages = [beans.Message("some/subject", {"idx": idx})
+                    for idx in range(2)]
+        for message in messages:
+            envelope = {herald.MESSAGE_HEADER_SENDER_UID: "remote",
+                        MESSAGE_HEADER_PORT: 1234,
+                        MESSAGE_HEADER_PATH: "/herald"}
+            status, content = self.__request(
+                "POST", "/herald", utils.to_json(message, envelope),
+                {"content-type": "application/json"})
+            self.assertEqual((status, content), (200, b""))
+
+        self.assertTrue(core.event.wait(5))
+        self.assertEqual([msg.uid for msg in core.received],
+                         [msg.uid for msg in messages])
+
+        msg = core.received[0]
+        self.assertEqual(msg.sender, "remote")
+        self.assertEqual(msg.access, ACCESS_ID)
+        self.assertEqual(msg.content, {"idx": 0})
+        self.assertEqual(msg.extra, {'host': "127.0.0.1", 'port': 1234,
+                                     'path': "/herald",
+                                     'parent_uid': messages[0].uid})
+
+    def test_batch(self):
+        """
+        Tests the reception of a batch of messages
+        """
+        core = self.receiver._core
+        core.count = 3
+
+        envelope = {herald.MESSAGE_HEADER_SENDER_UID: "remote",
+                    MESSAGE_HEADER_PORT: 1234}
+        messages = [beans.Message("some/subject", idx) for idx in range(3)]
+        body = b"".join(make_frame("json", utils.to_json(message, envelope))
+                        for message in messages)
+        status, _ = self.__request("POST", "/herald", body,
+                                   {"content-type": CONTENT_TYPE_BATCH})
+        self.assertEqual(status, 200)
+
+        self.assertTrue(core.event.wait(5))
+        self.assertEqual([msg.uid for msg in core.received],
+                         [msg.uid for msg in messages])
+        self.assertEqual([msg.content for msg in core.received], [0, 1, 2])
+        self.assertEqual(core.received[2].sender, "remote")
+
+    def test_raw(self):
+        """
+        Tests the reception of a raw message
+        """
+        status, _ = self.__request("POST", "/herald", b"Hello",
+                                   {"content-type": "text/plain"})
+        self.assertEqual(status, 200)
+
+        core = self.receiver._core
+        self.assertTrue(core.event.wait(5))
+        msg = core.received[0]
+        self.assertEqual(msg.subject, herald.SUBJECT_RAW)
+        self.assertEqual(msg.content, "Hello")
+        self.assertTrue(msg.extra['raw'])
+
+    def test_chunked(self):
+        """
+        Tests the refusal of chunked requests
+        """
+        self.conn.putrequest("POST", "/herald")
+        self.conn.putheader("Transfer-Encoding", "chunked")
+        self.conn.endheaders()
+        self.conn.send(b"5\r\nHello\r\n0\r\n\r\n")
+        self.assertEqual(self.conn.getresponse().status, 411)
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the HTTP transport sender engine
+
+:author: Thomas Calmant
+"""
+
+# Standard library
+import threading
+import time
+
+try:
+    # Python 3
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    # Python 2
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+try:
+    import requests
+except ImportError:
+    requests = None
+else:
+    from herald.transports.http import CONTENT_TYPE_BATCH
+    from herald.transports.http.sender import HttpSender
+
+# Herald
+from herald.transports.framed import FrameReader
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Answers POST requests after the delay of its server
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['content-length']))
+        self.server.requests.append((self.headers['content-type'], body))
+        time.sleep(self.server.delay)
+        self.send_response(self.server.code)
+        self.send_header("content-length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(delay=0, code=200):
+    """
+    Starts an HTTP server in a thread
+
+    :return: The server and its URL
+    """
+    server = HTTPServer(("127.0.0.1", 0), _Handler)
+    server.delay = delay
+    server.code = code
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, "http://127.0.0.1:{0}/herald".format(server.server_port)
+
+# ------------------------------------------------------------------------------
+
+
+@unittest.skipIf(requests is None, "requests is not installed")
+class HttpSenderTests(unittest.TestCase):
+    """
+    Tests the HTTP sender engine
+    """
+    def setUp(self):
+        """
+        Starts the sender
+        """
+        self.sender = HttpSender("test-http", max_in_flight=1, workers=2)
+        self.sender.start()
+        self.servers = []
+
+    def tearDown(self):
+        """
+        Stops the sender and the servers
+        """
+        self.sender.stop()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def __server(self, delay=0, code=200):
+        server, url = start_server(delay, code)
+        self.servers.append(server)
+        return url
+
+    def __batch_sender(self, window):
+        """
+        Replaces the sender by one with the given batch window
+        """
+        self.sender.stop()
+        self.sender = HttpSender("test-http", max_in_flight=1, workers=2,
+                                 batch_window=window)
+        self.sender.start()
+
+    def test_post(self):
+        """
+        Tests the resolution of futures
+        """
+        url = self.__server()
+        future = self.sender.post("ok", url, "content", {})
+        self.assertEqual(future.result(5).status_code, 200)
+
+        url = self.__server(code=500)
+        future = self.sender.post("error", url, "content", {})
+        self.assertRaises(requests.exceptions.HTTPError, future.result, 5)
+
+    def test_slow_peer(self):
+        """
+        Tests that a slow peer doesn't hold the other ones
+        """
+        slow_url = self.__server(delay=.5)
+        url = self.__server()
+
+        slow_futures = [self.sender.post("slow", slow_url, "content", {})
+                        for _ in range(3)]
+        start = time.time()
+        self.sender.post("fast", url, "content", {}).result(5)
+        self.assertLess(time.time() - start, .4)
+        self.assertFalse(all(future.done() for future in slow_futures))
+
+        # Stopping the sender fails the pending requests
+        self.sender.forget("slow")
+        self.assertRaises(IOError, slow_futures[-1].result, 5)
+
+    def test_coalescing(self):
+        """
+        Tests the coalescing of the messages waiting for an in-flight slot
+        """
+        url = self.__server(delay=.2)
+        server = self.servers[-1]
+        first = self.sender.post_batched("peer", url, "json", "first",
+                                         "application/json")
+        time.sleep(.1)
+        others = [self.sender.post_batched("peer", url, "json", str(idx),
+                                           "application/json")
+                  for idx in range(3)]
+        for future in [first] + others:
+            self.assertEqual(future.result(5).status_code, 200)
+
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(server.requests[0], ("application/json", b"first"))
+        content_type, body = server.requests[1]
+        self.assertEqual(content_type, CONTENT_TYPE_BATCH)
+        self.assertEqual(FrameReader().feed(body),
+                         [("json", b"0"), ("json", b"1"), ("json", b"2")])
+
+    def test_window(self):
+        """
+        Tests the batch window
+        """
+        self.__batch_sender(.2)
+        url = self.__server()
+        server = self.servers[-1]
+        futures = [self.sender.post_batched("peer", url, "json", str(idx),
+                                            "application/json", flush=False)
+                   for idx in range(3)]
+        time.sleep(.1)
+        self.assertFalse(server.requests)
+
+        # Flushed messages are sent immediately with the waiting ones
+        futures.append(self.sender.post_batched("peer", url, "json", "3",
+                                                "application/json"))
+        for future in futures:
+            future.result(5)
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(len(FrameReader().feed(server.requests[0][1])), 4)
+
+        # Without flush, the batch is sent at the end of the window
+        start = time.time()
+        self.sender.post_batched("peer", url, "json", "4", "application/json",
+                                 flush=False).result(5)
+        self.assertGreaterEqual(time.time() - start, .15)
+        self.assertEqual(server.requests[1], ("application/json", b"4"))
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
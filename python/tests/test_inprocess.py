@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the Herald in-process transport, using fake core and directory
+
+:author: Thomas Calmant
+"""
+
+# Herald
+from herald.exceptions import InvalidPeerAccess
+from herald.transports.inprocess import ACCESS_ID
+from herald.transports.inprocess.beans import InProcessAccess
+from herald.transports.inprocess.transport import InProcessTransport
+import herald
+import herald.beans as beans
+import herald.transports.inprocess.registry as registry
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+
+class FakeDirectory(object):
+    """
+    Fake Herald directory
+    """
+    def __init__(self, uid):
+        self.local_uid = uid
+        self.local_peer = beans.Peer(uid, None, "app", ["all"], None)
+        self.peers = {}
+
+    def get_local_peer(self):
+        return self.local_peer
+
+    def get_peer(self, uid):
+        return self.peers[uid]
+
+    def register(self, description):
+        peer = beans.Peer(description['uid'], description['node_uid'],
+                          description['app_id'], description['groups'], self)
+        for access_id, data in description['accesses'].items():
+            if access_id == ACCESS_ID:
+                peer.set_access(access_id, InProcessAccess(data))
+        self.peers[peer.uid] = peer
+        return peer
+
+    def peer_access_unset(self, peer, access_id, data):
+        if not peer.has_accesses():
+            del self.peers[peer.uid]
+
+
+class FakeCore(object):
+    """
+    Fake Herald core: stores the received messages
+    """
+    def __init__(self):
+        self.received = []
+
+    def handle_message(self, message):
+        self.received.append(message)
+
+
+class FakeProbe(object):
+    """
+    Fake debug probe
+    """
+    def store(self, channel, data):
+        pass
+
+# ------------------------------------------------------------------------------
+
+
+class InProcessTransportTests(unittest.TestCase):
+    """
+    Tests the in-process transport
+    """
+    def setUp(self):
+        """
+        Sets up two peers in the process
+        """
+        self.transports = {}
+        for uid in ("A", "B"):
+            transport = InProcessTransport()
+            transport._core = FakeCore()
+            transport._directory = FakeDirectory(uid)
+            transport._probe = FakeProbe()
+            transport._validate(None)
+            self.transports[uid] = transport
+
+    def tearDown(self):
+        """
+        Unregisters the peers
+        """
+        for transport in self.transports.values():
+            if transport._directory.local_peer.has_accesses():
+                transport._invalidate(None)
+
+    def test_discovery(self):
+        """
+        Tests the registration of the peers of the process
+        """
+        dir_a = self.transports["A"]._directory
+        dir_b = self.transports["B"]._directory
+        self.assertEqual(list(dir_a.peers), ["B"])
+        self.assertEqual(list(dir_b.peers), ["A"])
+
+        self.transports["B"]._invalidate(None)
+        self.assertEqual(dir_a.peers, {})
+        self.assertIsNone(registry.get_endpoint("B"))
+
+    def test_fire(self):
+        """
+        Tests the delivery of messages
+        """
+        transport = self.transports["A"]
+        peer_b = transport._directory.get_peer("B")
+        content = {"key": [1, 2]}
+        message = beans.Message("some/subject", content)
+        message.add_metadata("meta", "data")
+        transport.fire(peer_b, message)
+
+        received = self.transports["B"]._core.received
+        self.assertEqual(len(received), 1)
+        msg = received[0]
+        self.assertEqual(msg.uid, message.uid)
+        self.assertEqual(msg.sender, "A")
+        self.assertEqual(msg.access, ACCESS_ID)
+        self.assertIs(msg.content, content)
+        self.assertEqual(msg.get_metadata("meta"), "data")
+        self.assertEqual(msg.get_header(herald.MESSAGE_HEADER_TARGET_PEER),
+                         "B")
+        self.assertIsNone(
+            message.get_header(herald.MESSAGE_HEADER_TARGET_PEER))
+
+        # Reply, using the extra information
+        reply = beans.Message("some/reply")
+        self.transports["B"].fire(None, reply, msg.extra)
+        msg = transport._core.received[0]
+        self.assertEqual(msg.reply_to, message.uid)
+        self.assertEqual(msg.sender, "B")
+
+        # Unknown peer
+        self.assertRaises(InvalidPeerAccess, transport.fire,
+                          beans.Peer("C", None, "app", [], None), message)
+
+    def test_fire_group(self):
+        """
+        Tests the delivery of group messages
+        """
+        transport = self.transports["A"]
+        peer_b = transport._directory.get_peer("B")
+        peer_c = beans.Peer("C", None, "app", [], None)
+        reached = transport.fire_group("all", [peer_b, peer_c],
+                                       beans.Message("some/subject"))
+        self.assertEqual(reached, set([peer_b]))
+
+        msg = self.transports["B"]._core.received[0]
+        self.assertEqual(msg.get_header(herald.MESSAGE_HEADER_TARGET_GROUP),
+                         "all")
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the Herald registry of pending messages
+
+:author: Thomas Calmant
+"""
+
+# Herald
+from herald.pending import PendingRegistry
+
+# Standard library
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+
+class PendingRegistryTests(unittest.TestCase):
+    """
+    Tests the registry of pending messages
+    """
+    def setUp(self):
+        """
+        Prepares the registry
+        """
+        self.expired = []
+        self.event = threading.Event()
+        self.registry = PendingRegistry(self._expired)
+        self.registry.start()
+
+    def tearDown(self):
+        """
+        Stops the registry
+        """
+        self.registry.stop()
+
+    def _expired(self, uid, item):
+        """
+        Expiration callback
+        """
+        self.expired.append((uid, item))
+        self.event.set()
+
+    def test_storage(self):
+        """
+        Tests basic storage methods
+        """
+        registry = self.registry
+        registry.add("a", 1, "peer1")
+        registry.add("b", 2, ["peer1", "peer2"], 60)
+        registry.add("c", 3)
+
+        self.assertEqual(len(registry), 3)
+        self.assertIn("a", registry)
+        self.assertEqual(registry.get("b"), 2)
+        self.assertEqual(registry.pop("c"), 3)
+        self.assertRaises(KeyError, registry.pop, "c")
+        self.assertRaises(KeyError, registry.get, "c")
+
+        # Per-peer removal: entries waiting for other peers are kept
+        self.assertEqual(sorted(registry.pop_peer("peer1")),
+                         [("a", 1), ("b", 2)])
+        self.assertEqual(len(registry), 1)
+        self.assertEqual(registry.pop_peer("peer1"), [])
+        self.assertEqual(registry.pop_peer("peer2"), [("b", 2)])
+        self.assertEqual(len(registry), 0)
+
+        registry.add("d", 4, "peer3")
+        self.assertEqual(registry.clear(), [4])
+        self.assertEqual(registry.pop_peer("peer3"), [])
+
+    def test_expiration(self):
+        """
+        Tests the expiration of entries
+        """
+        registry = self.registry
+        registry.add("late", "late", timeout=60)
+        registry.add("removed", "removed", timeout=.05)
+        registry.add("expired", "expired", "peer", timeout=.1)
+        registry.pop("removed")
+
+        self.assertTrue(self.event.wait(5))
+        self.assertEqual(self.expired, [("expired", "expired")])
+        self.assertNotIn("expired", registry)
+        self.assertEqual(registry.pop_peer("peer"), [])
+        self.assertIn("late", registry)
+
+    def test_replace(self):
+        """
+        Tests the replacement of an entry
+        """
+        registry = self.registry
+        registry.add("a", 1, "peer1", .05)
+        registry.add("a", 2, "peer2")
+        self.assertFalse(self.event.wait(.2))
+        self.assertEqual(registry.pop_peer("peer1"), [])
+        self.assertEqual(registry.pop_peer("peer2"), [("a", 2)])
+
+    def test_many(self):
+        """
+        Tests the clean up of the heap
+        """
+        registry = self.registry
+        for idx in range(5000):
+            registry.add(idx, idx, timeout=60)
+            registry.pop(idx)
+        self.assertEqual(len(registry), 0)
+
+        registry.add("expired", 0, timeout=.01)
+        self.assertTrue(self.event.wait(5))
+        self.assertEqual(self.expired, [("expired", 0)])
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
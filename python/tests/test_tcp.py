@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the Herald TCP transport, using fake core and directory
+
+:author: Thomas Calmant
+"""
+
+# Herald
+from herald.transports.tcp import ACCESS_ID
+from herald.transports.tcp.beans import TCPAccess
+from herald.transports.tcp.transport import TCPTransport
+import herald
+import herald.beans as beans
+
+# Standard library
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+
+class FakeDirectory(object):
+    """
+    Fake Herald directory
+    """
+    def __init__(self, uid):
+        self.local_uid = uid
+        self.local_peer = beans.Peer(uid, "node-" + uid, "app", ["all"], None)
+
+    def get_local_peer(self):
+        return self.local_peer
+
+
+class FakeCore(object):
+    """
+    Fake Herald core: stores the received messages
+    """
+    def __init__(self, count=1):
+        self.received = []
+        self.count = count
+        self.event = threading.Event()
+
+    def handle_message(self, message):
+        self.received.append(message)
+        if len(self.received) >= self.count:
+            self.event.set()
+
+
+class FakeProbe(object):
+    """
+    Fake debug probe
+    """
+    def store(self, channel, data):
+        pass
+
+# ------------------------------------------------------------------------------
+
+
+class TCPTransportTests(unittest.TestCase):
+    """
+    Tests the TCP transport
+    """
+    def setUp(self):
+        """
+        Sets up two peers
+        """
+        self.transports = {}
+        for uid in ("A", "B"):
+            transport = TCPTransport()
+            transport._core = FakeCore()
+            transport._directory = FakeDirectory(uid)
+            transport._probe = FakeProbe()
+            transport._host = "127.0.0.1"
+            transport._validate(None)
+            self.transports[uid] = transport
+
+    def tearDown(self):
+        """
+        Stops the transports
+        """
+        for transport in self.transports.values():
+            transport._invalidate(None)
+
+    def test_access(self):
+        """
+        Tests the access advertised by the transport
+        """
+        transport = self.transports["A"]
+        access = transport._directory.local_peer.get_access(ACCESS_ID)
+        host, port, path = transport.get_access_info()
+        self.assertEqual(access, TCPAccess(host, port))
+        self.assertNotEqual(port, 0)
+        self.assertEqual(path, "")
+
+    def test_fire(self):
+        """
+        Tests the sending of messages and of a reply
+        """
+        transport_a = self.transports["A"]
+        transport_b = self.transports["B"]
+        peer_b = transport_b._directory.local_peer
+        transport_b._core.count = 10
+
+        messages = [beans.Message("some/subject", idx) for idx in range(10)]
+        for message in messages:
+            transport_a.fire(peer_b, message)
+
+        self.assertTrue(transport_b._core.event.wait(5))
+        received = transport_b._core.received
+        self.assertEqual([msg.uid for msg in received],
+                         [msg.uid for msg in messages])
+        self.assertEqual([msg.content for msg in received], list(range(10)))
+
+        msg = received[0]
+        self.assertEqual(msg.sender, "A")
+        self.assertEqual(msg.access, ACCESS_ID)
+        self.assertEqual(msg.extra['host'], "127.0.0.1")
+        self.assertEqual(msg.extra['port'],
+                         transport_a.get_access_info()[1])
+
+        # Reply on the same connection
+        reply = beans.Message("some/reply", "ok")
+        transport_b.fire(None, reply, msg.extra)
+        self.assertTrue(transport_a._core.event.wait(5))
+        msg = transport_a._core.received[0]
+        self.assertEqual(msg.uid, reply.uid)
+        self.assertEqual(msg.reply_to, messages[0].uid)
+        self.assertIsNone(msg.get_header(herald.MESSAGE_HEADER_TARGET_PEER))
+
+    def test_fire_group(self):
+        """
+        Tests the sending of a message to a group
+        """
+        peer_b = self.transports["B"]._directory.local_peer
+        message = beans.Message("some/subject", "group")
+        self.assertEqual(
+            self.transports["A"].fire_group("all", [peer_b], message),
+            set([peer_b]))
+        self.assertTrue(self.transports["B"]._core.event.wait(5))
+        msg = self.transports["B"]._core.received[0]
+        self.assertEqual(msg.get_header(herald.MESSAGE_HEADER_TARGET_GROUP),
+                         "all")
+
+    def test_load_dump(self):
+        """
+        Tests the update of the TCP access of a discovered peer
+        """
+        message = beans.MessageReceived("uid", "some/subject", None, "B",
+                                        None, ACCESS_ID,
+                                        extra={'host': "10.0.0.1",
+                                               'port': 1234})
+        description = {'accesses': {ACCESS_ID: ("0.0.0.0", 1234)}}
+        description = self.transports["A"]._load_dump(message, description)
+        self.assertEqual(description['accesses'][ACCESS_ID],
+                         ("10.0.0.1", 1234))
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()